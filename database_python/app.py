@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, request, jsonify, make_response, stream_with_context, current_app, g
 from flask_jwt_extended import (
     JWTManager, create_access_token, create_refresh_token,
     jwt_required, get_jwt_identity, get_jwt
@@ -8,23 +8,36 @@ from models.hospital import (
     Appointment, Prescription, Gender
 )
 from models.user import User
-from config import Config
-from datetime import datetime, date
+from blocklist import BlocklistFull, create_blocklist
+from booking import AppointmentConflict
+import booking
+import hashing
+import cache
+import versions
+import pooling
+import timing
+import metrics
+import scheduling
+import search_index
+from crud import DepartmentCRUD, DoctorCRUD, PatientCRUD, AppointmentCRUD, PrescriptionCRUD
+from pagination import parse_datetime, parse_limit
+from serializers import parse_fields, encoder_for, dumps
+from config import Config, check_config
+from datetime import datetime, date, timedelta
+from functools import wraps
+import json
+import logging
 
-app = Flask(__name__)
-app.config.from_object(Config)
-jwt = JWTManager(app)
-db.init_app(app)
-
-# Зберігаємо відкликані токени
-BLOCKLIST = set()
+# Імпорт модуля не має побічних ефектів: застосунок, з'єднання з БД і пули створює create_app
+api = Blueprint('api', __name__)
+jwt = JWTManager()
 
 @jwt.token_in_blocklist_loader
 def check_if_token_in_blocklist(jwt_header, jwt_payload):
-    return jwt_payload["jti"] in BLOCKLIST
+    return current_app.extensions['blocklist'].is_revoked(jwt_payload["jti"], jwt_payload["exp"])
 
 # Маршрути автентифікації
-@app.route('/register', methods=['POST'])
+@api.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     
@@ -42,40 +55,153 @@ def register():
         db.session.rollback()
         return jsonify({"message": str(e)}), 400
 
-@app.route('/login', methods=['POST'])
+@api.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     user = User.query.filter_by(username=data['username']).first()
     
     if user and user.check_password(data['password']):
-        access_token = create_access_token(identity=user.id)
-        refresh_token = create_refresh_token(identity=user.id)
+        # Перехешовуємо пароль, якщо змінилась налаштована кількість раундів
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+        access_token = create_access_token(identity=str(user.id))
+        refresh_token = create_refresh_token(identity=str(user.id))
         return jsonify({
             'access_token': access_token,
             'refresh_token': refresh_token
         }), 200
     return jsonify({"message": "Invalid credentials"}), 401
 
-@app.route('/refresh', methods=['POST'])
+@api.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh():
     current_user = get_jwt_identity()
     access_token = create_access_token(identity=current_user)
     return jsonify({'access_token': access_token}), 200
 
-@app.route('/logout', methods=['POST'])
+@api.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    jti = get_jwt()["jti"]
-    BLOCKLIST.add(jti)
+    token = get_jwt()
+    try:
+        current_app.extensions['blocklist'].revoke(token["jti"], token["exp"])
+    except BlocklistFull as e:
+        logging.getLogger(__name__).error("Logout refused: %s", e)
+        return jsonify({"message": str(e)}), 503
     return jsonify({"message": "Successfully logged out"}), 200
 
-# Створення таблиць
-with app.app_context():
-    db.create_all()
+def conditional(*models):
+    """ETag з версій таблиць: 304 без звернення до БД, якщо дані не змінились.
+
+    Записи кешу довідників (cache.py) позначені тими самими версіями, тож під новим ETag
+    не віддається тіло, прочитане до зміни в іншому процесі.
+    """
+    tables = [model.__tablename__ for model in models]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Рахуємо ETag до читання даних: commit між ними дасть лише зайвий промах
+            etag = versions.get_versions().etag(
+                tables, request.full_path, request.headers.get('Accept', '')
+            )
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+def requested_fields(crud):
+    return parse_fields(crud.model, request.args.get('fields'))
+
+def json_bytes_response(body, status=200):
+    return Response(body, status=status, mimetype='application/json')
+
+def item_response(crud, item_id):
+    try:
+        encoder = encoder_for(crud.model, requested_fields(crud))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    row = crud.get_row(item_id, encoder.fields)
+    with timing.serializing():
+        body = encoder.dumps_row(row)
+    return json_bytes_response(body)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_ROWS = 500
+
+def wants_stream():
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def ndjson_response(crud, encoder):
+    """Віддає таблицю потоком NDJSON: один об'єкт на рядок, без побудови повного списку"""
+    def generate():
+        chunk = []
+        for row in crud.iter_all(fields=encoder.fields):
+            chunk.append(row)
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield encoder.ndjson_rows(chunk)
+                chunk = []
+        if chunk:
+            yield encoder.ndjson_rows(chunk)
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def list_response(crud):
+    """Повертає весь список або сторінку, якщо передано ?limit= чи ?after=
+
+    ?fields=a,b,c звужує SELECT до цих колонок і відповідь до цих полів.
+    Рядки читаються Core-запитом і серіалізуються скомпільованим енкодером моделі.
+    """
+    try:
+        fields = requested_fields(crud)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    encoder = encoder_for(crud.model, fields)
+    if wants_stream():
+        return ndjson_response(crud, encoder)
+    if 'limit' not in request.args and 'after' not in request.args:
+        # get_rows довідників іде через кеш рядків
+        rows = crud.get_rows(encoder.fields)
+        with timing.serializing():
+            body = encoder.dumps_rows(rows)
+        return json_bytes_response(body)
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        rows, next_cursor = crud.get_page(limit, request.args.get('after'), encoder.fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with timing.serializing():
+        body = b'{"items":' + encoder.dumps_rows(rows) + b',"next_cursor":' + dumps(next_cursor) + b'}'
+    return json_bytes_response(body)
+
+MAX_BULK_ROWS = 10000
+
+def bulk_create_response(crud):
+    """Створює записи пакетом; повертає id створених та помилки по рядках"""
+    rows = request.get_json()
+    if not isinstance(rows, list):
+        return jsonify({'error': 'Expected a JSON array of objects'}), 400
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({'error': f'At most {MAX_BULK_ROWS} rows per request'}), 413
+    try:
+        result = crud.create_many(rows)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    if not result['errors']:
+        return jsonify(result), 201
+    return jsonify(result), 207 if result['created'] else 400
 
 # Маршрути для Department
-@app.route('/departments', methods=['POST'])
+@api.route('/departments', methods=['POST'])
 @jwt_required()
 def create_department():
     data = request.get_json()
@@ -91,14 +217,20 @@ def create_department():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
-@app.route('/departments', methods=['GET'])
+@api.route('/departments', methods=['GET'])
 @jwt_required()
+@conditional(Department)
 def get_departments():
-    departments = Department.query.all()
-    return jsonify([dept.to_dict() for dept in departments])
+    return list_response(DepartmentCRUD)
+
+@api.route('/departments/<int:department_id>', methods=['GET'])
+@jwt_required()
+@conditional(Department)
+def get_department(department_id):
+    return item_response(DepartmentCRUD, department_id)
 
 # Маршрути для Doctor
-@app.route('/doctors', methods=['POST'])
+@api.route('/doctors', methods=['POST'])
 def create_doctor():
     data = request.get_json()
     doctor = Doctor(
@@ -117,13 +249,29 @@ def create_doctor():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
-@app.route('/doctors', methods=['GET'])
+@api.route('/doctors/bulk', methods=['POST'])
+def create_doctors_bulk():
+    return bulk_create_response(DoctorCRUD)
+
+@api.route('/doctors', methods=['GET'])
+@conditional(Doctor)
 def get_doctors():
-    doctors = Doctor.query.all()
-    return jsonify([doc.to_dict() for doc in doctors])
+    return list_response(DoctorCRUD)
+
+@api.route('/doctors/<int:doctor_id>', methods=['GET'])
+@conditional(Doctor)
+def get_doctor(doctor_id):
+    return item_response(DoctorCRUD, doctor_id)
+
+@api.route('/doctors/<int:doctor_id>/workload', methods=['GET'])
+@conditional(Doctor, Department, Appointment, Prescription, Patient)
+def get_doctor_workload(doctor_id):
+    doctor = DoctorCRUD.get_workload(doctor_id)
+    with timing.serializing():
+        return jsonify(doctor.to_workload_dict())
 
 # Маршрути для Patient
-@app.route('/patients', methods=['POST'])
+@api.route('/patients', methods=['POST'])
 def create_patient():
     data = request.get_json()
     patient = Patient(
@@ -143,12 +291,42 @@ def create_patient():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
-@app.route('/patients', methods=['GET'])
+@api.route('/patients/bulk', methods=['POST'])
+def create_patients_bulk():
+    return bulk_create_response(PatientCRUD)
+
+@api.route('/patients', methods=['GET'])
+@conditional(Patient)
 def get_patients():
-    patients = Patient.query.all()
-    return jsonify([patient.to_dict() for patient in patients])
+    return list_response(PatientCRUD)
 
-@app.route('/patients/<int:patient_id>', methods=['PUT'])
+@api.route('/patients/search', methods=['GET'])
+@conditional(Patient)
+def search_patients():
+    """Пацієнти за частиною імені, прізвища, email чи телефону (?q=), найсхожіші першими"""
+    try:
+        encoder = encoder_for(Patient, requested_fields(PatientCRUD))
+        limit = parse_limit(request.args.get('limit', str(search_index.DEFAULT_LIMIT)))
+        rows = PatientCRUD.search(request.args.get('q', ''), limit, encoder.fields)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with timing.serializing():
+        body = encoder.dumps_rows(rows)
+    return json_bytes_response(body)
+
+@api.route('/patients/<int:patient_id>', methods=['GET'])
+@conditional(Patient)
+def get_patient(patient_id):
+    return item_response(PatientCRUD, patient_id)
+
+@api.route('/patients/<int:patient_id>/chart', methods=['GET'])
+@conditional(Patient, Appointment, Prescription, Doctor)
+def get_patient_chart(patient_id):
+    patient = PatientCRUD.get_chart(patient_id)
+    with timing.serializing():
+        return jsonify(patient.to_chart_dict())
+
+@api.route('/patients/<int:patient_id>', methods=['PUT'])
 def update_patient(patient_id):
     patient = Patient.query.get_or_404(patient_id)
     data = request.get_json()
@@ -167,7 +345,7 @@ def update_patient(patient_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
-@app.route('/patients/<int:patient_id>', methods=['DELETE'])
+@api.route('/patients/<int:patient_id>', methods=['DELETE'])
 def delete_patient(patient_id):
     patient = Patient.query.get_or_404(patient_id)
     try:
@@ -179,30 +357,78 @@ def delete_patient(patient_id):
         return jsonify({'error': str(e)}), 400
 
 # Маршрути для Appointment
-@app.route('/appointments', methods=['POST'])
+@api.route('/appointments', methods=['POST'])
 def create_appointment():
     data = request.get_json()
-    appointment = Appointment(
-        patient_id=data['patient_id'],
-        doctor_id=data['doctor_id'],
-        appointment_datetime=datetime.fromisoformat(data['appointment_datetime']),
-        reason_for_visit=data['reason_for_visit']
-    )
     try:
-        db.session.add(appointment)
-        db.session.commit()
+        appointment = AppointmentCRUD.create(
+            patient_id=data['patient_id'],
+            doctor_id=data['doctor_id'],
+            appointment_datetime=datetime.fromisoformat(data['appointment_datetime']),
+            reason_for_visit=data['reason_for_visit']
+        )
         return jsonify(appointment.to_dict()), 201
+    except AppointmentConflict as e:
+        return jsonify({'error': str(e), 'conflicting_appointment_id': e.appointment_id}), 409
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
-@app.route('/appointments', methods=['GET'])
+@api.route('/appointments/bulk', methods=['POST'])
+def create_appointments_bulk():
+    return bulk_create_response(AppointmentCRUD)
+
+def schedule_response():
+    """Прийоми за [from, to), за потреби лише одного лікаря (?doctor_id=)"""
+    try:
+        fields = requested_fields(AppointmentCRUD)
+        start = parse_datetime(request.args['from'], 'from')
+        end = parse_datetime(request.args['to'], 'to')
+    except KeyError:
+        return jsonify({'error': "Both 'from' and 'to' are required"}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    doctor_id = request.args.get('doctor_id')
+    if doctor_id is not None and not doctor_id.isdigit():
+        return jsonify({'error': "'doctor_id' must be an integer"}), 400
+    if end <= start:
+        return jsonify({'error': "'to' must be later than 'from'"}), 400
+    encoder = encoder_for(Appointment, fields)
+    rows = AppointmentCRUD.get_range(doctor_id and int(doctor_id), start, end, encoder.fields)
+    with timing.serializing():
+        body = encoder.dumps_rows(rows)
+    return json_bytes_response(body)
+
+@api.route('/appointments', methods=['GET'])
+@conditional(Appointment)
 def get_appointments():
-    appointments = Appointment.query.all()
-    return jsonify([apt.to_dict() for apt in appointments])
+    if {'doctor_id', 'from', 'to'} & request.args.keys():
+        return schedule_response()
+    return list_response(AppointmentCRUD)
+
+@api.route('/slots', methods=['GET'])
+def find_slots():
+    """Найраніші вільні слоти лікарів зі спеціальністю ?specialty= у [from, to), за замовчуванням - тиждень"""
+    try:
+        specialty, start, end, duration, limit = scheduling.parse_slot_query(
+            request.args, current_app.config['APPOINTMENT_MINUTES']
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    doctor_ids = [doctor_id for doctor_id, in DoctorCRUD.get_rows(('id',), specialty=specialty)]
+    slots = scheduling.index.free_slots(doctor_ids, start, end, duration, limit)
+    return jsonify([
+        {'doctor_id': doctor_id, 'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+        for doctor_id, slot_start, slot_end in slots
+    ])
+
+@api.route('/appointments/<int:appointment_id>', methods=['GET'])
+@conditional(Appointment)
+def get_appointment(appointment_id):
+    return item_response(AppointmentCRUD, appointment_id)
 
 # Маршрути для Prescription
-@app.route('/prescriptions', methods=['POST'])
+@api.route('/prescriptions', methods=['POST'])
 def create_prescription():
     data = request.get_json()
     prescription = Prescription(
@@ -222,10 +448,86 @@ def create_prescription():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
-@app.route('/prescriptions', methods=['GET'])
+@api.route('/prescriptions/bulk', methods=['POST'])
+def create_prescriptions_bulk():
+    return bulk_create_response(PrescriptionCRUD)
+
+@api.route('/prescriptions', methods=['GET'])
+@conditional(Prescription)
 def get_prescriptions():
-    prescriptions = Prescription.query.all()
-    return jsonify([pres.to_dict() for pres in prescriptions])
+    return list_response(PrescriptionCRUD)
+
+@api.route('/prescriptions/<int:prescription_id>', methods=['GET'])
+@conditional(Prescription)
+def get_prescription(prescription_id):
+    return item_response(PrescriptionCRUD, prescription_id)
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(metrics.collect()), content_type=metrics.CONTENT_TYPE)
+
+def init_db():
+    """Створює таблиці та індекси; викликається явно, а не під час імпорту"""
+    db.create_all()
+
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    check_config(app.config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', pooling.engine_options(app.config))
+    jwt.init_app(app)
+    db.init_app(app)
+    hashing.configure(app.config['PASSWORD_HASH_ROUNDS'], app.config['PASSWORD_HASH_WORKERS'])
+    cache.configure(app.config['REFERENCE_CACHE_SIZE'], app.config['REFERENCE_CACHE_TTL'])
+    versions.configure(app.config['TABLE_VERSIONS_PATH'])
+    booking.configure(app.config['APPOINTMENT_MINUTES'])
+    scheduling.configure(
+        app.config['APPOINTMENT_MINUTES'], app.config['CLINIC_OPEN_HOUR'],
+        app.config['CLINIC_CLOSE_HOUR'], app.config['SCHEDULE_HORIZON_DAYS']
+    )
+    # Відкликані токени: спільне сховище з TTL до exp та LRU-кешем у процесі
+    app.extensions['blocklist'] = create_blocklist(app.config)
+    app.register_blueprint(api)
+
+    # Server-Timing (db, serialize, total) та журнал повільних запитів
+    timing.install(app.config['SLOW_QUERY_MS'])
+    if app.config['SLOW_QUERY_LOG']:
+        handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'], encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        timing.slow_query_log.addHandler(handler)
+
+    # Метрики запитів; кожен воркер скидає свій знімок у METRICS_DIR для /metrics
+    metrics.configure(app.config['METRICS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+
+    @app.before_request
+    def start_request():
+        timing.start_request()
+        metrics.local.start()
+        g.metrics_started = True
+
+    @app.after_request
+    def finish_request(response):
+        if app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = timing.server_timing()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.local.observe(route, request.method, response.status_code, timing.elapsed())
+        return response
+
+    @app.teardown_request
+    def release_request(exc):
+        if g.pop('metrics_started', False):
+            metrics.local.finish()
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create database tables and indexes."""
+        init_db()
+        print("Database initialized")
+
+    return app
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()
     app.run(debug=True)
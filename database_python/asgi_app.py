@@ -0,0 +1,554 @@
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import wraps
+
+import jwt as pyjwt
+from sqlalchemy import select, insert, update, delete, exists
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import joinedload, selectinload
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from models.hospital import Department, Doctor, Patient, Appointment, Prescription
+from models.user import User, TokenBlocklist
+from crud import BaseCRUD, DepartmentCRUD, DoctorCRUD, PatientCRUD, AppointmentCRUD, PrescriptionCRUD
+from pagination import keyset_filter, split_page, parse_datetime, parse_limit
+from serializers import parse_fields, encoder_for, dumps
+from blocklist import LRUFront, utc_from_timestamp
+from changes import mark_changed
+from config import config_dict, check_config
+import booking
+import hashing
+import metrics
+import versions
+import pooling
+import scheduling
+import search_index
+
+# Асинхронний режим: ті самі маршрути й JWT, що й у app.py, але на ASGI з асинхронним драйвером.
+# Запуск: uvicorn asgi_app:create_asgi_app --factory --workers 4
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_ROWS = 500
+MAX_BULK_ROWS = 10000
+
+def async_database_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+class AuthError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class Resource:
+    """Опис ресурсу: модель, ключ пагінації, парсер тіла, чи потрібен JWT, чи це бронювання часу лікаря
+    та чи приймає список параметри розкладу (?doctor_id=, ?from=, ?to=)"""
+
+    def __init__(self, name, crud, keys, auth=False, bulk=True, booking=False, schedule=False):
+        self.name = name
+        self.crud = crud
+        self.model = crud.model
+        self.keys = keys
+        self.auth = auth
+        self.bulk = bulk
+        self.booking = booking
+        self.schedule = schedule
+
+RESOURCES = [
+    Resource('departments', DepartmentCRUD, [Department.id], auth=True, bulk=False),
+    Resource('doctors', DoctorCRUD, [Doctor.id]),
+    Resource('patients', PatientCRUD, [Patient.id]),
+    Resource('appointments', AppointmentCRUD, [Appointment.appointment_datetime, Appointment.id],
+             booking=True, schedule=True),
+    Resource('prescriptions', PrescriptionCRUD, [Prescription.id]),
+]
+
+def error(message, status=400):
+    return JSONResponse({'error': message}, status_code=status)
+
+def json_bytes(body, status=200):
+    return Response(body, status_code=status, media_type='application/json')
+
+class AsyncAPI:
+    def __init__(self, config):
+        self.config = config
+        self.engine = create_async_engine(
+            async_database_url(config['SQLALCHEMY_DATABASE_URI']),
+            **pooling.engine_options(config, poolclass=None)
+        )
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.secret = config['JWT_SECRET_KEY']
+        self.access_expires = config['JWT_ACCESS_TOKEN_EXPIRES']
+        self.refresh_expires = config['JWT_REFRESH_TOKEN_EXPIRES']
+        self.blocklist_front = LRUFront(config.get('BLOCKLIST_CACHE_SIZE', 10000))
+        self.negative_ttl = config.get('BLOCKLIST_NEGATIVE_TTL', 5)
+        hashing.configure(config['PASSWORD_HASH_ROUNDS'], config['PASSWORD_HASH_WORKERS'])
+        booking.configure(config['APPOINTMENT_MINUTES'])
+        scheduling.configure(
+            config['APPOINTMENT_MINUTES'], config['CLINIC_OPEN_HOUR'],
+            config['CLINIC_CLOSE_HOUR'], config['SCHEDULE_HORIZON_DAYS']
+        )
+        self.versions = versions.configure(config['TABLE_VERSIONS_PATH'])
+        metrics.configure(config['METRICS_DIR'], config['METRICS_FLUSH_INTERVAL'])
+
+    # JWT у тому ж форматі, що й flask_jwt_extended, тож токени взаємозамінні між режимами
+    def create_token(self, identity, token_type):
+        now = datetime.now(timezone.utc)
+        expires = self.access_expires if token_type == 'access' else self.refresh_expires
+        payload = {
+            'fresh': False,
+            'iat': now,
+            'jti': str(uuid.uuid4()),
+            'type': token_type,
+            'sub': identity,
+            'nbf': now,
+            'exp': now + expires,
+        }
+        return pyjwt.encode(payload, self.secret, algorithm='HS256')
+
+    async def is_revoked(self, jti, expires_at):
+        cached = self.blocklist_front.get(jti)
+        if cached is not None:
+            return cached
+        now = utc_from_timestamp(time.time())
+        async with self.sessions() as session:
+            revoked = await session.scalar(select(exists().where(
+                TokenBlocklist.jti == jti, TokenBlocklist.expires_at > now
+            )))
+        if revoked:
+            self.blocklist_front.put(jti, True, expires_at)
+        elif self.negative_ttl > 0:
+            self.blocklist_front.put(jti, False, min(expires_at, time.time() + self.negative_ttl))
+        return revoked
+
+    async def revoke(self, jti, expires_at):
+        async with self.sessions() as session:
+            if not await session.get(TokenBlocklist, jti):
+                session.add(TokenBlocklist(jti=jti, expires_at=utc_from_timestamp(expires_at)))
+                await session.commit()
+        self.blocklist_front.put(jti, True, expires_at)
+
+    async def verify_jwt(self, request, token_type='access'):
+        header = request.headers.get('Authorization')
+        if not header:
+            raise AuthError(401, 'Missing Authorization Header')
+        parts = header.split()
+        if len(parts) != 2 or parts[0] != 'Bearer':
+            raise AuthError(401, "Missing 'Bearer' type in 'Authorization' header. "
+                                 "Expected 'Authorization: Bearer <JWT>'")
+        try:
+            payload = pyjwt.decode(parts[1], self.secret, algorithms=['HS256'])
+        except pyjwt.ExpiredSignatureError:
+            raise AuthError(401, 'Token has expired')
+        except pyjwt.InvalidTokenError as e:
+            raise AuthError(422, str(e))
+        if payload.get('type') != token_type:
+            raise AuthError(422, f'Only {token_type} tokens are allowed')
+        if await self.is_revoked(payload['jti'], payload['exp']):
+            raise AuthError(401, 'Token has been revoked')
+        return payload
+
+def jwt_required(api, token_type='access', optional=False):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request):
+            if not optional:
+                try:
+                    request.state.jwt = await api.verify_jwt(request, token_type)
+                except AuthError as e:
+                    return JSONResponse({'msg': e.message}, status_code=e.status)
+            return await view(request)
+        return wrapper
+    return decorator
+
+def conditional(api, *models):
+    """Ті самі ETag, що й у app.py: 304 без звернення до БД"""
+    tables = [model.__tablename__ for model in models]
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request):
+            path = request.url.path + ('?' + request.url.query if request.url.query else '?')
+            etag = api.versions.etag(tables, path, request.headers.get('Accept', ''))
+            quoted = f'"{etag}"'
+            if_none_match = request.headers.get('If-None-Match', '')
+            if quoted in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+                return Response(status_code=304, headers={'ETag': quoted})
+            response = await view(request)
+            if response.status_code == 200:
+                response.headers['ETag'] = quoted
+            return response
+        return wrapper
+    return decorator
+
+def wants_stream(request):
+    if request.query_params.get('stream') in ('1', 'true'):
+        return True
+    return NDJSON_MIMETYPE in request.headers.get('Accept', '')
+
+def resource_routes(api, resource):
+    model, keys = resource.model, resource.keys
+    guard = jwt_required(api, optional=not resource.auth)
+    table = model.__table__
+
+    def columns_for(fields):
+        return BaseCRUD.projection(model, keys, fields) or list(table.columns)
+
+    async def schedule_view(params, encoder):
+        """Прийоми за [from, to), за потреби лише одного лікаря - як schedule_response у app.py"""
+        try:
+            start = parse_datetime(params['from'], 'from')
+            end = parse_datetime(params['to'], 'to')
+        except KeyError:
+            return error("Both 'from' and 'to' are required")
+        except ValueError as e:
+            return error(str(e))
+        doctor_id = params.get('doctor_id')
+        if doctor_id is not None and not doctor_id.isdigit():
+            return error("'doctor_id' must be an integer")
+        if end <= start:
+            return error("'to' must be later than 'from'")
+        statement = resource.crud.range_statement(doctor_id and int(doctor_id), start, end, encoder.fields)
+        async with api.sessions() as session:
+            rows = (await session.execute(statement)).all()
+        return json_bytes(encoder.dumps_rows(rows))
+
+    @guard
+    @conditional(api, model)
+    async def list_view(request):
+        try:
+            fields = parse_fields(model, request.query_params.get('fields'))
+        except ValueError as e:
+            return error(str(e))
+        encoder = encoder_for(model, fields)
+        if resource.schedule and {'doctor_id', 'from', 'to'} & request.query_params.keys():
+            return await schedule_view(request.query_params, encoder)
+        columns = BaseCRUD.projection(model, keys, encoder.fields)
+        statement = select(*columns)
+
+        if wants_stream(request):
+            async def generate():
+                async with api.sessions() as session:
+                    result = await session.stream(statement.order_by(*keys).execution_options(
+                        yield_per=STREAM_CHUNK_ROWS
+                    ))
+                    async for chunk in result.partitions(STREAM_CHUNK_ROWS):
+                        yield encoder.ndjson_rows(chunk)
+            return StreamingResponse(generate(), media_type=NDJSON_MIMETYPE)
+
+        params = request.query_params
+        async with api.sessions() as session:
+            if 'limit' not in params and 'after' not in params:
+                rows = (await session.execute(statement.order_by(*keys))).all()
+                return json_bytes(encoder.dumps_rows(rows))
+            try:
+                limit = parse_limit(params.get('limit'))
+                statement = keyset_filter(statement, keys, params.get('after'))
+            except ValueError as e:
+                return error(str(e))
+            rows = (await session.execute(statement.order_by(*keys).limit(limit + 1))).all()
+        rows, next_cursor = split_page(rows, keys, limit)
+        return json_bytes(
+            b'{"items":' + encoder.dumps_rows(rows) + b',"next_cursor":' + dumps(next_cursor) + b'}'
+        )
+
+    @guard
+    @conditional(api, model)
+    async def item_view(request):
+        try:
+            encoder = encoder_for(model, parse_fields(model, request.query_params.get('fields')))
+        except ValueError as e:
+            return error(str(e))
+        async with api.sessions() as session:
+            row = (await session.execute(
+                select(*columns_for(encoder.fields)).where(table.c.id == request.path_params['id'])
+            )).first()
+        if row is None:
+            return error('Not Found', 404)
+        return json_bytes(dumps(encoder.encode(row)))
+
+    @guard
+    async def create_view(request):
+        try:
+            values = resource.crud.parse(await request.json())
+        except KeyError as e:
+            return error(f"Missing field {e}")
+        except (ValueError, TypeError) as e:
+            return error(str(e))
+        doctor_ids = [values['doctor_id']] if resource.booking else []
+        async with api.sessions() as session:
+            try:
+                async with booking.async_doctors_locked(session, doctor_ids):
+                    if resource.booking:
+                        await session.run_sync(
+                            booking.check_available, values['doctor_id'], values['appointment_datetime']
+                        )
+                    row = (await session.execute(
+                        insert(model).values(**values).returning(*table.columns)
+                    )).first()
+                    mark_changed(session.sync_session, table.name)
+                    await session.commit()
+            except booking.AppointmentConflict as e:
+                return JSONResponse({'error': str(e), 'conflicting_appointment_id': e.appointment_id}, status_code=409)
+            except Exception as e:
+                await session.rollback()
+                return error(str(e))
+        return json_bytes(dumps(encoder_for(model).encode(row)), status=201)
+
+    @guard
+    async def bulk_view(request):
+        rows = await request.json()
+        if not isinstance(rows, list):
+            return error('Expected a JSON array of objects')
+        if len(rows) > MAX_BULK_ROWS:
+            return error(f'At most {MAX_BULK_ROWS} rows per request', 413)
+        values, positions, errors = BaseCRUD.validate_rows(resource.crud.parse, rows)
+        doctor_ids = [value['doctor_id'] for value in values] if resource.booking else []
+        ids = []
+        if values:
+            async with api.sessions() as session:
+                try:
+                    async with booking.async_doctors_locked(session, doctor_ids):
+                        if resource.booking:
+                            values, positions = await session.run_sync(
+                                booking.reject_conflicts, values, positions, errors
+                            )
+                        if values:
+                            ids = (await session.scalars(
+                                insert(model).returning(model.id, sort_by_parameter_order=True), values
+                            )).all()
+                            mark_changed(session.sync_session, table.name)
+                        await session.commit()
+                except Exception as e:
+                    await session.rollback()
+                    return error(str(e))
+        result = {
+            'created': [{'index': index, 'id': id_} for index, id_ in zip(positions, ids)],
+            'errors': errors
+        }
+        status = 201 if not errors else (207 if ids else 400)
+        return JSONResponse(result, status_code=status)
+
+    routes = [
+        Route(f'/{resource.name}', list_view, methods=['GET']),
+        Route(f'/{resource.name}', create_view, methods=['POST']),
+        Route(f'/{resource.name}/{{id:int}}', item_view, methods=['GET']),
+    ]
+    if resource.bulk:
+        routes.append(Route(f'/{resource.name}/bulk', bulk_view, methods=['POST']))
+    return routes
+
+def auth_routes(api):
+    async def register(request):
+        data = await request.json()
+        async with api.sessions() as session:
+            if await session.scalar(select(User.id).where(User.username == data['username'])):
+                return JSONResponse({'message': 'Username already exists'}, status_code=400)
+            password_hash = await asyncio.to_thread(hashing.hash_password, data['password'])
+            try:
+                session.add(User(username=data['username'], password_hash=password_hash))
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                return JSONResponse({'message': str(e)}, status_code=400)
+        return JSONResponse({'message': 'User created successfully'}, status_code=201)
+
+    async def login(request):
+        data = await request.json()
+        async with api.sessions() as session:
+            user = await session.scalar(select(User).where(User.username == data['username']))
+            if user and await asyncio.to_thread(hashing.verify_password, data['password'], user.password_hash):
+                if hashing.needs_rehash(user.password_hash):
+                    user.password_hash = await asyncio.to_thread(hashing.hash_password, data['password'])
+                    await session.commit()
+                return JSONResponse({
+                    'access_token': api.create_token(str(user.id), 'access'),
+                    'refresh_token': api.create_token(str(user.id), 'refresh')
+                })
+        return JSONResponse({'message': 'Invalid credentials'}, status_code=401)
+
+    @jwt_required(api, token_type='refresh')
+    async def refresh(request):
+        return JSONResponse({'access_token': api.create_token(request.state.jwt['sub'], 'access')})
+
+    @jwt_required(api)
+    async def logout(request):
+        await api.revoke(request.state.jwt['jti'], request.state.jwt['exp'])
+        return JSONResponse({'message': 'Successfully logged out'})
+
+    return [
+        Route('/register', register, methods=['POST']),
+        Route('/login', login, methods=['POST']),
+        Route('/refresh', refresh, methods=['POST']),
+        Route('/logout', logout, methods=['POST']),
+    ]
+
+def patient_routes(api):
+    @conditional(api, Patient, Appointment, Prescription, Doctor)
+    async def chart(request):
+        async with api.sessions() as session:
+            patient = await session.scalar(select(Patient).options(
+                selectinload(Patient.appointments).joinedload(Appointment.doctor),
+                selectinload(Patient.prescriptions).joinedload(Prescription.doctor)
+            ).where(Patient.id == request.path_params['id']))
+            if patient is None:
+                return error('Not Found', 404)
+            return JSONResponse(patient.to_chart_dict())
+
+    @conditional(api, Doctor, Department, Appointment, Prescription, Patient)
+    async def workload(request):
+        async with api.sessions() as session:
+            doctor = await session.scalar(select(Doctor).options(
+                joinedload(Doctor.department),
+                selectinload(Doctor.appointments).joinedload(Appointment.patient),
+                selectinload(Doctor.prescriptions).joinedload(Prescription.patient)
+            ).where(Doctor.id == request.path_params['id']))
+            if doctor is None:
+                return error('Not Found', 404)
+            return JSONResponse(doctor.to_workload_dict())
+
+    @conditional(api, Patient)
+    async def search(request):
+        """Як search_patients у app.py; n-грамний індекс читає БД через синхронну сесію run_sync"""
+        params = request.query_params
+        try:
+            encoder = encoder_for(Patient, parse_fields(Patient, params.get('fields')))
+            limit = parse_limit(params.get('limit', str(search_index.DEFAULT_LIMIT)))
+            async with api.sessions() as session:
+                rows = await session.run_sync(
+                    lambda sync_session: PatientCRUD.search(
+                        params.get('q', ''), limit, encoder.fields, session=sync_session
+                    )
+                )
+        except ValueError as e:
+            return error(str(e))
+        return json_bytes(encoder.dumps_rows(rows))
+
+    async def update_patient(request):
+        try:
+            values = PatientCRUD.parse_partial(await request.json())
+        except (ValueError, TypeError) as e:
+            return error(str(e))
+        async with api.sessions() as session:
+            try:
+                if values:
+                    statement = update(Patient).values(**values).returning(*Patient.__table__.columns)
+                else:
+                    statement = select(*Patient.__table__.columns)
+                row = (await session.execute(statement.where(Patient.id == request.path_params['id']))).first()
+                if row is None:
+                    return error('Not Found', 404)
+                mark_changed(session.sync_session, 'patients')
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                return error(str(e))
+        return json_bytes(dumps(encoder_for(Patient).encode(row)))
+
+    async def delete_patient(request):
+        async with api.sessions() as session:
+            try:
+                result = await session.execute(delete(Patient).where(Patient.id == request.path_params['id']))
+                if result.rowcount == 0:
+                    return error('Not Found', 404)
+                mark_changed(session.sync_session, 'patients')
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                return error(str(e))
+        return Response(status_code=204)
+
+    return [
+        Route('/patients/search', search, methods=['GET']),
+        Route('/patients/{id:int}/chart', chart, methods=['GET']),
+        Route('/doctors/{id:int}/workload', workload, methods=['GET']),
+        Route('/patients/{id:int}', update_patient, methods=['PUT']),
+        Route('/patients/{id:int}', delete_patient, methods=['DELETE']),
+    ]
+
+def slot_routes(api):
+    async def find_slots(request):
+        """Як find_slots у app.py; індекс розкладу читає БД через синхронну сесію run_sync"""
+        try:
+            specialty, start, end, duration, limit = scheduling.parse_slot_query(
+                request.query_params, api.config['APPOINTMENT_MINUTES']
+            )
+        except ValueError as e:
+            return error(str(e))
+        async with api.sessions() as session:
+            doctor_ids = (await session.scalars(select(Doctor.id).where(Doctor.specialty == specialty))).all()
+            slots = await session.run_sync(
+                lambda sync_session: scheduling.index.free_slots(
+                    doctor_ids, start, end, duration, limit, session=sync_session
+                )
+            )
+        return JSONResponse([
+            {'doctor_id': doctor_id, 'start': slot_start.isoformat(), 'end': slot_end.isoformat()}
+            for doctor_id, slot_start, slot_end in slots
+        ])
+
+    return [Route('/slots', find_slots, methods=['GET'])]
+
+def metrics_routes(api):
+    async def get_metrics(request):
+        """Знімки всіх воркерів з METRICS_DIR, зокрема Flask-воркерів з тим самим каталогом"""
+        body = await asyncio.to_thread(lambda: metrics.render(metrics.collect()))
+        return Response(body, media_type=metrics.CONTENT_TYPE)
+
+    return [Route('/metrics', get_metrics, methods=['GET'])]
+
+class RequestMetricsMiddleware:
+    """Як before_request/after_request у app.py: запит рахується в metrics.local під шаблоном
+    маршруту, який Starlette записує в scope['route']"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        metrics.local.start()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            metrics.local.observe(
+                route.path if route is not None else 'unmatched', scope['method'], status,
+                time.perf_counter() - started
+            )
+            metrics.local.finish()
+
+def create_asgi_app(config=None):
+    config = config or config_dict()
+    check_config(config)
+    api = AsyncAPI(config)
+    routes = auth_routes(api) + patient_routes(api) + slot_routes(api) + metrics_routes(api)
+    for resource in RESOURCES:
+        routes += resource_routes(api, resource)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await api.engine.dispose()
+
+    app = Starlette(routes=routes, middleware=[Middleware(RequestMetricsMiddleware)], lifespan=lifespan)
+    app.state.api = api
+    return app
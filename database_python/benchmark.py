@@ -1,205 +1,311 @@
-import requests
-import time
-import random
-from datetime import datetime, timedelta
+import argparse
 import json
-from faker import Faker
+import math
+import random
 import statistics
-import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+import requests
+from faker import Faker
 
 BASE_URL = 'http://localhost:5000'
 fake = Faker()
 
-def get_auth_header():
-    """Отримує токен автентифікації"""
+def get_auth_header(session, base_url=BASE_URL):
+    """Отримує токен автентифікації один раз перед навантаженням"""
     login_data = {
         'username': 'test_user',
         'password': 'test_password'
     }
-    
+
     # Спробуйте увійти
-    response = requests.post(f"{BASE_URL}/login", json=login_data)
-    
+    response = session.post(f"{base_url}/login", json=login_data)
+
     # Якщо користувач не існує, створіть його
     if response.status_code == 401:
-        requests.post(f"{BASE_URL}/register", json=login_data)
-        response = requests.post(f"{BASE_URL}/login", json=login_data)
-    
+        session.post(f"{base_url}/register", json=login_data)
+        response = session.post(f"{base_url}/login", json=login_data)
+
     tokens = response.json()
     return {'Authorization': f'Bearer {tokens["access_token"]}'}
 
-def generate_test_data(count):
-    """Генерує тестові дані"""
-    departments = []
-    doctors = []
-    patients = []
-    
-    # Список можливих відділень
-    department_types = [
-        'Cardiology', 'Neurology', 'Pediatrics', 'Surgery',
-        'Orthopedics', 'Oncology', 'Emergency', 'Psychiatry'
-    ]
-    
-    # Список можливих спеціальностей
-    specialties = [
-        'Cardiologist', 'Neurologist', 'Pediatrician', 'Surgeon',
-        'Orthopedist', 'Oncologist', 'Emergency Physician', 'Psychiatrist'
-    ]
-    
-    # Створюємо відділення
-    for i in range(max(count // 100, 1)):  # 1 відділення на 100 записів
-        departments.append({
-            'name': f'Department of {random.choice(department_types)}',
-            'floor_number': random.randint(1, 5)
-        })
-    
-    # Створюємо лікарів
-    for i in range(max(count // 50, 1)):  # 1 лікар на 50 записів
-        doctors.append({
-            'first_name': fake.first_name(),
-            'last_name': fake.last_name(),
-            'specialty': random.choice(specialties),
-            'phone_number': fake.phone_number(),
-            'email': fake.email(),
-            'department_id': 1  # Буде оновлено після створення відділень
-        })
-    
-    # Створюємо пацієнтів
-    for i in range(count):
-        patients.append({
+def generate_patients(count):
+    """Невеликий пул тіл запитів для вставок; генерується до старту навантаження.
+    email унікальний у БД, тому кожна вставка отримує власний (Worker.unique_email)"""
+    return [
+        {
             'first_name': fake.first_name(),
             'last_name': fake.last_name(),
             'date_of_birth': fake.date_of_birth(minimum_age=10, maximum_age=90).strftime('%Y-%m-%d'),
-            'gender': random.choice(['MALE', 'FEMALE']),
+            'gender': random.choice(['Male', 'Female']),
             'phone_number': fake.phone_number(),
             'address': fake.address(),
             'email': fake.email()
-        })
-    
-    return departments, doctors, patients
-
-def measure_performance(operation_name, operation_func, iterations=1):
-    """Вимірює час виконання операції"""
-    times = []
-    for _ in range(iterations):
-        start_time = time.time()
-        result = operation_func()
-        end_time = time.time()
-        times.append(end_time - start_time)
-    
-    avg_time = statistics.mean(times)
-    print(f"{operation_name}: {avg_time:.4f} seconds (average of {iterations} iterations)")
-    return avg_time
-
-def run_benchmark(data_size):
-    print(f"\nRunning benchmark for {data_size} records...")
-    
-    departments, doctors, patients = generate_test_data(data_size)
-    
-    # Спочатку створюємо базові дані
-    print("Creating initial data...")
-    
-    # Створюємо відділення
-    for dept in departments[:1]:  # Створюємо хоча б одне відділення
-        response = requests.post(f"{BASE_URL}/departments", json=dept)
+        }
+        for _ in range(count)
+    ]
+
+def fetch_ids(session, base_url, resource):
+    """Усі id ресурсу одним NDJSON-потоком, щоб операції звертались до випадкових рядків"""
+    response = session.get(f"{base_url}/{resource}?fields=id&stream=1", stream=True)
+    response.raise_for_status()
+    return [json.loads(line)['id'] for line in response.iter_lines() if line]
+
+class Worker:
+    """Власна keep-alive сесія та власні створені записи для пар вставка/видалення"""
+
+    def __init__(self, context):
+        self.context = context
+        self.session = requests.Session()
+        self.session.headers.update(context['headers'])
+        self.created = []
+
+    def url(self, path):
+        return self.context['base_url'] + path
+
+    def patient_id(self):
+        return random.choice(self.context['patient_ids'])
+
+    def unique_email(self):
+        return f"load-{uuid.uuid4().hex}@example.com"
+
+    # Операції повертають HTTP-статус
+    def list_patients(self):
+        return self.session.get(self.url('/patients?limit=50')).status_code
+
+    def get_patient(self):
+        return self.session.get(self.url(f'/patients/{self.patient_id()}')).status_code
+
+    def patient_chart(self):
+        return self.session.get(self.url(f'/patients/{self.patient_id()}/chart')).status_code
+
+    def list_doctors(self):
+        return self.session.get(self.url('/doctors')).status_code
+
+    def list_appointments(self):
+        return self.session.get(self.url('/appointments?limit=50')).status_code
+
+    def insert_patient(self):
+        payload = dict(random.choice(self.context['payloads']), email=self.unique_email())
+        response = self.session.post(self.url('/patients'), json=payload)
         if response.status_code == 201:
-            dept_id = response.json()['id']
-            # Оновлюємо department_id для лікарів
-            for doctor in doctors:
-                doctor['department_id'] = dept_id
-    
-    # Створюємо одного лікаря
-    for doctor in doctors[:1]:  # Створюємо хоча б одного лікаря
-        requests.post(f"{BASE_URL}/doctors", json=doctor)
-    
-    print("Initial data created. Starting benchmarks...")
-    
-    # Тест INSERT
-    def test_insert():
-        headers = get_auth_header()
-        response = requests.post(
-            f"{BASE_URL}/patients",
-            json=random.choice(patients),
-            headers=headers
-        )
-        return response
-    
-    # Тест SELECT
-    def test_select():
-        headers = get_auth_header()
-        response = requests.get(f"{BASE_URL}/patients", headers=headers)
-        return response
-    
-    # Тест UPDATE (оновлюємо email випадкового пацієнта)
-    def test_update():
-        headers = get_auth_header()
-        patients_list = requests.get(f"{BASE_URL}/patients", headers=headers).json()
-        if patients_list:
-            patient = random.choice(patients_list)
-            patient['email'] = fake.email()
-            response = requests.put(f"{BASE_URL}/patients/{patient['id']}", json=patient, headers=headers)
-            return response
-        return None
-    
-    # Тест DELETE
-    def test_delete():
-        headers = get_auth_header()
-        patients_list = requests.get(f"{BASE_URL}/patients", headers=headers).json()
-        if patients_list:
-            patient = random.choice(patients_list)
-            response = requests.delete(f"{BASE_URL}/patients/{patient['id']}", headers=headers)
-            return response
-        return None
-
-    results = {
-        'data_size': data_size,
-        'insert': measure_performance('INSERT', test_insert, iterations=10),
-        'select': measure_performance('SELECT', test_select, iterations=10),
-        'update': measure_performance('UPDATE', test_update, iterations=10),
-        'delete': measure_performance('DELETE', test_delete, iterations=10)
+            self.created.append(response.json()['id'])
+        return response.status_code
+
+    def update_patient(self):
+        return self.session.put(
+            self.url(f'/patients/{self.patient_id()}'), json={'email': self.unique_email()}
+        ).status_code
+
+    def delete_patient(self):
+        # Видаляємо лише власні вставки, щоб розмір набору даних не дрейфував
+        if not self.created:
+            return self.insert_patient()
+        return self.session.delete(self.url(f'/patients/{self.created.pop()}')).status_code
+
+# Сценарії: операція -> вага
+SCENARIOS = {
+    'read': {
+        'list_patients': 30, 'get_patient': 30, 'patient_chart': 15,
+        'list_doctors': 15, 'list_appointments': 10,
+    },
+    'write': {
+        'insert_patient': 40, 'update_patient': 40, 'delete_patient': 20,
+    },
+    'mixed': {
+        'list_patients': 25, 'get_patient': 25, 'patient_chart': 10, 'list_doctors': 10,
+        'list_appointments': 10, 'insert_patient': 8, 'update_patient': 8, 'delete_patient': 4,
+    },
+}
+
+def percentile(sorted_values, p):
+    """Percentile за методом найближчого рангу: найменше значення, не менше за яке p% вибірки"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def run_worker(context, operations, weights, interval, stop_at, warmup_until, samples, errors, lock):
+    worker = Worker(context)
+    next_start = time.perf_counter() + random.uniform(0, interval or 0)
+    local_samples = defaultdict(list)
+    local_errors = defaultdict(int)
+    while True:
+        if interval:
+            # Відкрита модель: латентність рахується від запланованого старту,
+            # щоб повільні відповіді не зменшували навантаження (coordinated omission)
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            scheduled = next_start
+            next_start += interval
+        else:
+            scheduled = time.perf_counter()
+        if scheduled >= stop_at:
+            break
+        name = random.choices(operations, weights)[0]
+        try:
+            status = getattr(worker, name)()
+        except requests.RequestException:
+            status = None
+        finished = time.perf_counter()
+        if scheduled < warmup_until:
+            continue
+        local_samples[name].append(finished - scheduled)
+        if status is None or status >= 400:
+            local_errors[name] += 1
+    with lock:
+        for name, values in local_samples.items():
+            samples[name].extend(values)
+        for name, count in local_errors.items():
+            errors[name] += count
+
+def summarize(samples, errors, duration):
+    results = {}
+    all_latencies = []
+    for name, values in sorted(samples.items()):
+        values.sort()
+        all_latencies.extend(values)
+        results[name] = {
+            'requests': len(values),
+            'errors': errors.get(name, 0),
+            'throughput_rps': len(values) / duration,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000,
+            'mean_ms': statistics.mean(values) * 1000,
+        }
+    all_latencies.sort()
+    results['total'] = {
+        'requests': len(all_latencies),
+        'errors': sum(errors.values()),
+        'throughput_rps': len(all_latencies) / duration,
+        'p50_ms': percentile(all_latencies, 50) * 1000,
+        'p95_ms': percentile(all_latencies, 95) * 1000,
+        'p99_ms': percentile(all_latencies, 99) * 1000,
+        'max_ms': (all_latencies[-1] if all_latencies else 0.0) * 1000,
+        'mean_ms': (statistics.mean(all_latencies) if all_latencies else 0.0) * 1000,
     }
-    
     return results
 
-def main():
-    data_sizes = [1000, 10000, 100000, 1000000]
-    all_results = []
-    
-    for size in data_sizes:
-        results = run_benchmark(size)
-        all_results.append(results)
-        
-    # Зберігаємо результати в JSON файл
-    with open('benchmark_results.json', 'w') as f:
-        json.dump(all_results, f, indent=2)
-    
-    print("\nResults have been saved to benchmark_results.json")
-    
-    if len(sys.argv) > 1 and sys.argv[1] == '--compare':
-        compare_results('benchmark_results_before.json', 'benchmark_results_after.json')
-        return
+def run_load(base_url, scenario, concurrency, duration, warmup, target_rps=None):
+    session = requests.Session()
+    headers = get_auth_header(session, base_url)
+    session.headers.update(headers)
+    context = {
+        'base_url': base_url,
+        'headers': headers,
+        'patient_ids': fetch_ids(session, base_url, 'patients') or [1],
+        'payloads': generate_patients(500),
+    }
+    print(f"Scenario '{scenario}': {concurrency} workers, {len(context['patient_ids'])} patients, "
+          f"{warmup}s warm-up + {duration}s, target {target_rps or 'unlimited'} req/s")
+
+    operations = list(SCENARIOS[scenario])
+    weights = [SCENARIOS[scenario][name] for name in operations]
+    interval = concurrency / target_rps if target_rps else None
+    samples, errors, lock = defaultdict(list), defaultdict(int), threading.Lock()
+    started = time.perf_counter()
+    warmup_until = started + warmup
+    stop_at = warmup_until + duration
+    threads = [
+        threading.Thread(target=run_worker, args=(
+            context, operations, weights, interval, stop_at, warmup_until, samples, errors, lock
+        ))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = summarize(samples, errors, duration)
+    for name, result in results.items():
+        print(f"{name:>18}: {result['requests']:>7} req, {result['throughput_rps']:8.1f} req/s, "
+              f"p50 {result['p50_ms']:7.1f} ms, p95 {result['p95_ms']:7.1f} ms, "
+              f"p99 {result['p99_ms']:7.1f} ms, max {result['max_ms']:7.1f} ms, {result['errors']} errors")
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'base_url': base_url,
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'target_rps': target_rps,
+        'duration': duration,
+        'warmup': warmup,
+        'patients': len(context['patient_ids']),
+        'operations': results,
+    }
 
 def compare_results(before_file, after_file):
-    """Порівнює результати до і після додавання індексів"""
+    """Порівнює два запуски за p95 та пропускною здатністю кожної операції"""
     with open(before_file, 'r') as f:
         before = json.load(f)
     with open(after_file, 'r') as f:
         after = json.load(f)
-    
-    print("\nPerformance Comparison (Before vs After Indexes):")
+
+    print("\nPerformance Comparison (Before vs After):")
     print("-" * 60)
-    
-    for size in before:
-        print(f"\nData size: {size['data_size']}")
-        for operation in ['insert', 'select', 'update', 'delete']:
-            before_time = size[operation]
-            after_time = after[before.index(size)][operation]
-            improvement = ((before_time - after_time) / before_time) * 100
-            
+
+    for before_run, after_run in zip(before, after):
+        size = f", data size {before_run['data_size']}" if 'data_size' in before_run else ''
+        print(f"\nScenario: {before_run['scenario']}, concurrency {before_run['concurrency']}{size}")
+        for operation, before_op in before_run['operations'].items():
+            after_op = after_run['operations'].get(operation)
+            if after_op is None:
+                continue
+            improvement = (before_op['p95_ms'] - after_op['p95_ms']) / before_op['p95_ms'] * 100
             print(f"{operation.upper()}:")
-            print(f"  Before: {before_time:.4f} seconds")
-            print(f"  After:  {after_time:.4f} seconds")
+            print(f"  p95:        {before_op['p95_ms']:.1f} ms -> {after_op['p95_ms']:.1f} ms")
+            print(f"  Throughput: {before_op['throughput_rps']:.1f} -> {after_op['throughput_rps']:.1f} req/s")
             print(f"  Improvement: {improvement:.1f}%")
 
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent HTTP load generator for the hospital API')
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                        help='may be repeated; default: read, write, mixed')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rps', type=float, default=None, help='target total requests per second')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds per scenario')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before each scenario')
+    # benchmark_results.json у репозиторії - результати старого формату, не перезаписуємо їх
+    parser.add_argument('--output', default='benchmark_load_results.json')
+    parser.add_argument('--sizes', type=int, nargs='+', metavar='N',
+                        help='seed the database (DATABASE_URL) with N patients before each round, see seed.py')
+    parser.add_argument('--seed', type=int, default=42, help='random seed of the seeded dataset')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare)
+        return
+
+    all_results = []
+    for size in args.sizes or [None]:
+        if size is not None:
+            # Імпорт лише тут: сам генератор навантаження не потребує доступу до БД
+            import seed
+            print(f"\nSeeding {size} patients...")
+            counts = seed.seed(size, args.seed)['counts']
+        for scenario in args.scenario or ['read', 'write', 'mixed']:
+            result = run_load(
+                args.base_url.rstrip('/'), scenario, args.concurrency, args.duration, args.warmup, args.rps
+            )
+            if size is not None:
+                result['data_size'] = size
+                result['rows'] = counts
+            all_results.append(result)
+
+    # Зберігаємо результати в JSON файл
+    with open(args.output, 'w') as f:
+        json.dump(all_results, f, indent=2)
+
+    print(f"\nResults have been saved to {args.output}")
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
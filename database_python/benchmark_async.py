@@ -0,0 +1,73 @@
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Порівняння WSGI і ASGI режимів під однаковим навантаженням:
+#   gunicorn -w 4 'app:create_app()' -b :5000
+#   uvicorn asgi_app:create_asgi_app --factory --workers 4 --port 8000
+#   python benchmark_async.py http://localhost:5000 http://localhost:8000
+ENDPOINTS = [
+    '/doctors',
+    '/patients?limit=50',
+    '/appointments?limit=50',
+    '/patients/1/chart',
+    '/doctors/1/workload',
+]
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def run_load(base_url, concurrency, requests_per_worker):
+    """Кожен потік має власну сесію з keep-alive і проходить по ENDPOINTS по колу"""
+    def worker(_):
+        session = requests.Session()
+        latencies, failures = [], 0
+        for i in range(requests_per_worker):
+            start_time = time.perf_counter()
+            response = session.get(base_url + ENDPOINTS[i % len(ENDPOINTS)])
+            latencies.append(time.perf_counter() - start_time)
+            if response.status_code >= 400:
+                failures += 1
+        return latencies, failures
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'failures': sum(failures for _, failures in results),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python benchmark_async.py <wsgi_url> <asgi_url> [requests_per_worker]")
+        sys.exit(1)
+    targets = {'wsgi': sys.argv[1].rstrip('/'), 'asgi': sys.argv[2].rstrip('/')}
+    requests_per_worker = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    all_results = {}
+    for name, base_url in targets.items():
+        all_results[name] = []
+        for concurrency in (1, 10, 50, 100):
+            result = run_load(base_url, concurrency, requests_per_worker)
+            all_results[name].append(result)
+            print(f"{name} x{concurrency:>3}: {result['rps']:.0f} req/s, "
+                  f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+                  f"p99 {result['p99_ms']:.1f} ms, {result['failures']} failures")
+    with open('benchmark_async_results.json', 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print("\nResults have been saved to benchmark_async_results.json")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, date, timedelta
+
+from flask import Flask
+from sqlalchemy import event
+
+from models.hospital import db, Department, Doctor, Gender
+from crud import DepartmentCRUD, DoctorCRUD, PatientCRUD, AppointmentCRUD, PrescriptionCRUD
+from config import Config
+from serializers import encoder_for
+import pooling
+import seed
+
+# Мінімальна тривалість заміру однієї операції та межі кількості викликів
+MIN_SECONDS = 0.5
+MIN_CALLS = 3
+MAX_CALLS = 2000
+# Викликів measure понад основний цикл: прогрів, count_allocations, count_queries
+EXTRA_CALLS = 3
+REGRESSION_THRESHOLD = 0.10
+# Рядків в одному виклику create_many
+BATCH_ROWS = 100
+# Кортежі, які кешують довідники: усі поля, як у GET /departments і /doctors
+DEPARTMENT_FIELDS = encoder_for(Department).fields
+DOCTOR_FIELDS = encoder_for(Doctor).fields
+
+def create_benchmark_app(database_url):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pooling.engine_options(app.config)
+    db.init_app(app)
+    return app
+
+def uncached(method):
+    """Метод без read-through кешу: міряємо сам CRUD, а не влучання в кеш"""
+    return getattr(method, '__wrapped__', method)
+
+class Operations:
+    """Усі методи *CRUD з випадковими, але існуючими аргументами для набору розміру counts"""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.created = {name: [] for name in ('department', 'doctor', 'patient', 'appointment', 'prescription')}
+
+    def random_id(self, table):
+        return random.randint(1, self.counts[table])
+
+    def random_day(self):
+        # seed.py розкладає прийоми на два роки назад і 90 днів уперед
+        start = datetime.combine(date.today() - timedelta(days=random.randint(-90, 730)), datetime.min.time())
+        return start, start + timedelta(days=1)
+
+    def remember(self, kind, item):
+        self.created[kind].append(item.id)
+        return item
+
+    def remember_many(self, kind, result):
+        self.created[kind].extend(created['id'] for created in result['created'])
+        return result
+
+    def forget(self, kind, delete):
+        # Видаляємо лише створене в цьому ж прогоні, щоб розмір таблиць не змінювався
+        if not self.created[kind]:
+            raise RuntimeError(f"No created {kind} rows left to delete, see Operations.stock")
+        return delete(self.created[kind].pop())
+
+    def stock(self, name, operations):
+        """Перед заміром XCRUD.delete створює (поза заміром) по рядку на кожен можливий виклик,
+        інакше видалення без рядків рахувались би як виконані операції"""
+        model, method = name.split('.')
+        if method != 'delete':
+            return
+        kind = model[:-len('CRUD')].lower()
+        create = operations.get(f'{model}.create_many') or operations[f'{model}.create']
+        while len(self.created[kind]) < MAX_CALLS + EXTRA_CALLS:
+            create()
+
+    def all(self):
+        r = self.random_id
+        counter = iter(range(10 ** 9))
+        return [
+            ('DepartmentCRUD.create', lambda: self.remember('department', DepartmentCRUD.create(
+                name=f'Benchmark {next(counter)}', floor_number=1))),
+            ('DepartmentCRUD.get', lambda: DepartmentCRUD.get(r('departments'))),
+            ('DepartmentCRUD.get_all', DepartmentCRUD.get_all),
+            ('DepartmentCRUD.get_row', lambda: DepartmentCRUD.get_row(r('departments'), DEPARTMENT_FIELDS)),
+            ('DepartmentCRUD.get_row[uncached]',
+             lambda: uncached(DepartmentCRUD.get_row)(r('departments'), DEPARTMENT_FIELDS)),
+            ('DepartmentCRUD.get_rows', lambda: DepartmentCRUD.get_rows(DEPARTMENT_FIELDS)),
+            ('DepartmentCRUD.get_rows[uncached]', lambda: uncached(DepartmentCRUD.get_rows)(DEPARTMENT_FIELDS)),
+            ('DepartmentCRUD.get_page', lambda: DepartmentCRUD.get_page(50)),
+            ('DepartmentCRUD.iter_all', lambda: list(DepartmentCRUD.iter_all())),
+            ('DepartmentCRUD.update', lambda: DepartmentCRUD.update(r('departments'), floor_number=2)),
+            ('DepartmentCRUD.delete', lambda: self.forget('department', DepartmentCRUD.delete)),
+
+            ('DoctorCRUD.create', lambda: self.remember('doctor', DoctorCRUD.create(
+                first_name='Іван', last_name='Петренко', specialty='Кардіолог',
+                phone_number='+380991234567', email=f'benchmark{next(counter)}@hospital.com',
+                department_id=r('departments')))),
+            ('DoctorCRUD.create_many', lambda: self.remember_many('doctor', DoctorCRUD.create_many([
+                {'first_name': 'Іван', 'last_name': 'Петренко', 'specialty': 'Кардіолог',
+                 'phone_number': '+380991234567', 'email': f'benchmark{next(counter)}@hospital.com',
+                 'department_id': r('departments')}
+                for _ in range(BATCH_ROWS)
+            ]))),
+            ('DoctorCRUD.get', lambda: DoctorCRUD.get(r('doctors'))),
+            ('DoctorCRUD.get_all', DoctorCRUD.get_all),
+            ('DoctorCRUD.get_row', lambda: DoctorCRUD.get_row(r('doctors'), DOCTOR_FIELDS)),
+            ('DoctorCRUD.get_row[uncached]', lambda: uncached(DoctorCRUD.get_row)(r('doctors'), DOCTOR_FIELDS)),
+            ('DoctorCRUD.get_rows', lambda: DoctorCRUD.get_rows(DOCTOR_FIELDS)),
+            ('DoctorCRUD.get_rows[uncached]', lambda: uncached(DoctorCRUD.get_rows)(DOCTOR_FIELDS)),
+            ('DoctorCRUD.get_page', lambda: DoctorCRUD.get_page(50)),
+            ('DoctorCRUD.iter_all', lambda: list(DoctorCRUD.iter_all())),
+            ('DoctorCRUD.get_workload', lambda: DoctorCRUD.get_workload(r('doctors')).to_workload_dict()),
+            ('DoctorCRUD.get_by_department', lambda: DoctorCRUD.get_by_department(r('departments'))),
+            ('DoctorCRUD.get_by_specialty', lambda: DoctorCRUD.get_by_specialty('Cardiologist')),
+            ('DoctorCRUD.get_rows[specialty]', lambda: DoctorCRUD.get_rows(('id',), specialty='Cardiologist')),
+            ('DoctorCRUD.update', lambda: DoctorCRUD.update(r('doctors'), phone_number='+380990000000')),
+            ('DoctorCRUD.delete', lambda: self.forget('doctor', DoctorCRUD.delete)),
+
+            ('PatientCRUD.create', lambda: self.remember('patient', PatientCRUD.create(
+                first_name='Марія', last_name='Коваленко', date_of_birth=date(1990, 5, 15),
+                gender=Gender.FEMALE, phone_number='+380997654321', address='вул. Шевченка, 1, Київ',
+                email=f'benchmark{next(counter)}@example.com'))),
+            ('PatientCRUD.create_many', lambda: self.remember_many('patient', PatientCRUD.create_many([
+                {'first_name': 'Марія', 'last_name': 'Коваленко', 'date_of_birth': '1990-05-15',
+                 'gender': 'Female', 'phone_number': '+380997654321', 'address': 'вул. Шевченка, 1, Київ',
+                 'email': f'benchmark{next(counter)}@example.com'}
+                for _ in range(BATCH_ROWS)
+            ]))),
+            ('PatientCRUD.get', lambda: PatientCRUD.get(r('patients'))),
+            ('PatientCRUD.get_all', PatientCRUD.get_all),
+            ('PatientCRUD.get_page', lambda: PatientCRUD.get_page(50)),
+            ('PatientCRUD.iter_all', lambda: list(PatientCRUD.iter_all())),
+            ('PatientCRUD.get_chart', lambda: PatientCRUD.get_chart(r('patients')).to_chart_dict()),
+            ('PatientCRUD.search', lambda: PatientCRUD.search(
+                random.choice(seed.LAST_NAMES)[:4], fields=['id', 'first_name', 'last_name'])),
+            ('PatientCRUD.update', lambda: PatientCRUD.update(r('patients'), phone_number='+380990000000')),
+            ('PatientCRUD.delete', lambda: self.forget('patient', PatientCRUD.delete)),
+
+            ('AppointmentCRUD.create', lambda: self.remember('appointment', AppointmentCRUD.create(
+                patient_id=r('patients'), doctor_id=r('doctors'),
+                appointment_datetime=datetime(2030, 1, 1, 8) + timedelta(minutes=30 * next(counter)),
+                reason_for_visit='Регулярний огляд'))),
+            ('AppointmentCRUD.create_many', lambda: self.remember_many('appointment', AppointmentCRUD.create_many([
+                {'patient_id': r('patients'), 'doctor_id': r('doctors'),
+                 'appointment_datetime': (datetime(2030, 1, 1, 8)
+                                          + timedelta(minutes=30 * next(counter))).isoformat(),
+                 'reason_for_visit': 'Регулярний огляд'}
+                for _ in range(BATCH_ROWS)
+            ]))),
+            ('AppointmentCRUD.get', lambda: AppointmentCRUD.get(r('appointments'))),
+            ('AppointmentCRUD.get_all', AppointmentCRUD.get_all),
+            ('AppointmentCRUD.get_page', lambda: AppointmentCRUD.get_page(50)),
+            ('AppointmentCRUD.iter_all', lambda: list(AppointmentCRUD.iter_all())),
+            ('AppointmentCRUD.get_by_doctor', lambda: AppointmentCRUD.get_by_doctor(r('doctors'))),
+            ('AppointmentCRUD.get_range', lambda: AppointmentCRUD.get_range(
+                r('doctors'), *self.random_day(), fields=['id', 'patient_id', 'appointment_datetime'])),
+            ('AppointmentCRUD.get_by_patient', lambda: AppointmentCRUD.get_by_patient(r('patients'))),
+            ('AppointmentCRUD.update', lambda: AppointmentCRUD.update(r('appointments'), reason_for_visit='Консультація')),
+            ('AppointmentCRUD.delete', lambda: self.forget('appointment', AppointmentCRUD.delete)),
+
+            ('PrescriptionCRUD.create', lambda: self.remember('prescription', PrescriptionCRUD.create(
+                patient_id=r('patients'), doctor_id=r('doctors'), medication_name='Аспірин',
+                dosage='100мг', frequency='1 раз на день', start_date=date.today(),
+                end_date=date.today() + timedelta(days=7)))),
+            ('PrescriptionCRUD.create_many', lambda: self.remember_many('prescription', PrescriptionCRUD.create_many([
+                {'patient_id': r('patients'), 'doctor_id': r('doctors'), 'medication_name': 'Аспірин',
+                 'dosage': '100мг', 'frequency': '1 раз на день', 'start_date': '2030-01-01',
+                 'end_date': '2030-01-08'}
+                for _ in range(BATCH_ROWS)
+            ]))),
+            ('PrescriptionCRUD.get', lambda: PrescriptionCRUD.get(r('prescriptions'))),
+            ('PrescriptionCRUD.get_all', PrescriptionCRUD.get_all),
+            ('PrescriptionCRUD.get_page', lambda: PrescriptionCRUD.get_page(50)),
+            ('PrescriptionCRUD.iter_all', lambda: list(PrescriptionCRUD.iter_all())),
+            ('PrescriptionCRUD.get_by_patient', lambda: PrescriptionCRUD.get_by_patient(r('patients'))),
+            ('PrescriptionCRUD.get_by_doctor', lambda: PrescriptionCRUD.get_by_doctor(r('doctors'))),
+            ('PrescriptionCRUD.update', lambda: PrescriptionCRUD.update(r('prescriptions'), dosage='200мг')),
+            ('PrescriptionCRUD.delete', lambda: self.forget('prescription', PrescriptionCRUD.delete)),
+        ]
+
+def phase(name):
+    """Спершу читання й оновлення, потім вставки, потім видалення: вставки змінюють розмір таблиць"""
+    method = name.split('.')[1].split('[')[0]
+    return {'create': 1, 'create_many': 1, 'delete': 2}.get(method, 0)
+
+def count_queries(operation):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        operation()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return len(statements)
+
+def count_allocations(operation):
+    """Кількість і обсяг блоків пам'яті, виділених за один виклик (tracemalloc), та пік"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    stats = after.compare_to(before, 'lineno')
+    return (
+        sum(stat.count_diff for stat in stats if stat.count_diff > 0),
+        sum(stat.size_diff for stat in stats if stat.size_diff > 0),
+        peak,
+    )
+
+def measure(operation, min_seconds=MIN_SECONDS):
+    def run():
+        operation()
+        # Кожен виклик з порожньою identity map, як окремий запит
+        db.session.expunge_all()
+
+    run()  # прогрів: скомпільовані запити, кеш SQLAlchemy
+    calls = 0
+    started = time.perf_counter()
+    while calls < MIN_CALLS or (calls < MAX_CALLS and time.perf_counter() - started < min_seconds):
+        run()
+        calls += 1
+    elapsed = time.perf_counter() - started
+    blocks, allocated, peak = count_allocations(run)
+    return {
+        'calls': calls,
+        'ops_per_sec': calls / elapsed,
+        'mean_ms': elapsed / calls * 1000,
+        'queries': count_queries(run),
+        'allocated_blocks': blocks,
+        'allocated_kib': allocated / 1024,
+        'peak_kib': peak / 1024,
+    }
+
+def run_size(size, database_url, only=None, min_seconds=MIN_SECONDS):
+    app = create_benchmark_app(database_url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.remove()
+        counts = seed.seed(size, database_url=database_url)['counts']
+        operations = Operations(counts)
+        available = operations.all()
+        results = {}
+        for name, operation in sorted(available, key=lambda item: phase(item[0])):
+            if only and not any(part in name for part in only):
+                continue
+            operations.stock(name, dict(available))
+            db.session.expunge_all()
+            results[name] = measure(operation, min_seconds)
+            result = results[name]
+            print(f"{name:>42}: {result['ops_per_sec']:10.1f} ops/s, {result['mean_ms']:9.3f} ms, "
+                  f"{result['queries']:3d} queries, {result['allocated_blocks']:7d} blocks, "
+                  f"{result['peak_kib']:9.1f} KiB peak")
+        db.session.remove()
+    return {'size': size, 'rows': counts, 'operations': results}
+
+def compare(previous_path, current):
+    """Порівнює з попереднім запуском; регресія - падіння ops/s понад поріг або більше запитів"""
+    with open(previous_path) as f:
+        previous = {run['size']: run for run in json.load(f)['runs']}
+    regressions = 0
+    for run in current['runs']:
+        before_run = previous.get(run['size'])
+        if before_run is None:
+            continue
+        print(f"\nSize {run['size']} vs {previous_path}:")
+        for name, result in run['operations'].items():
+            before = before_run['operations'].get(name)
+            if before is None:
+                continue
+            change = (result['ops_per_sec'] - before['ops_per_sec']) / before['ops_per_sec']
+            flags = []
+            if change < -REGRESSION_THRESHOLD:
+                flags.append('SLOWER')
+            if result['queries'] > before['queries']:
+                flags.append(f"QUERIES {before['queries']}->{result['queries']}")
+            if flags:
+                regressions += 1
+            print(f"{name:>42}: {change:+7.1%} ops/s {' '.join(flags)}")
+    return regressions
+
+def main():
+    default_url = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'benchmark_crud.db')
+    parser = argparse.ArgumentParser(description='In-process micro-benchmarks for every crud.py method')
+    parser.add_argument('--database-url', default=default_url,
+                        help='the database is dropped and re-seeded; never point this at real data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--only', nargs='+', help='run only operations whose name contains one of these')
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS,
+                        help='timed seconds per operation; raise it for less noisy comparisons')
+    parser.add_argument('--output', default='benchmark_crud_results.json')
+    parser.add_argument('--compare', metavar='PREVIOUS', help='previous results file to compare against')
+    args = parser.parse_args()
+
+    random.seed(42)
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'database': args.database_url.split(':', 1)[0],
+        'runs': [],
+    }
+    for size in args.sizes:
+        print(f"\nCRUD operations with {size} patients")
+        results['runs'].append(run_size(size, args.database_url, args.only, args.min_seconds))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults have been saved to {args.output}")
+
+    if args.compare:
+        regressions = compare(args.compare, results)
+        print(f"\n{regressions} regressions" if regressions else "\nNo regressions")
+
+if __name__ == '__main__':
+    main()
@@ -1,74 +1,307 @@
-import psycopg2
-from config import Config
+import argparse
+import hashlib
+import json
+import re
+import sys
 import time
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
 from tabulate import tabulate
 
-def test_query(query, description):
-    """Тестує продуктивність запиту з EXPLAIN ANALYZE"""
-    conn = psycopg2.connect(Config.SQLALCHEMY_DATABASE_URI)
-    cur = conn.cursor()
-    
+from models.hospital import db, Department, Doctor, Patient, Appointment, Prescription
+from app import create_app
+from benchmark_crud import Operations, phase
+import cache
+
+# Рукописні запити, що не йдуть через crud.py
+QUERIES = [
+    (
+        "SELECT * FROM patients WHERE gender = 'MALE'",
+        "Пошук пацієнтів за статтю"
+    ),
+    (
+        "SELECT * FROM doctors WHERE specialty = 'Cardiologist'",
+        "Пошук лікарів за спеціальністю"
+    ),
+    (
+        """
+        SELECT a.*, p.first_name
+        FROM appointments a
+        JOIN patients p ON a.patient_id = p.id
+        WHERE a.appointment_datetime >= CURRENT_DATE
+          AND a.appointment_datetime < CURRENT_DATE + 1
+        """,
+        "Прийоми на сьогодні"
+    ),
+]
+
+# GET-маршрути; SQL кожного маршруту береться з того, що він реально виконав
+ROUTES = [
+    '/departments', '/departments/1', '/doctors', '/doctors/1', '/doctors/1/workload',
+    '/patients?limit=50', '/patients?limit=50&fields=id,last_name', '/patients?stream=1',
+    '/patients/1', '/patients/1/chart', '/patients/search?q=Коваленко', '/patients/search?q=0991234',
+    '/appointments?limit=50', '/appointments/1',
+    '/prescriptions?limit=50', '/prescriptions/1',
+    f'/appointments?doctor_id=1&from={date.today()}&to={date.today() + timedelta(days=1)}',
+]
+
+MODELS = [Department, Doctor, Patient, Appointment, Prescription]
+# Пороги регресій
+LARGE_TABLE_ROWS = 10000
+SEQ_SCAN_FRACTION = 0.1
+ESTIMATE_ERROR_RATIO = 10
+ESTIMATE_MIN_ROWS = 100
+BUFFER_GROWTH = 2.0
+BUFFER_MIN_BLOCKS = 100
+
+def normalize(statement):
+    """Текст запиту без змінної довжини IN-списків та VALUES, щоб однакові запити збігалися"""
+    statement = re.sub(r'\(%\(\w+\)s(?:, %\(\w+\)s)+\)', '(...)', statement)
+    statement = re.sub(r'\(\.\.\.\)(?:, \(\.\.\.\))+', '(...)', statement)
+    return ' '.join(statement.split())
+
+def statement_key(statement):
+    return hashlib.sha1(normalize(statement).encode()).hexdigest()[:12]
+
+def capture(label, operation, statements):
+    """Виконує операцію та збирає кожен її SQL-запит разом з параметрами першого виклику"""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH'):
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else None
+        entry = statements.setdefault(statement_key(statement), {
+            'label': label, 'sql': statement, 'parameters': parameters, 'used_by': []
+        })
+        if label not in entry['used_by']:
+            entry['used_by'].append(label)
+
+    # Кеш довідників сховав би SQL маршрутів, що йдуть через get_all/get
+    for region in cache.REGIONS:
+        region.invalidate()
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
     try:
-        # Вимірюємо час звичайного виконання
-        start_time = time.time()
-        cur.execute(query)
-        execution_time = time.time() - start_time
-        
-        # Отримуємо план виконання
-        cur.execute(f"EXPLAIN {query}")
-        plan = cur.fetchall()
-        
-        return {
-            'description': description,
-            'time': execution_time,
-            'uses_index': any('Index Scan' in str(row) for row in plan),
-            'plan': plan[0][0]  # Беремо перший рядок плану
+        operation()
+    except Exception as e:
+        db.session.rollback()
+        print(f"{label}: {e}", file=sys.stderr)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        db.session.expunge_all()
+
+@contextmanager
+def rolled_back():
+    """db.session у зовнішній транзакції, яку наприкінці відкочують.
+
+    commit у crud.py та маршрутах лише звільняє SAVEPOINT, тож *.update, *.delete і create
+    не змінюють базу, з якої знімається план. Викликати в app context.
+    """
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        db.session.remove()
+        db.session.registry.set(Session(bind=connection, join_transaction_mode='create_savepoint'))
+        try:
+            yield
+        finally:
+            db.session.remove()
+            transaction.rollback()
+
+def capture_all(app):
+    """SQL усіх методів crud.py (через benchmark_crud.Operations) та GET-маршрутів"""
+    statements = {}
+    for query, description in QUERIES:
+        statements[statement_key(query)] = {
+            'label': description, 'sql': query, 'parameters': None, 'used_by': [description]
+        }
+    with app.app_context():
+        counts = {
+            model.__tablename__: max(1, db.session.scalar(select(func.count()).select_from(model)))
+            for model in MODELS
         }
-    
+        headers = {'Authorization': f"Bearer {create_access_token(identity='1')}"}
+        operations = Operations(counts)
+        with rolled_back():
+            for name, operation in sorted(operations.all(), key=lambda item: phase(item[0])):
+                capture(name, operation, statements)
+        # Запити тестового клієнта йдуть у цьому ж app context, а отже й у тій самій сесії
+        client = app.test_client()
+        for path in ROUTES:
+            with rolled_back():
+                capture(f'GET {path}', lambda: client.get(path, headers=headers).get_data(), statements)
+    return statements, counts
+
+def walk(node, limited=False):
+    """Вузли плану; limited - вузол під Limit, який зупиняє його раніше за оцінку планувальника"""
+    yield node, limited
+    limited = limited or node['Node Type'] == 'Limit'
+    for child in node.get('Plans', []):
+        yield from walk(child, limited)
+
+def summarize(plan):
+    """Головне з EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON): час, буфери та вузли плану"""
+    root = plan['Plan']
+    nodes = []
+    for node, limited in walk(root):
+        nodes.append({
+            'type': node['Node Type'],
+            'relation': node.get('Relation Name'),
+            'index': node.get('Index Name'),
+            'plan_rows': node.get('Plan Rows', 0),
+            'actual_rows': node.get('Actual Rows', 0),
+            'loops': node.get('Actual Loops', 0),
+            'limited': limited,
+        })
+    return {
+        'execution_ms': plan.get('Execution Time', 0.0),
+        'planning_ms': plan.get('Planning Time', 0.0),
+        'shared_blocks': root.get('Shared Hit Blocks', 0) + root.get('Shared Read Blocks', 0),
+        'shared_read_blocks': root.get('Shared Read Blocks', 0),
+        'indexes': sorted({node['index'] for node in nodes if node['index']}),
+        'nodes': nodes,
+    }
+
+def explain(conn, statement, parameters):
+    """EXPLAIN ANALYZE виконує запит, тому кожен план знімається в транзакції з відкатом"""
+    try:
+        plan = conn.exec_driver_sql(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters or {}
+        ).scalar()
     finally:
-        cur.close()
-        conn.close()
+        conn.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+def table_rows(conn):
+    """Оцінка кількості рядків з pg_class (оновлюється ANALYZE після seed.py)"""
+    rows = conn.exec_driver_sql(
+        "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relname IN %(tables)s",
+        {'tables': tuple(model.__tablename__ for model in MODELS)}
+    ).fetchall()
+    return {name: max(0, int(reltuples)) for name, reltuples in rows}
+
+def estimate_error(node):
+    if not node['loops'] or node['limited']:
+        return 1.0
+    estimated, actual = node['plan_rows'], node['actual_rows']
+    if max(estimated, actual) < ESTIMATE_MIN_ROWS:
+        return 1.0
+    return max(estimated, actual) / max(1, min(estimated, actual))
+
+def find_issues(summary, rows, baseline=None):
+    """Проблеми самого плану та регресії відносно базового плану"""
+    issues = []
+    for node in summary['nodes']:
+        relation = node['relation']
+        if node['type'] == 'Seq Scan' and rows.get(relation, 0) >= LARGE_TABLE_ROWS:
+            # Повний прохід, що повертає малу частку таблиці, - місце для індексу
+            returned = node['actual_rows'] * max(1, node['loops'])
+            if returned < rows[relation] * SEQ_SCAN_FRACTION:
+                issues.append(f"seq scan on {relation} ({rows[relation]} rows) returns {returned}")
+        ratio = estimate_error(node)
+        if ratio >= ESTIMATE_ERROR_RATIO:
+            issues.append(f"{node['type']} on {relation or '-'}: estimated {node['plan_rows']} rows, "
+                          f"actual {node['actual_rows']} (x{ratio:.0f})")
+
+    if baseline is not None:
+        before, after = baseline['shared_blocks'], summary['shared_blocks']
+        if after > before * BUFFER_GROWTH and after - before >= BUFFER_MIN_BLOCKS:
+            issues.append(f"shared buffers {before} -> {after}")
+        scanned = {node['relation'] for node in baseline['nodes'] if node['type'] == 'Seq Scan'}
+        for node in summary['nodes']:
+            if node['type'] == 'Seq Scan' and node['relation'] not in scanned:
+                issues.append(f"new seq scan on {node['relation']}")
+        lost = set(baseline['indexes']) - set(summary['indexes'])
+        if lost:
+            issues.append(f"no longer uses {', '.join(sorted(lost))}")
+    return issues
 
 def main():
-    # Тестові запити
-    queries = [
-        (
-            "SELECT * FROM patients WHERE gender = 'MALE'",
-            "Пошук пацієнтів за статтю"
-        ),
-        (
-            "SELECT * FROM doctors WHERE specialty = 'Cardiologist'",
-            "Пошук лікарів за спеціальністю"
-        ),
-        (
-            """
-            SELECT a.*, p.first_name 
-            FROM appointments a 
-            JOIN patients p ON a.patient_id = p.id 
-            WHERE DATE(appointment_datetime) = CURRENT_DATE
-            """,
-            "Прийоми на сьогодні"
-        ),
-    ]
-    
-    # Виконуємо тести
-    results = []
-    for query, description in queries:
-        result = test_query(query, description)
-        results.append([
-            result['description'],
-            f"{result['time']:.4f} сек",
-            "Так" if result['uses_index'] else "Ні",
-            result['plan']
-        ])
-    
+    parser = argparse.ArgumentParser(
+        description='EXPLAIN (ANALYZE, BUFFERS) every query issued by crud.py and the GET routes (PostgreSQL only)'
+    )
+    parser.add_argument('--baseline', default='explain_baselines.json')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='save the current plans as the new baseline instead of failing on regressions')
+    parser.add_argument('--size', type=int,
+                        help='re-seed the database (DATABASE_URL) with N patients first, see seed.py')
+    args = parser.parse_args()
+
+    app = create_app()
+    if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() != 'postgresql':
+        sys.exit("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) needs PostgreSQL: set DATABASE_URL")
+    if args.size:
+        import seed
+        seed.seed(args.size)
+
+    statements, counts = capture_all(app)
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['plans']
+    except FileNotFoundError:
+        baseline = {}
+
+    plans, table, regressions = {}, [], 0
+    with app.app_context():
+        with db.engine.connect() as conn:
+            rows = table_rows(conn)
+            for key, entry in statements.items():
+                started = time.perf_counter()
+                try:
+                    plan = explain(conn, entry['sql'], entry['parameters'])
+                except Exception as e:
+                    print(f"{entry['label']}: EXPLAIN failed: {e}", file=sys.stderr)
+                    continue
+                elapsed = time.perf_counter() - started
+                summary = summarize(plan)
+                previous = baseline.get(key)
+                issues = find_issues(summary, rows, previous and previous['summary'])
+                # Регресія - лише проблема, якої не було в базовому плані (числа не порівнюємо)
+                known = {re.sub(r'\d+', 'N', issue) for issue in previous['issues']} if previous else set()
+                if previous is not None and any(re.sub(r'\d+', 'N', issue) not in known for issue in issues):
+                    regressions += 1
+                plans[key] = {
+                    'label': entry['label'],
+                    'used_by': entry['used_by'],
+                    'sql': normalize(entry['sql']),
+                    'summary': summary,
+                    'issues': issues,
+                    'plan': plan,
+                }
+                table.append([
+                    entry['label'] + ('' if previous else ' (new)'),
+                    f"{summary['execution_ms']:.2f} мс ({elapsed:.3f} сек)",
+                    summary['shared_blocks'],
+                    ', '.join(summary['indexes']) or "Ні",
+                    '\n'.join(issues),
+                ])
+    db.engine.dispose()
+
     # Виводимо результати
     print("\nРезультати тестування:")
     print(tabulate(
-        results,
-        headers=['Опис', 'Час виконання', 'Використання індексу', 'План виконання'],
+        table,
+        headers=['Запит', 'Час виконання', 'Буфери', 'Індекси', 'Проблеми'],
         tablefmt='grid'
     ))
+    for key in sorted(set(baseline) - set(plans)):
+        print(f"Not issued any more: {baseline[key]['label']}")
+
+    if args.update_baseline or not baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'rows': counts,
+                'plans': plans,
+            }, f, indent=2, ensure_ascii=False, default=str)
+        print(f"\nBaseline has been saved to {args.baseline}")
+    elif regressions:
+        sys.exit(f"\n{regressions} queries regressed against {args.baseline}")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,90 @@
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import insert
+
+from models.hospital import db, Department, Doctor, Appointment
+from crud import AppointmentCRUD
+from config import Config
+
+def create_benchmark_app(database_url):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+    return app
+
+def seed(count):
+    db.drop_all()
+    db.create_all()
+    department = Department(name='Кардіологія', floor_number=3)
+    db.session.add(department)
+    db.session.flush()
+    doctor = Doctor(first_name='Іван', last_name='Петренко', specialty='Кардіолог',
+                    phone_number='+380991234567', email='petrenko@hospital.com',
+                    department_id=department.id)
+    db.session.add(doctor)
+    db.session.flush()
+    start = datetime(2024, 1, 1, 8)
+    db.session.execute(insert(Appointment), [
+        {
+            'patient_id': None,
+            'doctor_id': doctor.id,
+            'appointment_datetime': start + timedelta(minutes=30 * i),
+            'reason_for_visit': 'Регулярний огляд'
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+    return doctor.id
+
+def measure(name, operation, rows, iterations=5):
+    """Медіана часу та пікова пам'ять на рядок; сесія очищується між запусками"""
+    times, peaks = [], []
+    for _ in range(iterations):
+        db.session.expunge_all()
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        result = operation()
+        elapsed = time.perf_counter() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(result) == rows
+        del result
+        times.append(elapsed)
+        peaks.append(peak)
+    median_time = statistics.median(times)
+    bytes_per_row = statistics.median(peaks) / rows
+    print(f"{name:>12}: {median_time:.4f} s, {bytes_per_row:.0f} bytes/row")
+    return {'seconds': median_time, 'bytes_per_row': bytes_per_row}
+
+def main():
+    # Таблиці перестворюються, тому за замовчуванням - окремий файл SQLite, а не DATABASE_URL
+    default_url = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'benchmark_rows.db')
+    database_url = sys.argv[1] if len(sys.argv) > 1 else default_url
+    app = create_benchmark_app(database_url)
+    all_results = []
+    with app.app_context():
+        for count in (10000, 100000):
+            print(f"\nORM Query.filter_by(doctor_id=...) vs AppointmentCRUD.get_by_doctor (Core rows), {count} rows")
+            doctor_id = seed(count)
+            all_results.append({
+                'rows': count,
+                'orm': measure('ORM', lambda: Appointment.query.filter_by(doctor_id=doctor_id).all(), count),
+                'core_rows': measure('Core rows', lambda: AppointmentCRUD.get_by_doctor(doctor_id), count),
+            })
+    with open('benchmark_rows_results.json', 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print("\nResults have been saved to benchmark_rows_results.json")
+
+if __name__ == '__main__':
+    main()
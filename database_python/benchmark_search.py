@@ -0,0 +1,169 @@
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.engine import make_url
+
+from models.hospital import db, Patient
+from crud import PatientCRUD
+from benchmark_crud import create_benchmark_app
+import search_index
+import seed
+
+TARGET_P95_MS = 20.0
+# Частка запитів, у видачі яких є пацієнт, з якого складено запит
+TARGET_RECALL = 0.98
+FIELDS = ['id', 'first_name', 'last_name', 'phone_number', 'email']
+# Склади прізвищ пробних пацієнтів. З перших складів не починається жодне з seed.LAST_NAMES,
+# тож прізвище пробного пацієнта та його префікс від 4 літер не збігаються з засіяними
+SYLLABLES = [
+    'За', 'Ге', 'Ду', 'Ям', 'Фі', 'Ца', 'Хо', 'Ві', 'Ну', 'Зо', 'Гу', 'Жу', 'Лу', 'Ри', 'Си', 'Ту',
+    'Фу', 'Це', 'Чо', 'Щу', 'Юр', 'Дя', 'Бу', 'Ви', 'Го', 'Зі', 'Ки', 'Ле', 'Ні', 'Ра', 'Со', 'Те',
+]
+PROBE_EMAIL = 'probe{:05d}@example.com'
+
+def typo(rng, word):
+    """Одна одруківка: пропущена, подвоєна або переставлена літера"""
+    position = rng.randrange(1, len(word) - 1)
+    return rng.choice([
+        word[:position] + word[position + 1:],
+        word[:position] + word[position] + word[position:],
+        word[:position] + word[position + 1] + word[position] + word[position + 2:],
+    ])
+
+# Як реєстратура шукає пацієнта
+# Коротший префікс чи менше цифр телефону відповідають сотням пацієнтів і нікого не впізнають
+KINDS = {
+    'surname prefix': lambda rng, p: p.last_name[:rng.randint(4, len(p.last_name))],
+    'surname typo': lambda rng, p: typo(rng, p.last_name),
+    'full name': lambda rng, p: f'{p.first_name} {p.last_name}',
+    'phone digits': lambda rng, p: p.phone_number[-rng.randint(7, 10):],
+    'email': lambda rng, p: p.email.split('@')[0],
+}
+
+def probe_surname(number):
+    """Унікальне для number < len(SYLLABLES) ** 3 прізвище; перший склад змінюється найчастіше"""
+    syllables = []
+    for _ in range(3):
+        number, index = divmod(number, len(SYLLABLES))
+        syllables.append(SYLLABLES[index])
+    return syllables[0] + ''.join(syllables[1:]).lower() + 'енко'
+
+def add_probes(rng, count):
+    """count пробних пацієнтів з унікальними прізвищем, email і телефоном (попередні видаляються)"""
+    db.session.execute(delete(Patient).where(Patient.email.like(PROBE_EMAIL.replace('{:05d}', '%'))))
+    db.session.commit()
+    result = PatientCRUD.create_many([
+        {'first_name': rng.choice(seed.FIRST_NAMES), 'last_name': probe_surname(number),
+         'date_of_birth': '1990-05-15', 'gender': 'Female', 'phone_number': f'+38067{phone:07d}',
+         'address': 'вул. Шевченка, 1, Київ', 'email': PROBE_EMAIL.format(number)}
+        for number, phone in enumerate(rng.sample(range(10 ** 7), count))
+    ])
+    return [created['id'] for created in result['created']]
+
+def sample_queries(rng, ids):
+    """(вид, запит, id пацієнта, з якого його складено) для пробних пацієнтів ids"""
+    patients = db.session.scalars(select(Patient).where(Patient.id.in_(ids)).order_by(Patient.id)).all()
+    db.session.expunge_all()
+    kinds = list(KINDS)
+    return [
+        (kind, KINDS[kind](rng, patient), patient.id)
+        for kind, patient in zip((kinds[i % len(kinds)] for i in range(len(patients))), patients)
+    ]
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+def summarize(durations, hits):
+    return {
+        'queries': len(durations),
+        'recall': sum(hits) / len(hits),
+        'p50_ms': percentile(durations, 0.50),
+        'p95_ms': percentile(durations, 0.95),
+        'p99_ms': percentile(durations, 0.99),
+        'max_ms': max(durations),
+    }
+
+def run(queries, limit):
+    durations, by_kind, recalled, empty = [], {}, {}, 0
+    for kind, query, patient_id in queries:
+        started = time.perf_counter()
+        rows = PatientCRUD.search(query, limit, FIELDS)
+        elapsed = (time.perf_counter() - started) * 1000
+        db.session.expunge_all()
+        durations.append(elapsed)
+        by_kind.setdefault(kind, []).append(elapsed)
+        recalled.setdefault(kind, []).append(any(row.id == patient_id for row in rows))
+        empty += not rows
+    return durations, by_kind, recalled, empty
+
+def main():
+    default_url = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'benchmark_search.db')
+    parser = argparse.ArgumentParser(
+        description=f'Latency of GET /patients/search (PatientCRUD.search), target p95 < {TARGET_P95_MS:.0f} ms, recall >= {TARGET_RECALL:.0%}'
+    )
+    parser.add_argument('--database-url', default=default_url,
+                        help='the database is dropped and re-seeded unless --no-seed; never point this at real data')
+    parser.add_argument('--size', type=int, default=1000000, help='patients to seed, see seed.py')
+    parser.add_argument('--no-seed', action='store_true', help='search the data already in the database')
+    parser.add_argument('--queries', type=int, default=1000,
+                        help='one query per probe patient, added with unique names before the run')
+    parser.add_argument('--limit', type=int, default=search_index.DEFAULT_LIMIT)
+    parser.add_argument('--output', default='benchmark_search_results.json')
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+    backend = make_url(args.database_url).get_backend_name()
+    with app.app_context():
+        if not args.no_seed:
+            db.drop_all()
+            db.create_all()
+            db.session.remove()
+            seed.seed(args.size, database_url=args.database_url)
+        rng = random.Random(42)
+        queries = sample_queries(rng, add_probes(rng, args.queries))
+
+        # Перший пошук без pg_trgm будує n-грамний індекс у пам'яті - міряємо окремо
+        started = time.perf_counter()
+        PatientCRUD.search(queries[0][1], args.limit, FIELDS)
+        warmup = time.perf_counter() - started
+        print(f"{backend}: first search {warmup:.2f}s"
+              + ('' if backend == 'postgresql' else f" (in-memory index of {len(search_index.index.texts)} patients)"))
+
+        durations, by_kind, recalled, empty = run(queries, args.limit)
+        db.session.remove()
+
+    results = {
+        'timestamp': datetime.now().isoformat(),
+        'database': backend,
+        'first_search_s': warmup,
+        'empty_results': empty,
+        'overall': summarize(durations, [hit for hits in recalled.values() for hit in hits]),
+        'kinds': {kind: summarize(values, recalled[kind]) for kind, values in by_kind.items()},
+    }
+    for kind, summary in [('overall', results['overall']), *results['kinds'].items()]:
+        print(f"{kind:>15}: p50 {summary['p50_ms']:7.2f} ms, p95 {summary['p95_ms']:7.2f} ms, "
+              f"p99 {summary['p99_ms']:7.2f} ms, max {summary['max_ms']:7.2f} ms, "
+              f"recall {summary['recall']:.1%} ({summary['queries']} queries)")
+    print(f"{empty} queries found nothing")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults have been saved to {args.output}")
+
+    if results['overall']['p95_ms'] > TARGET_P95_MS:
+        sys.exit(f"\np95 {results['overall']['p95_ms']:.2f} ms is above the {TARGET_P95_MS:.0f} ms target")
+    if results['overall']['recall'] < TARGET_RECALL:
+        sys.exit(f"\nrecall {results['overall']['recall']:.1%} is below the {TARGET_RECALL:.0%} target")
+
+if __name__ == '__main__':
+    main()
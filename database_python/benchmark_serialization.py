@@ -0,0 +1,69 @@
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from models.hospital import Patient, Gender
+from serializers import encoder_for, orjson
+
+def generate_patients(count):
+    """Генерує транзієнтні ORM-об'єкти та ті самі дані як кортежі рядків"""
+    start = date(1940, 1, 1)
+    genders = list(Gender)
+    objects, rows = [], []
+    for i in range(count):
+        row = (
+            i + 1,
+            f'Ім\'я{i}',
+            f'Прізвище{i}',
+            start + timedelta(days=random.randint(0, 25000)),
+            random.choice(genders),
+            f'+38099{random.randint(1000000, 9999999)}',
+            f'вул. Шевченка, {random.randint(1, 100)}, Київ',
+            f'patient{i}@example.com'
+        )
+        rows.append(row)
+        objects.append(Patient(
+            id=row[0], first_name=row[1], last_name=row[2], date_of_birth=row[3],
+            gender=row[4], phone_number=row[5], address=row[6], email=row[7]
+        ))
+    return objects, rows
+
+def measure(operation, iterations):
+    times = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - start_time)
+    return statistics.median(times)
+
+def run_benchmark(count, iterations=5):
+    print(f"\nSerializing {count} patients (median of {iterations} runs)...")
+    objects, rows = generate_patients(count)
+    encoder = encoder_for(Patient)
+
+    # Те саме, що робить jsonify: to_dict() на кожен рядок і stdlib json з sort_keys
+    def to_dict_path():
+        return json.dumps([patient.to_dict() for patient in objects], sort_keys=True).encode()
+
+    results = {
+        'rows': count,
+        'to_dict_jsonify': measure(to_dict_path, iterations),
+        'compiled_objects': measure(lambda: encoder.dumps_objects(objects), iterations),
+        'compiled_rows': measure(lambda: encoder.dumps_rows(rows), iterations),
+    }
+    baseline = results['to_dict_jsonify']
+    for name in ('to_dict_jsonify', 'compiled_objects', 'compiled_rows'):
+        print(f"{name:>16}: {results[name]:.4f} s  ({baseline / results[name]:.1f}x)")
+    return results
+
+def main():
+    print(f"JSON backend: {'orjson' if orjson is not None else 'stdlib json'}")
+    all_results = [run_benchmark(size) for size in (10000, 100000)]
+    with open('benchmark_serialization_results.json', 'w') as f:
+        json.dump(all_results, f, indent=2)
+    print("\nResults have been saved to benchmark_serialization_results.json")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Кожен етап запускається в окремому інтерпретаторі, як холодний старт воркера
+STAGES = {
+    'import': "import app",
+    'create_app': "import app; app.create_app()",
+    'first_request': (
+        "import app; application = app.create_app(); "
+        "client = application.test_client(); "
+        "assert client.get('/doctors?limit=1').status_code == 200"
+    ),
+}
+# Як gunicorn --preload: фабрика виконується в майстрі, воркер лише форкається
+FORKED_WORKER = (
+    "import os, time; import app; application = app.create_app(); "
+    "started = time.perf_counter(); pid = os.fork()\n"
+    "if pid == 0:\n"
+    "    client = application.test_client()\n"
+    "    os._exit(0 if client.get('/doctors?limit=1').status_code == 200 else 1)\n"
+    "assert os.waitpid(pid, 0)[1] == 0\n"
+    "print(time.perf_counter() - started)"
+)
+TARGET_SECONDS = 1.0
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def timed_run(code, env):
+    """Повний час процесу: запуск інтерпретатора, імпорти та сам етап"""
+    script = f"import time; _start = time.perf_counter(); {code}; print(time.perf_counter() - _start)"
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', script], env=env, check=True, capture_output=True, text=True,
+        cwd=HERE
+    ).stdout
+    # Останній рядок - час від старту інтерпретатора, попередні - заміри самого етапу
+    return time.perf_counter() - started, [float(line) for line in output.split()]
+
+def main():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'benchmark_startup.db'))
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    # Схема створюється явно один раз, як і в розгортанні
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], env=env, check=True,
+                   cwd=HERE)
+
+    results = {}
+    for name, code in STAGES.items():
+        samples = [timed_run(code, env) for _ in range(runs)]
+        results[name] = {
+            'process_seconds': statistics.median(total for total, _ in samples),
+            'in_process_seconds': statistics.median(inner[-1] for _, inner in samples),
+        }
+        print(f"{name:>14}: {results[name]['process_seconds']:.3f} s process, "
+              f"{results[name]['in_process_seconds']:.3f} s after interpreter start")
+
+    if hasattr(os, 'fork'):
+        samples = [timed_run(FORKED_WORKER, env)[1][0] for _ in range(runs)]
+        results['forked_worker'] = {'seconds': statistics.median(samples)}
+        print(f"{'forked_worker':>14}: {results['forked_worker']['seconds']:.3f} s fork to first response")
+
+    print()
+    for name in ('first_request', 'forked_worker'):
+        if name in results:
+            seconds = results[name].get('process_seconds', results[name].get('seconds'))
+            verdict = 'OK' if seconds < TARGET_SECONDS else 'over'
+            print(f"{name}: {seconds:.3f} s ({verdict}, target {TARGET_SECONDS:.1f} s)")
+    with open('benchmark_startup_results.json', 'w') as f:
+        json.dump(results, f, indent=2)
+    print("Results have been saved to benchmark_startup_results.json")
+
+if __name__ == '__main__':
+    main()
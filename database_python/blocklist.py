@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from models.hospital import db
+from models.user import TokenBlocklist
+
+def utc_from_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+class LRUFront:
+    """Обмежений in-process кеш перевірок: jti -> (відкликано?, діє до timestamp)"""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, jti):
+        with self._lock:
+            entry = self._entries.get(jti)
+            if entry is None:
+                return None
+            revoked, valid_until = entry
+            if valid_until <= time.time():
+                del self._entries[jti]
+                return None
+            self._entries.move_to_end(jti)
+            return revoked
+
+    def put(self, jti, revoked, valid_until):
+        with self._lock:
+            self._entries[jti] = (revoked, valid_until)
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+class BlocklistFull(Exception):
+    pass
+
+class MemoryBlocklistStore:
+    """Сховище в пам'яті процесу: лише для одного воркера та тестів"""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            if jti not in self._expires and len(self._expires) >= self.maxsize:
+                self.purge_expired()
+                # Витіснення чинного запису мовчки повернуло б дію токену, тож відмовляємо
+                if len(self._expires) >= self.maxsize:
+                    raise BlocklistFull(
+                        f"Token blocklist is full ({self.maxsize} live entries); "
+                        "raise BLOCKLIST_MAX_ENTRIES or use BLOCKLIST_BACKEND=database"
+                    )
+            self._expires[jti] = expires_at
+
+    def contains(self, jti):
+        expires_at = self._expires.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def purge_expired(self):
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._expires.items() if expires_at <= now]:
+            del self._expires[jti]
+
+class DatabaseBlocklistStore:
+    """Спільне для всіх воркерів сховище в таблиці token_blocklist"""
+
+    def __init__(self, purge_every=1000):
+        self.purge_every = purge_every
+        self._adds = 0
+
+    def add(self, jti, expires_at):
+        try:
+            db.session.merge(TokenBlocklist(jti=jti, expires_at=utc_from_timestamp(expires_at)))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+        self._adds += 1
+        if self._adds % self.purge_every == 0:
+            self.purge_expired()
+
+    def contains(self, jti):
+        now = utc_from_timestamp(time.time())
+        return db.session.query(
+            TokenBlocklist.query.filter(
+                TokenBlocklist.jti == jti, TokenBlocklist.expires_at > now
+            ).exists()
+        ).scalar()
+
+    def purge_expired(self):
+        now = utc_from_timestamp(time.time())
+        try:
+            TokenBlocklist.query.filter(TokenBlocklist.expires_at <= now).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+class Blocklist:
+    """Відкликані токени з TTL до exp токена та LRU-кешем перед сховищем.
+
+    Відкликані jti кешуються до exp; негативні відповіді - лише на negative_ttl секунд,
+    щоб logout в іншому воркері набирав сили не пізніше ніж за цей час.
+    """
+
+    def __init__(self, store, cache_size=10000, negative_ttl=5):
+        self.store = store
+        self.front = LRUFront(cache_size)
+        self.negative_ttl = negative_ttl
+
+    def revoke(self, jti, expires_at):
+        if expires_at <= time.time():
+            return
+        self.store.add(jti, expires_at)
+        self.front.put(jti, True, expires_at)
+
+    def is_revoked(self, jti, expires_at):
+        cached = self.front.get(jti)
+        if cached is not None:
+            return cached
+        revoked = self.store.contains(jti)
+        if revoked:
+            self.front.put(jti, True, expires_at)
+        elif self.negative_ttl > 0:
+            self.front.put(jti, False, min(expires_at, time.time() + self.negative_ttl))
+        return revoked
+
+def create_blocklist(config):
+    backend = config.get('BLOCKLIST_BACKEND', 'database')
+    if backend == 'memory':
+        store = MemoryBlocklistStore(config.get('BLOCKLIST_MAX_ENTRIES', 100000))
+    elif backend == 'database':
+        store = DatabaseBlocklistStore()
+    else:
+        raise ValueError(f"Unknown BLOCKLIST_BACKEND '{backend}'")
+    return Blocklist(
+        store,
+        cache_size=config.get('BLOCKLIST_CACHE_SIZE', 10000),
+        negative_ttl=config.get('BLOCKLIST_NEGATIVE_TTL', 5)
+    )
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from bisect import bisect_right, insort
+from contextlib import asynccontextmanager, contextmanager
+from datetime import timedelta
+
+from sqlalchemy import func, select
+
+from models.hospital import Appointment
+
+# Перший ключ pg_advisory_xact_lock(int, int): простір бронювань, другий - id лікаря
+LOCK_NAMESPACE = 1001
+# Тривалість прийому: прийоми лікаря не повинні перетинатися на цьому відрізку
+APPOINTMENT = timedelta(minutes=30)
+
+class AppointmentConflict(Exception):
+    def __init__(self, doctor_id, appointment_id, appointment_datetime):
+        super().__init__(
+            f"Doctor {doctor_id} already has an appointment at {appointment_datetime.isoformat()}"
+        )
+        self.doctor_id = doctor_id
+        self.appointment_id = appointment_id
+        self.appointment_datetime = appointment_datetime
+
+def configure(appointment_minutes):
+    global APPOINTMENT
+    APPOINTMENT = timedelta(minutes=appointment_minutes)
+
+def lock_statement(doctor_id):
+    return select(func.pg_advisory_xact_lock(LOCK_NAMESPACE, doctor_id))
+
+def conflict_statement(doctor_id, start, exclude_id=None):
+    """Прийом лікаря, що перетинає [start, start + APPOINTMENT): range scan по (doctor_id, appointment_datetime)"""
+    statement = select(Appointment.id, Appointment.appointment_datetime).where(
+        Appointment.doctor_id == doctor_id,
+        Appointment.appointment_datetime > start - APPOINTMENT,
+        Appointment.appointment_datetime < start + APPOINTMENT
+    )
+    if exclude_id is not None:
+        statement = statement.where(Appointment.id != exclude_id)
+    return statement.limit(1)
+
+def uses_advisory_locks(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+_thread_locks = {}
+_async_locks = {}
+_guard = threading.Lock()
+
+def _lock_for(locks, doctor_id, factory):
+    with _guard:
+        lock = locks.get(doctor_id)
+        if lock is None:
+            lock = locks[doctor_id] = factory()
+        return lock
+
+@contextmanager
+def doctors_locked(session, doctor_ids):
+    """Серіалізує бронювання лише цих лікарів до кінця транзакції; commit - всередині блоку.
+
+    PostgreSQL: pg_advisory_xact_lock на кожного лікаря діє для всіх воркерів і хостів
+    та знімається самим commit/rollback. Інші СУБД: threading.Lock на лікаря, лише в межах процесу.
+    """
+    # Однаковий порядок захоплення, щоб пакетні бронювання не блокували одне одного взаємно
+    doctor_ids = sorted(set(doctor_ids))
+    acquired = []
+    try:
+        if uses_advisory_locks(session):
+            for doctor_id in doctor_ids:
+                session.execute(lock_statement(doctor_id))
+        else:
+            for doctor_id in doctor_ids:
+                lock = _lock_for(_thread_locks, doctor_id, threading.Lock)
+                lock.acquire()
+                acquired.append(lock)
+        yield
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
+
+@asynccontextmanager
+async def async_doctors_locked(session, doctor_ids):
+    """doctors_locked для AsyncSession: без advisory-локів - asyncio.Lock на лікаря"""
+    doctor_ids = sorted(set(doctor_ids))
+    acquired = []
+    try:
+        if session.bind.dialect.name == 'postgresql':
+            for doctor_id in doctor_ids:
+                await session.execute(lock_statement(doctor_id))
+        else:
+            for doctor_id in doctor_ids:
+                lock = _lock_for(_async_locks, doctor_id, asyncio.Lock)
+                await lock.acquire()
+                acquired.append(lock)
+        yield
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        for lock in reversed(acquired):
+            lock.release()
+
+def check_available(session, doctor_id, start, exclude_id=None):
+    """Викликати під doctors_locked: інакше паралельне бронювання може проскочити між перевіркою та INSERT"""
+    conflict = session.execute(conflict_statement(doctor_id, start, exclude_id)).first()
+    if conflict is not None:
+        raise AppointmentConflict(doctor_id, *conflict)
+
+def reject_conflicts(session, values, positions, errors):
+    """Пакетне бронювання: рядки, що перетинаються з наявними прийомами або між собою, стають помилками.
+
+    Один range-запит на лікаря; повертає (values, positions) прийнятих рядків.
+    """
+    by_doctor = {}
+    for value, position in zip(values, positions):
+        by_doctor.setdefault(value['doctor_id'], []).append((value['appointment_datetime'], position, value))
+
+    accepted = []
+    for doctor_id, items in by_doctor.items():
+        items.sort(key=lambda item: item[0])
+        booked = sorted(session.scalars(select(Appointment.appointment_datetime).where(
+            Appointment.doctor_id == doctor_id,
+            Appointment.appointment_datetime > items[0][0] - APPOINTMENT,
+            Appointment.appointment_datetime < items[-1][0] + APPOINTMENT
+        )))
+        for start, position, value in items:
+            index = bisect_right(booked, start - APPOINTMENT)
+            if index < len(booked) and booked[index] < start + APPOINTMENT:
+                errors.append({'index': position, 'error': str(AppointmentConflict(doctor_id, None, booked[index]))})
+                continue
+            insort(booked, start)
+            accepted.append((position, value))
+
+    errors.sort(key=lambda error: error['index'])
+    accepted.sort(key=lambda item: item[0])
+    return [value for _, value in accepted], [position for position, _ in accepted]
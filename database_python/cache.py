@@ -0,0 +1,110 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+import changes
+import versions
+
+_MISSING = object()
+
+class TTLCache:
+    """LRU-кеш з обмеженим розміром, TTL та лічильниками влучань/промахів.
+
+    Кожен запис позначено версіями таблиць tables зі спільного файлу versions.py на момент
+    перед читанням з БД: commit в іншому воркері чи loader.py/seed.py змінює версію,
+    і запис стає промахом одразу, а не після TTL. TTL лише обмежує життя записів,
+    коли файл версій не налаштовано.
+    """
+
+    def __init__(self, name, tables, maxsize=1024, ttl=60):
+        self.name = name
+        self.tables = frozenset(tables)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Збільшується при кожній інвалідації, щоб не зберегти значення, прочитане до commit
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stamp(self):
+        """Поточні версії таблиць регіону (None, якщо versions не налаштовано)"""
+        table_versions = versions.get_versions()
+        if table_versions is None:
+            return None
+        return tuple(table_versions.get(table) for table in sorted(self.tables))
+
+    def get(self, key, stamp=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic() and entry[2] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return _MISSING
+
+    def set(self, key, value, generation, stamp=None):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl, stamp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+departments = TTLCache('departments', ['departments'])
+# Видалення відділення обнуляє department_id його лікарів усередині flush (relationship
+# Department.doctors), і after_flush бачить лише departments - тож скидаємо й лікарів
+doctors = TTLCache('doctors', ['doctors', 'departments'])
+REGIONS = [departments, doctors]
+
+def configure(maxsize, ttl):
+    for region in REGIONS:
+        region.maxsize = maxsize
+        region.ttl = ttl
+        region.invalidate()
+
+# Commit цього процесу звільняє регіон одразу; чужі зміни відсіює TTLCache.stamp
+@changes.on_commit
+def _invalidate_regions(tables):
+    for region in REGIONS:
+        if region.tables & tables:
+            region.invalidate()
+
+def cached(region):
+    """Read-through кеш для методів CRUD, що повертають рядки Core-запиту (Row).
+
+    Кешуються саме рядки, які маршрути віддають енкодеру, а не ORM-об'єкти: їх не треба
+    повертати в сесію (merge на кожне влучання повільніший за сам SELECT), і commit
+    в іншій сесії не робить їх expired. Аргументи методу мають бути hashable.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+            # Версії беруться до SELECT: commit між ними і SELECT лише зробить запис застарілим
+            stamp = region.stamp()
+            hit = region.get(key, stamp)
+            if hit is not _MISSING:
+                return hit
+
+            generation = region.generation
+            result = func(*args, **kwargs)
+            if result is not None:
+                region.set(key, result, generation, stamp)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,35 @@
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Слухачі отримують множину імен таблиць, змінених транзакцією, після її commit
+_listeners = []
+
+def on_commit(listener):
+    _listeners.append(listener)
+    return listener
+
+def mark_changed(session, *tables):
+    """Для змін поза unit of work (bulk insert, Query.delete), які after_flush не бачить"""
+    session.info.setdefault('changed_tables', set()).update(tables)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_tables(session, flush_context):
+    tables = session.info.setdefault('changed_tables', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            tables.add(table)
+
+@event.listens_for(Session, 'after_commit')
+def _notify_listeners(session):
+    tables = session.info.pop('changed_tables', None)
+    if not tables:
+        return
+    for listener in _listeners:
+        listener(tables)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changed_tables(session):
+    session.info.pop('changed_tables', None)
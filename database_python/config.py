@@ -1,18 +1,59 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 from datetime import timedelta
 
 load_dotenv()
 
-# Отримуємо URL бази даних
+# Отримуємо URL бази даних; перевіряється у фабриці застосунку, а не під час імпорту
 database_url = os.getenv('DATABASE_URL')
-if not database_url:
-    raise ValueError("DATABASE_URL не знайдено в змінних середовища")
 
 class Config:
     SQLALCHEMY_DATABASE_URI = database_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Пул з'єднань кожного воркера; SQLALCHEMY_ENGINE_OPTIONS будує create_app (pooling.engine_options)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
     JWT_SECRET_KEY = "your-secret-key"
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
-    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
\ No newline at end of file
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Відкликані JWT: 'database' (спільна таблиця) або 'memory' (лише поточний процес)
+    BLOCKLIST_BACKEND = os.getenv('BLOCKLIST_BACKEND', 'database')
+    BLOCKLIST_CACHE_SIZE = int(os.getenv('BLOCKLIST_CACHE_SIZE', 10000))
+    BLOCKLIST_NEGATIVE_TTL = float(os.getenv('BLOCKLIST_NEGATIVE_TTL', 5))
+    # Найбільше чинних записів у 'memory'; коли їх більше, logout відповідає 503
+    BLOCKLIST_MAX_ENTRIES = int(os.getenv('BLOCKLIST_MAX_ENTRIES', 100000))
+    # PBKDF2: кількість раундів та розмір пулу процесів для хешування (0 - без пулу)
+    PASSWORD_HASH_ROUNDS = int(os.getenv('PASSWORD_HASH_ROUNDS', 29000))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    # Кеш довідкових даних (відділення, лікарі) у кожному процесі
+    REFERENCE_CACHE_SIZE = int(os.getenv('REFERENCE_CACHE_SIZE', 1024))
+    REFERENCE_CACHE_TTL = float(os.getenv('REFERENCE_CACHE_TTL', 60))
+    # Заголовок Server-Timing та журнал запитів, довших за SLOW_QUERY_MS (0 - вимкнено)
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG')
+    # Знімки метрик воркерів для /metrics: каталог та мінімальний інтервал запису, с
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'hospital_metrics'))
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 1))
+    # Пошук вільних слотів: тривалість прийому, робочі години та горизонт індексу розкладу, дні
+    APPOINTMENT_MINUTES = int(os.getenv('APPOINTMENT_MINUTES', 30))
+    CLINIC_OPEN_HOUR = int(os.getenv('CLINIC_OPEN_HOUR', 8))
+    CLINIC_CLOSE_HOUR = int(os.getenv('CLINIC_CLOSE_HOUR', 18))
+    SCHEDULE_HORIZON_DAYS = int(os.getenv('SCHEDULE_HORIZON_DAYS', 14))
+    # Спільний для воркерів хоста файл версій таблиць (для ETag)
+    TABLE_VERSIONS_PATH = os.getenv(
+        'TABLE_VERSIONS_PATH', os.path.join(tempfile.gettempdir(), 'hospital_table_versions.bin')
+    )
+
+def config_dict(config=Config):
+    """Налаштування класу конфігурації як dict, для коду поза Flask"""
+    return {key: getattr(config, key) for key in dir(config) if key.isupper()}
+
+def check_config(config):
+    if not config.get('SQLALCHEMY_DATABASE_URI'):
+        raise ValueError("DATABASE_URL не знайдено в змінних середовища")
@@ -0,0 +1,103 @@
+import os
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from datetime import date
+
+import pytest
+from flask import Flask
+
+from models.hospital import db, Department, Doctor, Patient, Gender
+from config import Config
+import booking
+import cache
+import scheduling
+import search_index
+import versions
+
+class TestConfig(Config):
+    PASSWORD_HASH_WORKERS = 0
+    METRICS_DIR = None
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Фабрика тестових застосунків: make_app(**overrides), overrides - ключі конфігурації.
+
+    Кожен застосунок - окрема файлова SQLite у tmp_path (її бачать і інші потоки) зі створеними
+    таблицями та власним файлом версій. routes=True - повний app.create_app з маршрутами,
+    інакше лише Flask-SQLAlchemy та модулі, які create_app налаштовує (версії, кеш, індекси).
+    """
+    apps = []
+
+    def factory(routes=False, **overrides):
+        config = type('TestConfig', (TestConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / f'test{len(apps)}.db'),
+            'TABLE_VERSIONS_PATH': str(tmp_path / f'versions{len(apps)}.bin'),
+            **overrides,
+        })
+        if routes:
+            from app import create_app
+            app = create_app(config)
+        else:
+            app = Flask(__name__)
+            app.config.from_object(config)
+            db.init_app(app)
+            versions.configure(app.config['TABLE_VERSIONS_PATH'])
+            cache.configure(app.config['REFERENCE_CACHE_SIZE'], app.config['REFERENCE_CACHE_TTL'])
+            booking.configure(app.config['APPOINTMENT_MINUTES'])
+            scheduling.configure(
+                app.config['APPOINTMENT_MINUTES'], app.config['CLINIC_OPEN_HOUR'],
+                app.config['CLINIC_CLOSE_HOUR'], app.config['SCHEDULE_HORIZON_DAYS']
+            )
+        search_index.index.invalidate()
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+@pytest.fixture
+def app(make_app):
+    """Застосунок з налаштуваннями за замовчуванням і активним app context"""
+    app = make_app()
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+def seed_clinic(doctors=1):
+    """Відділення кардіології, пацієнтка Марія Коваленко і doctors кардіологів Петренко0..N-1"""
+    department = Department(name='Кардіологія', floor_number=3)
+    db.session.add(department)
+    db.session.flush()
+    patient = Patient(
+        first_name='Марія',
+        last_name='Коваленко',
+        date_of_birth=date(1990, 5, 15),
+        gender=Gender.FEMALE,
+        phone_number='+380997654321',
+        address='вул. Шевченка, 1, Київ',
+        email='kovalenko@gmail.com'
+    )
+    doctors = [
+        Doctor(
+            first_name='Іван',
+            last_name=f'Петренко{i}',
+            specialty='Кардіолог',
+            phone_number='+380991234567',
+            email=f'petrenko{i}@hospital.com',
+            department_id=department.id
+        )
+        for i in range(doctors)
+    ]
+    db.session.add_all([patient, *doctors])
+    db.session.commit()
+    return patient.id, [doctor.id for doctor in doctors]
+
+@pytest.fixture
+def clinic():
+    """seed_clinic(doctors) -> (id пацієнтки, id лікарів); викликати в app context"""
+    return seed_clinic
@@ -1,6 +1,15 @@
-from models.hospital import db, Department, Doctor, Patient, Appointment, Prescription, Gender
+from flask import abort
+from models.hospital import db, Department, Doctor, Patient, Appointment, Prescription, Gender, PATIENT_SEARCH_TEXT
+from pagination import DEFAULT_PAGE_SIZE, keyset_filter, split_page
+from cache import cached, departments as departments_cache, doctors as doctors_cache
+from changes import mark_changed
+import booking
+import search_index
+from sqlalchemy import Row, Select, Text, bindparam, func, insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import joinedload, selectinload
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
 
 class BaseCRUD:
     @staticmethod
@@ -23,12 +32,135 @@ class BaseCRUD:
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def validate_rows(parse: Callable[[dict], dict], rows: List[dict]) -> Tuple[list, list, list]:
+        """Повертає значення коректних рядків, їх позиції у вхідному списку та помилки решти"""
+        values, positions, errors = [], [], []
+        for index, data in enumerate(rows):
+            try:
+                values.append(parse(data))
+                positions.append(index)
+            except KeyError as e:
+                errors.append({'index': index, 'error': f"Missing field {e}"})
+            except (ValueError, TypeError) as e:
+                errors.append({'index': index, 'error': str(e) or "Invalid row"})
+        return values, positions, errors
+
+    @staticmethod
+    def insert_many(model, parse: Callable[[dict], dict], rows: List[dict]) -> dict:
+        """Перевіряє рядки та вставляє коректні одним executemany в одній транзакції"""
+        values, positions, errors = BaseCRUD.validate_rows(parse, rows)
+        return BaseCRUD.insert_values(model, values, positions, errors)
+
+    @staticmethod
+    def insert_values(model, values: list, positions: list, errors: list) -> dict:
+        """Вставляє пакет одним executemany у SAVEPOINT. Якщо БД його відхилила (унікальність,
+        FK, тип значення), рядки вставляються по одному, кожен у своєму SAVEPOINT, і помилку
+        отримує лише рядок, що її спричинив.
+
+        id зіставляються з рядками за порядком параметрів: PostgreSQL повертає їх у цьому порядку
+        в пакетному INSERT ... RETURNING. SQLite такого порядку не гарантує, а sort_by_parameter_order
+        там означав би INSERT на кожен рядок - натомість id сортуються: rowid нового рядка
+        завжди max(rowid) + 1, а записує в SQLite одна транзакція за раз. На інших СУБД
+        SQLAlchemy може перейти на INSERT на кожен рядок.
+        """
+        ids, created = [], []
+        if values:
+            sqlite = db.session.get_bind().dialect.name == 'sqlite'
+            statement = insert(model).returning(model.id, sort_by_parameter_order=not sqlite)
+            try:
+                try:
+                    with db.session.begin_nested():
+                        ids = db.session.scalars(statement, values).all()
+                    if sqlite:
+                        ids.sort()
+                    created = positions
+                except DBAPIError:
+                    for value, position in zip(values, positions):
+                        try:
+                            with db.session.begin_nested():
+                                ids.append(db.session.scalars(statement, [value]).one())
+                            created.append(position)
+                        except DBAPIError as e:
+                            errors.append({'index': position, 'error': str(e.orig)})
+                    errors.sort(key=lambda error: error['index'])
+                if ids:
+                    mark_changed(db.session, model.__tablename__)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                raise e
+        return {
+            'created': [{'index': index, 'id': id_} for index, id_ in zip(created, ids)],
+            'errors': errors
+        }
+
+    @staticmethod
+    def projection(model, keys, fields: Optional[List[str]]) -> Optional[list]:
+        """Колонки для SELECT: лише запитані поля плюс ключ сортування (None - уся модель)"""
+        if not fields:
+            return None
+        names = dict.fromkeys([*fields, *(key.key for key in keys)])
+        return [getattr(model, name) for name in names]
+
+    @staticmethod
+    def paginate(model, keys, limit: int, after: Optional[str] = None,
+                 fields: Optional[List[str]] = None) -> Tuple[list, Optional[str]]:
+        """Keyset-пагінація: WHERE ключ > курсор ORDER BY ключ LIMIT limit + 1"""
+        columns = BaseCRUD.projection(model, keys, fields)
+        query = db.session.query(*columns) if columns else model.query
+        query = keyset_filter(query, keys, after)
+        items = query.order_by(*keys).limit(limit + 1).all()
+        return split_page(items, keys, limit)
+
+    @staticmethod
+    def columns(model, fields: Optional[Sequence[str]]) -> list:
+        """Колонки fields у їх порядку; None - усі колонки таблиці"""
+        if not fields:
+            return list(model.__table__.columns)
+        return [getattr(model, name) for name in fields]
+
+    @staticmethod
+    def rows(model, fields: Optional[Sequence[str]] = None, **filters) -> List[Row]:
+        """Рядки Core (іменовані кортежі колонок fields) за id, що відповідають filter_by(**filters)"""
+        statement = select(*BaseCRUD.columns(model, fields)).filter_by(**filters).order_by(model.id)
+        return db.session.execute(statement).all()
+
+    @staticmethod
+    def row(model, item_id: int, fields: Optional[Sequence[str]] = None) -> Row:
+        """Рядок Core з колонками fields; 404, якщо його немає"""
+        row = db.session.execute(select(*BaseCRUD.columns(model, fields)).where(model.id == item_id)).first()
+        if row is None:
+            abort(404)
+        return row
+
+    @staticmethod
+    def stream(model, keys, batch_size: int = 1000, fields: Optional[List[str]] = None):
+        """Ітерує всю таблицю через серверний курсор, вибираючи batch_size рядків за раз"""
+        columns = BaseCRUD.projection(model, keys, fields)
+        statement = select(*columns) if columns else select(model)
+        statement = statement.order_by(*keys).execution_options(
+            stream_results=True, yield_per=batch_size
+        )
+        if columns:
+            return db.session.execute(statement)
+        return db.session.scalars(statement)
+
 class DepartmentCRUD(BaseCRUD):
+    model = Department
+
     @staticmethod
     def create(name: str, floor_number: int) -> Department:
         department = Department(name=name, floor_number=floor_number)
         return BaseCRUD.add_and_commit(department)
 
+    @staticmethod
+    def parse(data: dict) -> dict:
+        return {
+            'name': data['name'],
+            'floor_number': data['floor_number']
+        }
+
     @staticmethod
     def get(department_id: int) -> Optional[Department]:
         return Department.query.get_or_404(department_id)
@@ -37,6 +169,25 @@ class DepartmentCRUD(BaseCRUD):
     def get_all() -> List[Department]:
         return Department.query.all()
 
+    @staticmethod
+    @cached(departments_cache)
+    def get_row(department_id: int, fields: Optional[Tuple[str, ...]] = None) -> Row:
+        return BaseCRUD.row(Department, department_id, fields)
+
+    @staticmethod
+    @cached(departments_cache)
+    def get_rows(fields: Optional[Tuple[str, ...]] = None, **filters) -> List[Row]:
+        return BaseCRUD.rows(Department, fields, **filters)
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                 fields: Optional[List[str]] = None) -> Tuple[List[Department], Optional[str]]:
+        return BaseCRUD.paginate(Department, [Department.id], limit, after, fields)
+
+    @staticmethod
+    def iter_all(batch_size: int = 1000, fields: Optional[List[str]] = None) -> Iterator[Department]:
+        return BaseCRUD.stream(Department, [Department.id], batch_size, fields)
+
     @staticmethod
     def update(department_id: int, **kwargs) -> Department:
         department = DepartmentCRUD.get(department_id)
@@ -50,6 +201,8 @@ class DepartmentCRUD(BaseCRUD):
         return BaseCRUD.delete_and_commit(department)
 
 class DoctorCRUD(BaseCRUD):
+    model = Doctor
+
     @staticmethod
     def create(first_name: str, last_name: str, specialty: str,
               phone_number: str, email: str, department_id: int) -> Doctor:
@@ -63,6 +216,21 @@ class DoctorCRUD(BaseCRUD):
         )
         return BaseCRUD.add_and_commit(doctor)
 
+    @staticmethod
+    def parse(data: dict) -> dict:
+        return {
+            'first_name': data['first_name'],
+            'last_name': data['last_name'],
+            'specialty': data['specialty'],
+            'phone_number': data['phone_number'],
+            'email': data['email'],
+            'department_id': data['department_id']
+        }
+
+    @staticmethod
+    def create_many(rows: List[dict]) -> dict:
+        return BaseCRUD.insert_many(Doctor, DoctorCRUD.parse, rows)
+
     @staticmethod
     def get(doctor_id: int) -> Optional[Doctor]:
         return Doctor.query.get_or_404(doctor_id)
@@ -72,8 +240,40 @@ class DoctorCRUD(BaseCRUD):
         return Doctor.query.all()
 
     @staticmethod
-    def get_by_department(department_id: int) -> List[Doctor]:
-        return Doctor.query.filter_by(department_id=department_id).all()
+    @cached(doctors_cache)
+    def get_row(doctor_id: int, fields: Optional[Tuple[str, ...]] = None) -> Row:
+        return BaseCRUD.row(Doctor, doctor_id, fields)
+
+    @staticmethod
+    @cached(doctors_cache)
+    def get_rows(fields: Optional[Tuple[str, ...]] = None, **filters) -> List[Row]:
+        return BaseCRUD.rows(Doctor, fields, **filters)
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                 fields: Optional[List[str]] = None) -> Tuple[List[Doctor], Optional[str]]:
+        return BaseCRUD.paginate(Doctor, [Doctor.id], limit, after, fields)
+
+    @staticmethod
+    def iter_all(batch_size: int = 1000, fields: Optional[List[str]] = None) -> Iterator[Doctor]:
+        return BaseCRUD.stream(Doctor, [Doctor.id], batch_size, fields)
+
+    @staticmethod
+    def get_workload(doctor_id: int) -> Doctor:
+        """Лікар з відділенням, прийомами та рецептами (з пацієнтами) за 3 запити"""
+        return Doctor.query.options(
+            joinedload(Doctor.department),
+            selectinload(Doctor.appointments).joinedload(Appointment.patient),
+            selectinload(Doctor.prescriptions).joinedload(Prescription.patient)
+        ).filter(Doctor.id == doctor_id).first_or_404()
+
+    @staticmethod
+    def get_by_department(department_id: int, fields: Optional[Tuple[str, ...]] = None) -> List[Row]:
+        return DoctorCRUD.get_rows(fields, department_id=department_id)
+
+    @staticmethod
+    def get_by_specialty(specialty: str, fields: Optional[Tuple[str, ...]] = None) -> List[Row]:
+        return DoctorCRUD.get_rows(fields, specialty=specialty)
 
     @staticmethod
     def update(doctor_id: int, **kwargs) -> Doctor:
@@ -88,6 +288,8 @@ class DoctorCRUD(BaseCRUD):
         return BaseCRUD.delete_and_commit(doctor)
 
 class PatientCRUD(BaseCRUD):
+    model = Patient
+
     @staticmethod
     def create(first_name: str, last_name: str, date_of_birth: datetime,
               gender: Gender, phone_number: str, address: str, email: str) -> Patient:
@@ -102,6 +304,36 @@ class PatientCRUD(BaseCRUD):
         )
         return BaseCRUD.add_and_commit(patient)
 
+    @staticmethod
+    def parse(data: dict) -> dict:
+        return {
+            'first_name': data['first_name'],
+            'last_name': data['last_name'],
+            'date_of_birth': datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date(),
+            'gender': Gender(data['gender']),
+            'phone_number': data['phone_number'],
+            'address': data['address'],
+            'email': data['email']
+        }
+
+    @staticmethod
+    def create_many(rows: List[dict]) -> dict:
+        return BaseCRUD.insert_many(Patient, PatientCRUD.parse, rows)
+
+    @staticmethod
+    def parse_partial(data: dict) -> dict:
+        """Часткове оновлення: лише відомі колонки (крім id) з перетворенням типів"""
+        values = {}
+        for key, value in data.items():
+            if key == 'id' or key not in Patient.__table__.columns:
+                continue
+            if key == 'date_of_birth':
+                value = datetime.strptime(value, '%Y-%m-%d').date()
+            if key == 'gender':
+                value = Gender(value)
+            values[key] = value
+        return values
+
     @staticmethod
     def get(patient_id: int) -> Optional[Patient]:
         return Patient.query.get_or_404(patient_id)
@@ -110,6 +342,78 @@ class PatientCRUD(BaseCRUD):
     def get_all() -> List[Patient]:
         return Patient.query.all()
 
+    @staticmethod
+    def get_row(patient_id: int, fields: Optional[Tuple[str, ...]] = None) -> Row:
+        return BaseCRUD.row(Patient, patient_id, fields)
+
+    @staticmethod
+    def get_rows(fields: Optional[Tuple[str, ...]] = None, **filters) -> List[Row]:
+        return BaseCRUD.rows(Patient, fields, **filters)
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                 fields: Optional[List[str]] = None) -> Tuple[List[Patient], Optional[str]]:
+        return BaseCRUD.paginate(Patient, [Patient.id], limit, after, fields)
+
+    @staticmethod
+    def iter_all(batch_size: int = 1000, fields: Optional[List[str]] = None) -> Iterator[Patient]:
+        return BaseCRUD.stream(Patient, [Patient.id], batch_size, fields)
+
+    @staticmethod
+    def search_statement(text: str, phone: bool, fields: Optional[List[str]] = None) -> Select:
+        """Запит для PostgreSQL: KNN-обхід триграмного GiST-індексу ix_patients_search_trgm,
+        що з LIMIT зупиняється після limit рядків"""
+        columns = BaseCRUD.projection(Patient, [Patient.id], fields)
+        statement = select(*columns) if columns else select(Patient)
+        term = bindparam('query', text, type_=Text)
+        # Телефон - підрядок цифр (LIKE теж іде через триграмний індекс), решта - word_similarity
+        condition = PATIENT_SEARCH_TEXT.like(f'%{text}%') if phone else PATIENT_SEARCH_TEXT.op('%>')(term)
+        return statement.where(condition).order_by(PATIENT_SEARCH_TEXT.op('<->>')(term), Patient.id)
+
+    @staticmethod
+    def search(query: str, limit: int = search_index.DEFAULT_LIMIT, fields: Optional[List[str]] = None,
+               session=None) -> list:
+        """Пацієнти, схожі на запит за ім'ям, прізвищем, email або цифрами телефону; найсхожіші першими.
+
+        PostgreSQL - search_statement, інші СУБД - n-грамний індекс у пам'яті (search_index.py).
+        Якщо збігів менше за limit, поріг схожості знижується до search_index.FALLBACK_THRESHOLD.
+        session - синхронна сесія (для ASGI), за замовчуванням db.session.
+        ValueError для надто короткого запиту.
+        """
+        session = session if session is not None else db.session
+        text, phone = search_index.parse_query(query)
+
+        def fetch(statement):
+            result = session.execute(statement)
+            return result.all() if fields else result.scalars().all()
+
+        if session.get_bind().dialect.name == 'postgresql':
+            statement = PatientCRUD.search_statement(text, phone, fields).limit(limit)
+            rows = fetch(statement)
+            if phone or len(rows) >= limit:
+                return rows
+            # Той самий запит з нижчим порогом %> до кінця транзакції: перші limit рядків
+            # за відстанню від цього не змінюються, тож наступним пошукам він не шкодить
+            session.execute(select(func.set_config(
+                'pg_trgm.word_similarity_threshold', str(search_index.FALLBACK_THRESHOLD), True
+            )))
+            return fetch(statement)
+        ids = search_index.index.search(text, phone, limit, session=session)
+        if not ids:
+            return []
+        columns = BaseCRUD.projection(Patient, [Patient.id], fields)
+        statement = (select(*columns) if columns else select(Patient)).where(Patient.id.in_(ids))
+        rows = {row.id: row for row in fetch(statement)}
+        return [rows[patient_id] for patient_id in ids if patient_id in rows]
+
+    @staticmethod
+    def get_chart(patient_id: int) -> Patient:
+        """Пацієнт з прийомами, рецептами та лікарями за 3 запити замість N+1"""
+        return Patient.query.options(
+            selectinload(Patient.appointments).joinedload(Appointment.doctor),
+            selectinload(Patient.prescriptions).joinedload(Prescription.doctor)
+        ).filter(Patient.id == patient_id).first_or_404()
+
     @staticmethod
     def update(patient_id: int, **kwargs) -> Patient:
         patient = PatientCRUD.get(patient_id)
@@ -123,16 +427,38 @@ class PatientCRUD(BaseCRUD):
         return BaseCRUD.delete_and_commit(patient)
 
 class AppointmentCRUD(BaseCRUD):
+    model = Appointment
+
     @staticmethod
     def create(patient_id: int, doctor_id: int,
               appointment_datetime: datetime, reason_for_visit: str) -> Appointment:
-        appointment = Appointment(
-            patient_id=patient_id,
-            doctor_id=doctor_id,
-            appointment_datetime=appointment_datetime,
-            reason_for_visit=reason_for_visit
-        )
-        return BaseCRUD.add_and_commit(appointment)
+        """Бронює час лікаря; AppointmentConflict, якщо він перетинається з наявним прийомом"""
+        with booking.doctors_locked(db.session, [doctor_id]):
+            booking.check_available(db.session, doctor_id, appointment_datetime)
+            appointment = Appointment(
+                patient_id=patient_id,
+                doctor_id=doctor_id,
+                appointment_datetime=appointment_datetime,
+                reason_for_visit=reason_for_visit
+            )
+            return BaseCRUD.add_and_commit(appointment)
+
+    @staticmethod
+    def parse(data: dict) -> dict:
+        return {
+            'patient_id': data['patient_id'],
+            'doctor_id': data['doctor_id'],
+            'appointment_datetime': datetime.fromisoformat(data['appointment_datetime']),
+            'reason_for_visit': data['reason_for_visit']
+        }
+
+    @staticmethod
+    def create_many(rows: List[dict]) -> dict:
+        """Рядки, що перетинаються з наявними прийомами чи між собою, повертаються як помилки"""
+        values, positions, errors = BaseCRUD.validate_rows(AppointmentCRUD.parse, rows)
+        with booking.doctors_locked(db.session, [value['doctor_id'] for value in values]):
+            values, positions = booking.reject_conflicts(db.session, values, positions, errors)
+            return BaseCRUD.insert_values(Appointment, values, positions, errors)
 
     @staticmethod
     def get(appointment_id: int) -> Optional[Appointment]:
@@ -143,19 +469,67 @@ class AppointmentCRUD(BaseCRUD):
         return Appointment.query.all()
 
     @staticmethod
-    def get_by_doctor(doctor_id: int) -> List[Appointment]:
-        return Appointment.query.filter_by(doctor_id=doctor_id).all()
+    def get_row(appointment_id: int, fields: Optional[Tuple[str, ...]] = None) -> Row:
+        return BaseCRUD.row(Appointment, appointment_id, fields)
+
+    @staticmethod
+    def get_rows(fields: Optional[Tuple[str, ...]] = None, **filters) -> List[Row]:
+        return BaseCRUD.rows(Appointment, fields, **filters)
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                 fields: Optional[List[str]] = None) -> Tuple[List[Appointment], Optional[str]]:
+        return BaseCRUD.paginate(Appointment, [Appointment.appointment_datetime, Appointment.id], limit, after, fields)
+
+    @staticmethod
+    def iter_all(batch_size: int = 1000, fields: Optional[List[str]] = None) -> Iterator[Appointment]:
+        return BaseCRUD.stream(Appointment, [Appointment.appointment_datetime, Appointment.id], batch_size, fields)
+
+    @staticmethod
+    def get_by_doctor(doctor_id: int, fields: Optional[Tuple[str, ...]] = None) -> List[Row]:
+        return AppointmentCRUD.get_rows(fields, doctor_id=doctor_id)
 
     @staticmethod
-    def get_by_patient(patient_id: int) -> List[Appointment]:
-        return Appointment.query.filter_by(patient_id=patient_id).all()
+    def range_statement(doctor_id: Optional[int], start: datetime, end: datetime,
+                        fields: Optional[List[str]] = None) -> Select:
+        """Прийоми в напіввідкритому інтервалі [start, end): порівняння з самою колонкою,
+        без DATE(), тож для лікаря це один range scan по (doctor_id, appointment_datetime)"""
+        keys = [Appointment.appointment_datetime, Appointment.id]
+        columns = BaseCRUD.projection(Appointment, keys, fields)
+        statement = select(*columns) if columns else select(Appointment)
+        if doctor_id is not None:
+            statement = statement.where(Appointment.doctor_id == doctor_id)
+        statement = statement.where(Appointment.appointment_datetime >= start, Appointment.appointment_datetime < end)
+        return statement.order_by(*keys)
+
+    @staticmethod
+    def get_range(doctor_id: Optional[int], start: datetime, end: datetime,
+                  fields: Optional[List[str]] = None) -> list:
+        statement = AppointmentCRUD.range_statement(doctor_id, start, end, fields)
+        if fields:
+            return db.session.execute(statement).all()
+        return db.session.scalars(statement).all()
+
+    @staticmethod
+    def get_by_patient(patient_id: int, fields: Optional[Tuple[str, ...]] = None) -> List[Row]:
+        return AppointmentCRUD.get_rows(fields, patient_id=patient_id)
 
     @staticmethod
     def update(appointment_id: int, **kwargs) -> Appointment:
         appointment = AppointmentCRUD.get(appointment_id)
-        for key, value in kwargs.items():
-            setattr(appointment, key, value)
-        return BaseCRUD.add_and_commit(appointment)
+        if not {'doctor_id', 'appointment_datetime'} & kwargs.keys():
+            for key, value in kwargs.items():
+                setattr(appointment, key, value)
+            return BaseCRUD.add_and_commit(appointment)
+        doctor_id = kwargs.get('doctor_id', appointment.doctor_id)
+        with booking.doctors_locked(db.session, [doctor_id]):
+            booking.check_available(
+                db.session, doctor_id, kwargs.get('appointment_datetime', appointment.appointment_datetime),
+                exclude_id=appointment.id
+            )
+            for key, value in kwargs.items():
+                setattr(appointment, key, value)
+            return BaseCRUD.add_and_commit(appointment)
 
     @staticmethod
     def delete(appointment_id: int) -> bool:
@@ -163,6 +537,8 @@ class AppointmentCRUD(BaseCRUD):
         return BaseCRUD.delete_and_commit(appointment)
 
 class PrescriptionCRUD(BaseCRUD):
+    model = Prescription
+
     @staticmethod
     def create(patient_id: int, doctor_id: int, medication_name: str,
               dosage: str, frequency: str, start_date: datetime,
@@ -178,6 +554,22 @@ class PrescriptionCRUD(BaseCRUD):
         )
         return BaseCRUD.add_and_commit(prescription)
 
+    @staticmethod
+    def parse(data: dict) -> dict:
+        return {
+            'patient_id': data['patient_id'],
+            'doctor_id': data['doctor_id'],
+            'medication_name': data['medication_name'],
+            'dosage': data['dosage'],
+            'frequency': data['frequency'],
+            'start_date': datetime.strptime(data['start_date'], '%Y-%m-%d').date(),
+            'end_date': datetime.strptime(data['end_date'], '%Y-%m-%d').date()
+        }
+
+    @staticmethod
+    def create_many(rows: List[dict]) -> dict:
+        return BaseCRUD.insert_many(Prescription, PrescriptionCRUD.parse, rows)
+
     @staticmethod
     def get(prescription_id: int) -> Optional[Prescription]:
         return Prescription.query.get_or_404(prescription_id)
@@ -187,12 +579,29 @@ class PrescriptionCRUD(BaseCRUD):
         return Prescription.query.all()
 
     @staticmethod
-    def get_by_patient(patient_id: int) -> List[Prescription]:
-        return Prescription.query.filter_by(patient_id=patient_id).all()
+    def get_row(prescription_id: int, fields: Optional[Tuple[str, ...]] = None) -> Row:
+        return BaseCRUD.row(Prescription, prescription_id, fields)
+
+    @staticmethod
+    def get_rows(fields: Optional[Tuple[str, ...]] = None, **filters) -> List[Row]:
+        return BaseCRUD.rows(Prescription, fields, **filters)
+
+    @staticmethod
+    def get_page(limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                 fields: Optional[List[str]] = None) -> Tuple[List[Prescription], Optional[str]]:
+        return BaseCRUD.paginate(Prescription, [Prescription.id], limit, after, fields)
+
+    @staticmethod
+    def iter_all(batch_size: int = 1000, fields: Optional[List[str]] = None) -> Iterator[Prescription]:
+        return BaseCRUD.stream(Prescription, [Prescription.id], batch_size, fields)
+
+    @staticmethod
+    def get_by_patient(patient_id: int, fields: Optional[Tuple[str, ...]] = None) -> List[Row]:
+        return PrescriptionCRUD.get_rows(fields, patient_id=patient_id)
 
     @staticmethod
-    def get_by_doctor(doctor_id: int) -> List[Prescription]:
-        return Prescription.query.filter_by(doctor_id=doctor_id).all()
+    def get_by_doctor(doctor_id: int, fields: Optional[Tuple[str, ...]] = None) -> List[Row]:
+        return PrescriptionCRUD.get_rows(fields, doctor_id=doctor_id)
 
     @staticmethod
     def update(prescription_id: int, **kwargs) -> Prescription:
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+# passlib та concurrent.futures.process імпортуються під час першого хешування,
+# а не під час імпорту app: це найдорожчі імпорти поза Flask і SQLAlchemy
+
+class HashStats:
+    """Скільки разів і скільки секунд запити чекали на PBKDF2"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+
+    def to_dict(self):
+        return {'calls': self.calls, 'seconds': self.seconds}
+
+stats = HashStats()
+
+# None - кількість раундів passlib за замовчуванням
+_rounds = None
+_workers = os.cpu_count() or 1
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+def configure(rounds=None, workers=None):
+    """Задає кількість раундів PBKDF2 та розмір пулу (0 - хешувати в поточному потоці)"""
+    global _rounds, _workers
+    if rounds:
+        _rounds = int(rounds)
+    if workers is not None:
+        _workers = int(workers)
+    shutdown()
+
+def shutdown():
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _executor_pid = None
+
+def _hasher(rounds):
+    from passlib.hash import pbkdf2_sha256
+    return pbkdf2_sha256.using(rounds=rounds) if rounds else pbkdf2_sha256
+
+def _hash(password, rounds):
+    return _hasher(rounds).hash(password)
+
+def _verify(password, password_hash):
+    return _hasher(None).verify(password, password_hash)
+
+def _get_executor():
+    """Пул створюється ліниво в кожному процесі; після fork воркера - заново"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn, а не fork: форк із багатопотокового воркера може зависнути на чужих локах
+            _executor = ProcessPoolExecutor(
+                max_workers=_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+def _run(func, *args):
+    started = time.perf_counter()
+    try:
+        if _workers <= 0:
+            return func(*args)
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            return _get_executor().submit(func, *args).result()
+        except BrokenProcessPool:
+            shutdown()
+            return _get_executor().submit(func, *args).result()
+    finally:
+        stats.record(time.perf_counter() - started)
+
+def hash_password(password):
+    return _run(_hash, password, _rounds)
+
+def verify_password(password, password_hash):
+    return _run(_verify, password, password_hash)
+
+def needs_rehash(password_hash):
+    """True, якщо хеш створено з іншою кількістю раундів, ніж налаштовано зараз"""
+    return _hasher(_rounds).needs_update(password_hash)
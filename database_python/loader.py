@@ -0,0 +1,205 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+import psycopg2
+from sqlalchemy import Date, DateTime, Enum as SAEnum
+from sqlalchemy.engine import make_url
+
+from models.hospital import Department, Doctor, Patient, Appointment, Prescription
+from config import Config
+import versions
+
+MODELS = {
+    model.__tablename__: model
+    for model in (Department, Doctor, Patient, Appointment, Prescription)
+}
+
+DATE_FORMATS = ('%Y-%m-%d', '%d.%m.%Y', '%d/%m/%Y')
+PROGRESS_EVERY = 100000
+
+def parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognized date '{value}'")
+
+def enum_converter(enum_class):
+    """Приймає як ім'я ('FEMALE'), так і значення ('Female') у будь-якому регістрі"""
+    lookup = {}
+    for member in enum_class:
+        lookup[member.name.lower()] = member.name
+        lookup[member.value.lower()] = member.name
+
+    def convert(value):
+        try:
+            return lookup[value.strip().lower()]
+        except KeyError:
+            raise ValueError(f"Unknown {enum_class.__name__} '{value}'")
+    return convert
+
+def column_converter(column):
+    if isinstance(column.type, SAEnum) and column.type.enum_class is not None:
+        return enum_converter(column.type.enum_class)
+    if isinstance(column.type, DateTime):
+        return lambda value: datetime.fromisoformat(value).isoformat(sep=' ')
+    if isinstance(column.type, Date):
+        return parse_date
+    return None
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    yield from reader
+
+def read_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+class CopyStream:
+    """Файлоподібний об'єкт для copy_expert: віддає CSV по мірі читання вхідного файлу"""
+
+    def __init__(self, records, columns, converters):
+        self.records = records
+        self.columns = columns
+        self.converters = converters
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator='\n')
+        self._pending = ''
+
+    def _convert(self, record):
+        row = []
+        for column, convert in zip(self.columns, self.converters):
+            value = record.get(column)
+            if value is None or value == '':
+                row.append(None)
+            elif convert is not None:
+                row.append(convert(str(value)))
+            else:
+                row.append(value)
+        return row
+
+    def _fill(self, size):
+        for record in self.records:
+            try:
+                self._writer.writerow(self._convert(record))
+            except ValueError as e:
+                raise ValueError(f"Row {self.rows + 1}: {e}")
+            self.rows += 1
+            if self.rows % PROGRESS_EVERY == 0:
+                report(self.rows, self.started, final=False)
+            if self._buffer.tell() >= size:
+                break
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return chunk
+
+    def read(self, size=-1):
+        size = size if size and size > 0 else 65536
+        if len(self._pending) < size:
+            self._pending += self._fill(size)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+def report(rows, started, final=True):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else 0.0
+    label = "Loaded" if final else "..."
+    print(f"{label} {rows} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+
+def secondary_indexes(cur, table):
+    """Неунікальні індекси таблиці (первинний ключ та unique залишаємо)"""
+    cur.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE t.relname = %s AND NOT x.indisprimary AND NOT x.indisunique
+    """, (table,))
+    return cur.fetchall()
+
+def reset_sequence(cur, table):
+    cur.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 1))",
+        (table,)
+    )
+
+def dsn_from_config(database_url=None):
+    url = make_url(database_url or Config.SQLALCHEMY_DATABASE_URI).set(drivername='postgresql')
+    return url.render_as_string(hide_password=False)
+
+def load(table, path, fmt, rebuild_indexes=False, database_url=None):
+    model = MODELS[table]
+    table_columns = {column.name: column for column in model.__table__.columns}
+
+    with open(path, newline='', encoding='utf-8') as stream:
+        records = read_csv(stream) if fmt == 'csv' else read_ndjson(stream)
+        first = next(records, None)
+        if first is None:
+            print("Input is empty", file=sys.stderr)
+            return 0
+        unknown = set(first) - set(table_columns)
+        if unknown:
+            raise ValueError(f"Unknown columns for {table}: {', '.join(sorted(unknown))}")
+        columns = [name for name in table_columns if name in first]
+        converters = [column_converter(table_columns[name]) for name in columns]
+
+        def all_records():
+            yield first
+            yield from records
+
+        copy_stream = CopyStream(all_records(), columns, converters)
+        conn = psycopg2.connect(dsn_from_config(database_url))
+        try:
+            with conn, conn.cursor() as cur:
+                dropped = secondary_indexes(cur, table) if rebuild_indexes else []
+                for name, _ in dropped:
+                    cur.execute(f'DROP INDEX "{name}"')
+
+                cur.copy_expert(
+                    f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                    copy_stream
+                )
+                report(copy_stream.rows, copy_stream.started)
+
+                for name, definition in dropped:
+                    started = time.perf_counter()
+                    cur.execute(definition)
+                    print(f"Rebuilt {name} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+                if 'id' in columns:
+                    reset_sequence(cur, table)
+            # ANALYZE поза транзакцією завантаження, щоб планувальник одразу бачив нові дані
+            with conn, conn.cursor() as cur:
+                cur.execute(f"ANALYZE {table}")
+        finally:
+            conn.close()
+    # Дані змінено в обхід застосунку: інвалідуємо ETag воркерів на цьому хості
+    versions.configure(Config.TABLE_VERSIONS_PATH).bump([table])
+    return copy_stream.rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load a CSV/NDJSON export via COPY FROM STDIN")
+    parser.add_argument('table', choices=sorted(MODELS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=['csv', 'ndjson'],
+                        help="default: guessed from the file extension")
+    parser.add_argument('--rebuild-indexes', action='store_true',
+                        help="drop secondary indexes before the load and recreate them after")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    load(args.table, args.path, fmt, rebuild_indexes=args.rebuild_indexes)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: лише в межах одного процесу
+    fcntl = None
+
+import cache
+import hashing
+import pooling
+
+# Межі гістограми затримок у секундах (верхні, включно), як у prometheus_client
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Знімок живого воркера, не оновлений стільки інтервалів запису: воркер простоює, і його
+# миттєві значення (in flight, пул) застаріли; лічильники враховуються й далі
+STALE_FLUSH_INTERVALS = 30
+# Лічильники завершених воркерів, як у multiprocess-режимі prometheus_client
+ACCUMULATED_FILE = 'metrics-accumulated.json'
+LOCK_FILE = 'metrics.lock'
+POOL_GAUGES = ('size', 'checked_out', 'overflow', 'capacity', 'saturation')
+
+class RequestMetrics:
+    """Лічильники поточного процесу; на гарячому шляху - лише інкременти під локом.
+
+    Кожен воркер не частіше ніж раз на flush_interval секунд записує свій знімок
+    у METRICS_DIR/metrics-<pid>.json, а /metrics підсумовує файли всіх воркерів.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.latency = {}
+        self.in_flight = 0
+        self.directory = None
+        self.flush_interval = 1.0
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self):
+        with self._lock:
+            self.in_flight -= 1
+        # Знімок - уже поза запитом, інакше воркер без роботи показував би in flight >= 1
+        self.maybe_flush()
+
+    def observe(self, route, method, status, seconds):
+        key = (route, method, str(status))
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get((route, method))
+            if histogram is None:
+                histogram = self.latency[(route, method)] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            histogram[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            histogram[-1] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            requests = [list(key) + [count] for key, count in self.requests.items()]
+            latency = [list(key) + [list(histogram)] for key, histogram in self.latency.items()]
+            in_flight = self.in_flight
+        pool = pooling.snapshot()
+        return {
+            'pid': os.getpid(),
+            'requests': requests,
+            'latency': latency,
+            'in_flight': in_flight,
+            'cache': {region.name: [region.hits, region.misses] for region in cache.REGIONS},
+            'hashing': hashing.stats.to_dict(),
+            'pool': pool,
+        }
+
+    def maybe_flush(self):
+        now = time.monotonic()
+        if self.directory is None or now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        self.flush()
+
+    def flush(self):
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+local = RequestMetrics()
+
+def configure(directory, flush_interval=1.0):
+    """Знімки завершених воркерів collect() переносить у ACCUMULATED_FILE"""
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    local.directory = directory
+    local.flush_interval = flush_interval
+
+@atexit.register
+def _flush_on_exit():
+    if local.directory is not None:
+        try:
+            local.flush()
+        except OSError:
+            pass
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+def _write(path, snapshot):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(temporary, path)
+
+@contextmanager
+def _directory_locked():
+    fd = os.open(os.path.join(local.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+def _without_gauges(snapshot):
+    """Лише лічильники знімка: миттєві значення нульові"""
+    pool = {name: (0 if name in POOL_GAUGES else value) for name, value in snapshot['pool'].items()}
+    return dict(snapshot, in_flight=0, pool=pool)
+
+def _empty_snapshot():
+    return _without_gauges({
+        'pid': None, 'requests': [], 'latency': [], 'in_flight': 0, 'cache': {},
+        'hashing': dict.fromkeys(hashing.stats.to_dict(), 0),
+        'pool': dict.fromkeys(pooling.snapshot(), 0),
+    })
+
+def _add_counters(total, snapshot):
+    """Додає лічильники snapshot до total; обидва у форматі RequestMetrics.snapshot"""
+    requests = {tuple(key): count for *key, count in total['requests']}
+    for *key, count in snapshot['requests']:
+        requests[tuple(key)] = requests.get(tuple(key), 0) + count
+    total['requests'] = [[*key, count] for key, count in requests.items()]
+    latency = {(route, method): histogram for route, method, histogram in total['latency']}
+    for route, method, histogram in snapshot['latency']:
+        current = latency.setdefault((route, method), [0] * len(histogram))
+        for index, value in enumerate(histogram):
+            current[index] += value
+    total['latency'] = [[route, method, histogram] for (route, method), histogram in latency.items()]
+    for region, (hits, misses) in snapshot['cache'].items():
+        current = total['cache'].setdefault(region, [0, 0])
+        current[0] += hits
+        current[1] += misses
+    for name, value in snapshot['hashing'].items():
+        total['hashing'][name] = total['hashing'].get(name, 0) + value
+    for name, value in snapshot['pool'].items():
+        if name not in POOL_GAUGES:
+            total['pool'][name] = total['pool'].get(name, 0) + value
+
+def _fold(paths):
+    """Переносить лічильники знімків завершених воркерів у ACCUMULATED_FILE і видаляє знімки.
+    Під flock каталогу: два одночасні /metrics не додадуть один знімок двічі"""
+    accumulated_path = os.path.join(local.directory, ACCUMULATED_FILE)
+    with _directory_locked():
+        try:
+            accumulated = _read(accumulated_path)
+        except FileNotFoundError:
+            accumulated = _empty_snapshot()
+        folded = []
+        for path in paths:
+            try:
+                _add_counters(accumulated, _read(path))
+            except FileNotFoundError:
+                # Уже переніс інший воркер
+                continue
+            folded.append(path)
+        if folded:
+            _write(accumulated_path, accumulated)
+            for path in folded:
+                os.remove(path)
+
+def collect():
+    """Знімки живих воркерів і накопичені лічильники завершених.
+
+    Файл завершеного процесу не просто видаляється, а додається до ACCUMULATED_FILE: інакше
+    сума *_total зменшилась би, і Prometheus прочитав би це як скидання лічильника.
+    Файл живого воркера не видаляється ніколи; якщо він давно не оновлювався, з нього
+    беруться лише лічильники.
+    """
+    if local.directory is None:
+        return [local.snapshot()]
+    local.flush()
+    stale_before = time.time() - STALE_FLUSH_INTERVALS * max(local.flush_interval, 1.0)
+    snapshots, dead = [], []
+    for name in os.listdir(local.directory):
+        if not (name.startswith('metrics-') and name.endswith('.json')) or name == ACCUMULATED_FILE:
+            continue
+        path = os.path.join(local.directory, name)
+        try:
+            pid = int(name[len('metrics-'):-len('.json')])
+        except ValueError:
+            continue
+        if pid != os.getpid() and not _alive(pid):
+            dead.append(path)
+            continue
+        try:
+            stale = pid != os.getpid() and os.stat(path).st_mtime < stale_before
+            snapshot = _read(path)
+        except (OSError, ValueError):
+            continue
+        snapshots.append(_without_gauges(snapshot) if stale else snapshot)
+    if dead:
+        _fold(dead)
+    try:
+        snapshots.append(_read(os.path.join(local.directory, ACCUMULATED_FILE)))
+    except (OSError, ValueError):
+        pass
+    return snapshots
+
+def _labels(**labels):
+    escaped = (
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render(snapshots):
+    """Prometheus text exposition format 0.0.4"""
+    requests, latency, caches = {}, {}, {}
+    gauges = {'in_flight': 0, 'size': 0, 'checked_out': 0, 'overflow': 0, 'capacity': 0}
+    pool_counters = {'checkouts': 0, 'wait_seconds': 0.0, 'timeouts': 0}
+    hash_calls, hash_seconds = 0, 0.0
+    for snapshot in snapshots:
+        for route, method, status, count in snapshot['requests']:
+            key = (route, method, status)
+            requests[key] = requests.get(key, 0) + count
+        for route, method, histogram in snapshot['latency']:
+            total = latency.setdefault((route, method), [0] * len(histogram))
+            for index, value in enumerate(histogram):
+                total[index] += value
+        for region, (hits, misses) in snapshot['cache'].items():
+            total = caches.setdefault(region, [0, 0])
+            total[0] += hits
+            total[1] += misses
+        hash_calls += snapshot['hashing']['calls']
+        hash_seconds += snapshot['hashing']['seconds']
+        for name in pool_counters:
+            pool_counters[name] += snapshot['pool'][name]
+        gauges['in_flight'] += snapshot['in_flight']
+        for name in ('size', 'checked_out', 'overflow', 'capacity'):
+            gauges[name] += snapshot['pool'][name]
+
+    lines = [
+        '# HELP hospital_http_requests_total Requests by route, method and status.',
+        '# TYPE hospital_http_requests_total counter',
+    ]
+    for (route, method, status), count in sorted(requests.items()):
+        lines.append(f'hospital_http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP hospital_http_request_duration_seconds Request latency by route and method.',
+        '# TYPE hospital_http_request_duration_seconds histogram',
+    ]
+    for (route, method), histogram in sorted(latency.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram):
+            cumulative += count
+            labels = _labels(route=route, method=method, le=bound)
+            lines.append(f'hospital_http_request_duration_seconds_bucket{labels} {cumulative}')
+        labels = _labels(route=route, method=method)
+        lines.append(f'hospital_http_request_duration_seconds_sum{labels} {_number(histogram[-1])}')
+        lines.append(f'hospital_http_request_duration_seconds_count{labels} {cumulative}')
+
+    lines += [
+        '# HELP hospital_http_requests_in_flight Requests currently being served.',
+        '# TYPE hospital_http_requests_in_flight gauge',
+        f"hospital_http_requests_in_flight {gauges['in_flight']}",
+        '# HELP hospital_db_pool_connections Pool connections by state.',
+        '# TYPE hospital_db_pool_connections gauge',
+        f"hospital_db_pool_connections{_labels(state='size')} {gauges['size']}",
+        f"hospital_db_pool_connections{_labels(state='checked_out')} {gauges['checked_out']}",
+        f"hospital_db_pool_connections{_labels(state='overflow')} {gauges['overflow']}",
+        '# HELP hospital_db_pool_saturation Checked-out share of pool size plus overflow.',
+        '# TYPE hospital_db_pool_saturation gauge',
+        f"hospital_db_pool_saturation "
+        f"{_number(gauges['checked_out'] / gauges['capacity'] if gauges['capacity'] else 0.0)}",
+        '# HELP hospital_db_pool_checkouts_total Connection checkouts.',
+        '# TYPE hospital_db_pool_checkouts_total counter',
+        f"hospital_db_pool_checkouts_total {pool_counters['checkouts']}",
+        '# HELP hospital_db_pool_wait_seconds_total Time spent waiting for a connection.',
+        '# TYPE hospital_db_pool_wait_seconds_total counter',
+        f"hospital_db_pool_wait_seconds_total {_number(pool_counters['wait_seconds'])}",
+        '# HELP hospital_db_pool_timeouts_total Checkouts that hit the pool timeout.',
+        '# TYPE hospital_db_pool_timeouts_total counter',
+        f"hospital_db_pool_timeouts_total {pool_counters['timeouts']}",
+        '# HELP hospital_password_hash_calls_total PBKDF2 hash and verify calls.',
+        '# TYPE hospital_password_hash_calls_total counter',
+        f'hospital_password_hash_calls_total {hash_calls}',
+        '# HELP hospital_password_hash_seconds_total Time requests waited on PBKDF2.',
+        '# TYPE hospital_password_hash_seconds_total counter',
+        f'hospital_password_hash_seconds_total {_number(hash_seconds)}',
+        '# HELP hospital_cache_requests_total Reference cache lookups by result.',
+        '# TYPE hospital_cache_requests_total counter',
+    ]
+    for region, (hits, misses) in sorted(caches.items()):
+        lines.append(f'hospital_cache_requests_total{_labels(region=region, result="hit")} {hits}')
+        lines.append(f'hospital_cache_requests_total{_labels(region=region, result="miss")} {misses}')
+    lines += [
+        '# HELP hospital_cache_hit_ratio Reference cache hit ratio.',
+        '# TYPE hospital_cache_hit_ratio gauge',
+    ]
+    for region, (hits, misses) in sorted(caches.items()):
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        lines.append(f'hospital_cache_hit_ratio{_labels(region=region)} {_number(ratio)}')
+    return '\n'.join(lines) + '\n'
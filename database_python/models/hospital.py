@@ -1,9 +1,18 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, Text, event, literal_column
 from enum import Enum
 
 db = SQLAlchemy()
 
+# Рядок пошуку пацієнта: ім'я, прізвище, email і лише цифри телефону в нижньому регістрі.
+# Той самий вираз стоїть в індексі та в запиті PatientCRUD.search, інакше планувальник індекс не візьме
+PATIENT_SEARCH_TEXT = literal_column(
+    "lower(first_name || ' ' || last_name || ' ' || coalesce(email, '') || ' ' || "
+    "regexp_replace(coalesce(phone_number, ''), '[^0-9]', '', 'g'))",
+    Text
+)
+
 class Gender(str, Enum):
     MALE = 'Male'
     FEMALE = 'Female'
@@ -48,8 +57,28 @@ class Doctor(db.Model):
             'department_id': self.department_id
         }
 
+    def to_workload_dict(self):
+        """Лікар з прийомами та рецептами; зв'язки мають бути завантажені заздалегідь"""
+        data = self.to_dict()
+        data['department'] = self.department.to_dict() if self.department else None
+        data['appointments'] = [
+            dict(apt.to_dict(), patient=apt.patient.to_dict()) for apt in self.appointments
+        ]
+        data['prescriptions'] = [
+            dict(pres.to_dict(), patient=pres.patient.to_dict()) for pres in self.prescriptions
+        ]
+        return data
+
 class Patient(db.Model):
     __tablename__ = 'patients'
+    # GET /patients/search на PostgreSQL: KNN-пошук по триграмному GiST-індексу (pg_trgm) над PATIENT_SEARCH_TEXT;
+    # на інших СУБД індекс не створюється - там працює search_index.py
+    __table_args__ = (
+        db.Index(
+            'ix_patients_search_trgm', PATIENT_SEARCH_TEXT.label('search_text'),
+            postgresql_using='gist', postgresql_ops={'search_text': 'gist_trgm_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
@@ -74,12 +103,34 @@ class Patient(db.Model):
             'email': self.email
         }
 
+    def to_chart_dict(self):
+        """Медична карта; зв'язки мають бути завантажені заздалегідь"""
+        data = self.to_dict()
+        data['appointments'] = [
+            dict(apt.to_dict(), doctor=apt.doctor.to_dict()) for apt in self.appointments
+        ]
+        data['prescriptions'] = [
+            dict(pres.to_dict(), doctor=pres.doctor.to_dict()) for pres in self.prescriptions
+        ]
+        return data
+
+event.listen(
+    Patient.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    # Індекс для keyset-пагінації за (appointment_datetime, id);
+    # (doctor_id, appointment_datetime) - розклад лікаря одним range scan, він же замінює індекс за doctor_id
+    __table_args__ = (
+        db.Index('ix_appointments_datetime_id', 'appointment_datetime', 'id'),
+        db.Index('ix_appointments_doctor_datetime', 'doctor_id', 'appointment_datetime'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), index=True)
-    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), index=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'))
     appointment_datetime = db.Column(db.DateTime, nullable=False, index=True)
     reason_for_visit = db.Column(db.String(255))
     
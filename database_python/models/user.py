@@ -1,8 +1,6 @@
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
-from passlib.hash import pbkdf2_sha256
-
-db = SQLAlchemy()
+from models.hospital import db
+import hashing
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -13,10 +11,13 @@ class User(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     
     def set_password(self, password):
-        self.password_hash = pbkdf2_sha256.hash(password)
+        self.password_hash = hashing.hash_password(password)
     
     def check_password(self, password):
-        return pbkdf2_sha256.verify(password, self.password_hash)
+        return hashing.verify_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        return hashing.needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -26,4 +27,13 @@ class User(db.Model):
             'id': self.id,
             'username': self.username,
             'is_active': self.is_active
-        } 
\ No newline at end of file
+        }
+
+class TokenBlocklist(db.Model):
+    __tablename__ = 'token_blocklist'
+
+    jti = db.Column(db.String(36), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<TokenBlocklist {self.jti}>'
\ No newline at end of file
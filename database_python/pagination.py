@@ -0,0 +1,71 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(values):
+    """Кодує значення ключа останнього рядка сторінки в непрозорий токен"""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def decode_cursor(token, columns):
+    """Розбирає токен назад у значення ключа відповідно до типів колонок"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value)
+            if column.type.python_type is datetime else column.type.python_type(value)
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+def keyset_filter(statement, keys, after):
+    """Умова WHERE ключ > курсор для Query або Select"""
+    if not after:
+        return statement
+    values = decode_cursor(after, keys)
+    if len(keys) == 1:
+        return statement.filter(keys[0] > values[0])
+    return statement.filter(tuple_(*keys) > tuple_(*values))
+
+def split_page(items, keys, limit):
+    """Відкидає (limit + 1)-й рядок і повертає курсор наступної сторінки, якщо вона є"""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor([getattr(items[-1], key.key) for key in keys])
+
+def parse_datetime(raw, name):
+    """Момент з query-параметра name. Час прийомів зберігається без часового поясу,
+    тому значення зі зсувом UTC відхиляється, а не порівнюється з наївним"""
+    try:
+        value = datetime.fromisoformat(raw)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an ISO 8601 date and time")
+    if value.tzinfo is not None:
+        raise ValueError(f"'{name}' must be a local time without a UTC offset")
+    return value
+
+def parse_limit(raw):
+    """Перевіряє параметр limit і обмежує його MAX_PAGE_SIZE"""
+    if raw is None or raw == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
@@ -0,0 +1,86 @@
+import threading
+import time
+import weakref
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+class PoolStats:
+    """Скільки разів і скільки секунд запити чекали на з'єднання з пулу"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def to_dict(self):
+        return {
+            'checkouts': self.checkouts,
+            'wait_seconds': self.wait_seconds,
+            'max_wait_seconds': self.max_wait_seconds,
+            'timeouts': self.timeouts,
+        }
+
+stats = PoolStats()
+_pools = weakref.WeakSet()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, що міряє час очікування на з'єднання (включно з відкриттям нового)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.add(self)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        stats.record(time.perf_counter() - started)
+        return connection
+
+def snapshot():
+    """Стан пулів процесу: розмір, видані з'єднання та насиченість (0..1)"""
+    size = checked_out = overflow = capacity = 0
+    for pool in list(_pools):
+        size += pool.size()
+        checked_out += pool.checkedout()
+        overflow += max(pool.overflow(), 0)
+        capacity += pool.size() + max(pool._max_overflow, 0)
+    return dict(
+        stats.to_dict(),
+        size=size,
+        checked_out=checked_out,
+        overflow=overflow,
+        capacity=capacity,
+        saturation=checked_out / capacity if capacity else 0.0,
+    )
+
+def engine_options(config, poolclass=InstrumentedQueuePool):
+    """SQLALCHEMY_ENGINE_OPTIONS з налаштувань DB_POOL_*; для SQLite - пул за замовчуванням"""
+    url = config.get('SQLALCHEMY_DATABASE_URI')
+    if not url or make_url(url).get_backend_name() == 'sqlite':
+        return {}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    if poolclass is not None:
+        options['poolclass'] = poolclass
+    return options
@@ -0,0 +1,268 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from itertools import chain
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models.hospital import db, Appointment
+from pagination import parse_datetime, parse_limit
+import versions
+
+MAX_SLOT_SEARCH_DAYS = 31
+
+def parse_slot_query(params, appointment_minutes):
+    """(specialty, from, to, duration, limit) з query-параметрів GET /slots; ValueError з текстом для 400"""
+    specialty = params.get('specialty')
+    if not specialty:
+        raise ValueError("'specialty' is required")
+    start = parse_datetime(params['from'], 'from') if 'from' in params else datetime.now()
+    end = parse_datetime(params['to'], 'to') if 'to' in params else start + timedelta(days=7)
+    try:
+        duration = int(params.get('duration', appointment_minutes))
+    except ValueError:
+        raise ValueError("'duration' must be an integer number of minutes")
+    limit = parse_limit(params.get('limit', '10'))
+    if duration <= 0:
+        raise ValueError("'duration' must be a positive number of minutes")
+    if not start < end <= start + timedelta(days=MAX_SLOT_SEARCH_DAYS):
+        raise ValueError(f"'to' must be later than 'from' and at most {MAX_SLOT_SEARCH_DAYS} days after it")
+    return specialty, start, end, timedelta(minutes=duration), limit
+
+class DoctorSchedule:
+    """Зайняті слоти одного лікаря: відсортований список (з повторами для накладених
+    прийомів) та злиті з нього суцільні відрізки [starts[i], ends[i])"""
+
+    __slots__ = ('busy', 'starts', 'ends')
+
+    def __init__(self):
+        self.busy = []
+        self.starts = []
+        self.ends = []
+
+    def add(self, slots):
+        for slot in slots:
+            insort(self.busy, slot)
+        self.merge()
+
+    def remove(self, slots):
+        for slot in slots:
+            position = bisect_left(self.busy, slot)
+            if position < len(self.busy) and self.busy[position] == slot:
+                del self.busy[position]
+        self.merge()
+
+    def merge(self):
+        starts, ends = [], []
+        for slot in self.busy:
+            if ends and slot <= ends[-1]:
+                ends[-1] = slot + 1
+            else:
+                starts.append(slot)
+                ends.append(slot + 1)
+        self.starts, self.ends = starts, ends
+
+    def first_free(self, start, end, length, day_slots):
+        """Перший слот t >= start, для якого [t, t + length) вільний, у межах доби та до end"""
+        starts, ends = self.starts, self.ends
+        t = start
+        while True:
+            day_end = (t // day_slots + 1) * day_slots
+            if t + length > day_end:
+                t = day_end
+                continue
+            if t + length > end:
+                return None
+            # Перший зайнятий відрізок, що закінчується після t: якщо почався до t + length - стрибаємо за нього
+            position = bisect_right(ends, t)
+            if position < len(starts) and starts[position] < t + length:
+                t = ends[position]
+                continue
+            return t
+
+class ScheduleIndex:
+    """Розклад лікарів у цілих слотах робочого часу у вікні [сьогодні, сьогодні + horizon_days).
+
+    Слот - appointment_minutes робочого часу; слоти доби d мають номери
+    d * day_slots ... (d + 1) * day_slots - 1 від початку вікна. Прийом займає
+    appointment_minutes від свого початку. Індекс оновлюється інкрементально після
+    commit у цьому процесі; якщо версія таблиці appointments (versions.py) зросла
+    через інший процес або bulk-запит, індекс перебудовується одним range-запитом
+    під час наступного пошуку.
+    """
+
+    def __init__(self, appointment_minutes=30, open_hour=8, close_hour=18, horizon_days=14):
+        self.step = appointment_minutes
+        self.open_minute = open_hour * 60
+        self.day_slots = (close_hour - open_hour) * 60 // appointment_minutes
+        self.horizon = timedelta(days=horizon_days)
+        self.origin = None
+        self.version = None
+        self.doctors = {}
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.origin = None
+
+    def _current_version(self):
+        table_versions = versions.get_versions()
+        return table_versions.get('appointments') if table_versions is not None else None
+
+    def _position(self, origin, moment):
+        """(доба від origin, зсув від відкриття в цю добу)"""
+        offset = moment - origin
+        return offset.days, offset - timedelta(days=offset.days, minutes=self.open_minute)
+
+    def occupied(self, origin, moment):
+        """Слоти, які перетинає прийом, що починається в moment"""
+        step = timedelta(minutes=self.step)
+        day, offset = self._position(origin, moment)
+        first = max(0, offset // step)
+        last = min(self.day_slots, -(-(offset + step) // step))
+        return tuple(range(day * self.day_slots + first, day * self.day_slots + last))
+
+    def slot_at_or_after(self, origin, moment):
+        day, offset = self._position(origin, moment)
+        return day * self.day_slots + min(self.day_slots, max(0, -(-offset // timedelta(minutes=self.step))))
+
+    def slot_at_or_before(self, origin, moment):
+        day, offset = self._position(origin, moment)
+        return day * self.day_slots + min(self.day_slots, max(0, offset // timedelta(minutes=self.step)))
+
+    def moment(self, origin, slot):
+        day, slot = divmod(slot, self.day_slots)
+        return origin + timedelta(days=day, minutes=self.open_minute + slot * self.step)
+
+    def _load(self, session, origin, end):
+        """Розклад усіх лікарів у [origin, end) одним range scan"""
+        statement = select(Appointment.id, Appointment.doctor_id, Appointment.appointment_datetime).where(
+            Appointment.appointment_datetime >= origin,
+            Appointment.appointment_datetime < end
+        )
+        busy, rows = {}, {}
+        for appointment_id, doctor_id, appointment_datetime in session.execute(statement):
+            slots = self.occupied(origin, appointment_datetime)
+            busy.setdefault(doctor_id, []).extend(slots)
+            rows[appointment_id] = (doctor_id, slots)
+        doctors = {}
+        for doctor_id, slots in busy.items():
+            schedule = doctors[doctor_id] = DoctorSchedule()
+            schedule.busy = sorted(slots)
+            schedule.merge()
+        return doctors, rows
+
+    def _fresh(self, session, now):
+        """Вікно, що починається сьогодні, побудоване з поточної версії таблиці"""
+        origin = datetime.combine(now.date(), datetime.min.time())
+        version = self._current_version()
+        with self._lock:
+            if self.origin == origin and self.version == version:
+                return
+        # Версію прочитано до запиту: commit під час завантаження спричинить ще одну перебудову
+        doctors, rows = self._load(session, origin, origin + self.horizon)
+        with self._lock:
+            self.doctors, self.rows = doctors, rows
+            self.origin, self.version = origin, version
+
+    def apply(self, changes):
+        """Зміни одного commit: (id, doctor_id, початок), doctor_id=None - видалення"""
+        version = self._current_version()
+        with self._lock:
+            if self.origin is None:
+                return
+            # Наш commit збільшив версію рівно на 1; більше - були чужі зміни
+            if version is not None and (self.version is None or version != self.version + 1):
+                self.origin = None
+                return
+            end = self.origin + self.horizon
+            for appointment_id, doctor_id, appointment_datetime in changes:
+                previous = self.rows.pop(appointment_id, None)
+                if previous is not None:
+                    self.doctors[previous[0]].remove(previous[1])
+                if doctor_id is None or not self.origin <= appointment_datetime < end:
+                    continue
+                slots = self.occupied(self.origin, appointment_datetime)
+                self.doctors.setdefault(doctor_id, DoctorSchedule()).add(slots)
+                self.rows[appointment_id] = (doctor_id, slots)
+            self.version = version
+
+    def _first_slots(self, origin, doctors, doctor_ids, start, end, length):
+        first = self.slot_at_or_after(origin, start)
+        last = self.slot_at_or_before(origin, end)
+        empty = DoctorSchedule()
+        slots = []
+        for doctor_id in doctor_ids:
+            slot = doctors.get(doctor_id, empty).first_free(first, last, length, self.day_slots)
+            if slot is not None:
+                slots.append((slot, doctor_id))
+        return slots
+
+    def free_slots(self, doctor_ids, start, end, duration=None, limit=10, session=None):
+        """Найраніший вільний слот кожного з лікарів у [max(start, зараз), end); до limit найраніших.
+        session - синхронна сесія для читання розкладу, за замовчуванням db.session"""
+        session = session if session is not None else db.session
+        duration = duration or timedelta(minutes=self.step)
+        length = -(-duration // timedelta(minutes=self.step))
+        now = datetime.now()
+        # Слоти, що вже минули, не пропонуємо
+        start = max(start, now)
+        if length > self.day_slots or start >= end:
+            return []
+        self._fresh(session, now)
+        with self._lock:
+            origin = self.origin
+            covered = origin is not None and origin <= start and end <= origin + self.horizon
+            if covered:
+                slots = self._first_slots(origin, self.doctors, doctor_ids, start, end, length)
+        if not covered:
+            # Поза вікном індексу: разовий розклад лише для цього інтервалу
+            origin = datetime.combine(start.date(), datetime.min.time())
+            doctors, _ = self._load(session, origin, end)
+            slots = self._first_slots(origin, doctors, doctor_ids, start, end, length)
+        slots.sort()
+        result = []
+        for slot, doctor_id in slots[:limit]:
+            slot_start = self.moment(origin, slot)
+            result.append((doctor_id, slot_start, slot_start + duration))
+        return result
+
+index = ScheduleIndex()
+
+def configure(appointment_minutes, open_hour, close_hour, horizon_days):
+    global index
+    index = ScheduleIndex(appointment_minutes, open_hour, close_hour, horizon_days)
+    return index
+
+@event.listens_for(Session, 'after_flush')
+def _collect_appointment_changes(session, flush_context):
+    pending = session.info.setdefault('schedule_changes', [])
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, Appointment):
+            pending.append((obj.id, obj.doctor_id, obj.appointment_datetime))
+    for obj in session.deleted:
+        if isinstance(obj, Appointment):
+            pending.append((obj.id, None, None))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _detect_bulk_changes(orm_execute_state):
+    # insert()/update()/delete() поза unit of work: рядків не видно, лише перебудова
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) == Appointment.__tablename__:
+            orm_execute_state.session.info['schedule_stale'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _apply_appointment_changes(session):
+    pending = session.info.pop('schedule_changes', None)
+    if session.info.pop('schedule_stale', False):
+        index.invalidate()
+    elif pending:
+        index.apply(pending)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_appointment_changes(session):
+    session.info.pop('schedule_changes', None)
+    session.info.pop('schedule_stale', None)
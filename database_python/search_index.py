@@ -0,0 +1,285 @@
+import re
+import threading
+from array import array
+from heapq import merge
+from itertools import chain
+from math import ceil
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from models.hospital import db, Patient
+import versions
+
+# Частка триграм запиту, які мають бути в записі (як pg_trgm.word_similarity_threshold).
+# Якщо збігів менше за limit, поріг знижується до FALLBACK_THRESHOLD: переставлені сусідні
+# літери в короткому прізвищі ламають половину його триграм
+SIMILARITY_THRESHOLD = 0.6
+FALLBACK_THRESHOLD = 0.3
+DEFAULT_LIMIT = 20
+MIN_QUERY_LENGTH = 2
+MIN_PHONE_DIGITS = 3
+WORD = re.compile(r'[^\W_]+')
+NOT_DIGIT = re.compile(r'\D')
+PHONE_QUERY = re.compile(r'[\d\s()+-]+')
+LOAD_BATCH_ROWS = 10000
+# Список id стає бітовою картою, якщо триграма є хоча б в 1/BITMAP_SHARE записів. Карта не більша
+# за array (4 байти на id) від 1/32; поріг нижчий, бо перетворювати array на карту при кожному пошуку дорожче
+BITMAP_SHARE = 100
+BITMAP_MIN_IDS = 4096
+
+def parse_query(query):
+    """(нормалізований запит, чи це номер телефону); ValueError для надто короткого запиту.
+
+    Телефон шукається за цифрами як підрядок: '+38 (099) 123' знаходить '+380991234567'.
+    """
+    query = ' '.join(query.split()).lower()
+    if PHONE_QUERY.fullmatch(query) and any(char.isdigit() for char in query):
+        digits = NOT_DIGIT.sub('', query)
+        if len(digits) < MIN_PHONE_DIGITS:
+            raise ValueError(f"A phone number query needs at least {MIN_PHONE_DIGITS} digits")
+        return digits, True
+    if len(query) < MIN_QUERY_LENGTH:
+        raise ValueError(f"'q' must have at least {MIN_QUERY_LENGTH} characters")
+    return query, False
+
+def search_text(first_name, last_name, email, phone_number):
+    """Те саме, що models.hospital.PATIENT_SEARCH_TEXT, але в Python"""
+    return f"{first_name} {last_name} {email or ''} {NOT_DIGIT.sub('', phone_number or '')}".lower()
+
+def trigrams(text):
+    """Триграми слів як у pg_trgm: слово доповнюється двома пробілами спереду та одним ззаду"""
+    result = set()
+    for word in WORD.findall(text):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+def inner_trigrams(text):
+    """Триграми всередині рядка, без доповнення: для пошуку підрядка"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class PatientSearchIndex:
+    """Триграмний індекс пацієнтів у пам'яті процесу для СУБД без pg_trgm.
+
+    На кожну триграму - id пацієнтів: рідкісні в array (4 байти на id), часті в бітовій
+    карті bytearray. Пошук рахує збіги триграм для всіх пацієнтів одразу побітовими
+    операціями над великими int, тож час залежить від кількості триграм запиту, а не
+    від того, скільки пацієнтів звуться Коваленко. Списки лише доповнюються: після зміни
+    чи видалення пацієнта застарілі id відсіює перевірка по texts.
+
+    Як і scheduling.ScheduleIndex, індекс оновлюється після commit у цьому процесі,
+    рядки з bulk insert дочитуються за id, а решта чужих змін (версія таблиці patients
+    у versions.py зросла не на 1) - повна перебудова під час наступного пошуку.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, fallback_threshold=FALLBACK_THRESHOLD):
+        self.threshold = threshold
+        self.fallback_threshold = fallback_threshold
+        self.texts = {}
+        self.postings = {}
+        self.bitmaps = {}
+        self.loaded = False
+        self.version = None
+        self.max_id = 0
+        self.tail_after = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.loaded = False
+
+    def _current_version(self):
+        table_versions = versions.get_versions()
+        return table_versions.get('patients') if table_versions is not None else None
+
+    def _add(self, patient_id, text):
+        previous = self.texts.get(patient_id)
+        self.texts[patient_id] = text
+        self.max_id = max(self.max_id, patient_id)
+        known = trigrams(previous) if previous is not None else ()
+        postings = self.postings
+        for trigram in trigrams(text):
+            if trigram in known:
+                continue
+            posting = postings.get(trigram)
+            if posting is None:
+                postings[trigram] = array('I', (patient_id,))
+            elif type(posting) is bytearray:
+                byte = patient_id >> 3
+                if byte >= len(posting):
+                    posting.extend(bytes(max(byte + 1 - len(posting), len(posting) // 4)))
+                posting[byte] |= 1 << (patient_id & 7)
+                self.bitmaps.pop(trigram, None)
+            else:
+                posting.append(patient_id)
+                if len(posting) >= BITMAP_MIN_IDS and len(posting) * BITMAP_SHARE > self.max_id:
+                    postings[trigram] = self._bits(posting)
+
+    def _bits(self, ids):
+        bits = bytearray((self.max_id >> 3) + 1)
+        for patient_id in ids:
+            bits[patient_id >> 3] |= 1 << (patient_id & 7)
+        return bits
+
+    def _bitmap(self, trigram):
+        """id з триграмою як int; int частих триграм кешується до наступної їх зміни"""
+        bitmap = self.bitmaps.get(trigram)
+        if bitmap is not None:
+            return bitmap
+        posting = self.postings.get(trigram)
+        if posting is None:
+            return 0
+        if type(posting) is not bytearray:
+            return int.from_bytes(self._bits(posting), 'little')
+        bitmap = self.bitmaps[trigram] = int.from_bytes(posting, 'little')
+        return bitmap
+
+    def _load(self, session, after_id=None):
+        statement = select(Patient.id, Patient.first_name, Patient.last_name, Patient.email, Patient.phone_number)
+        if after_id is not None:
+            statement = statement.where(Patient.id > after_id)
+        statement = statement.execution_options(stream_results=True, yield_per=LOAD_BATCH_ROWS)
+        for patient_id, first_name, last_name, email, phone_number in session.execute(statement):
+            self._add(patient_id, search_text(first_name, last_name, email, phone_number))
+
+    def _fresh(self, session):
+        version = self._current_version()
+        with self._lock:
+            if self.loaded and self.version == version and self.tail_after is None:
+                return
+            if self.loaded and self.version == version:
+                # Bulk insert у цьому процесі: дочитуємо лише нові рядки
+                self._load(session, self.tail_after)
+                self.tail_after = None
+                return
+            self.texts, self.postings, self.bitmaps, self.max_id, self.tail_after = {}, {}, {}, 0, None
+            self._load(session)
+            self.loaded, self.version = True, version
+
+    def apply(self, changes, inserted=False):
+        """Зміни одного commit: (id, текст пошуку), текст None - видалення;
+        inserted - ще й рядки bulk insert, яких після commit не видно"""
+        version = self._current_version()
+        with self._lock:
+            if not self.loaded:
+                return
+            # Наш commit збільшив версію рівно на 1; більше - були чужі зміни
+            if version is not None and (self.version is None or version != self.version + 1):
+                self.loaded = False
+                return
+            if inserted and self.tail_after is None:
+                self.tail_after = self.max_id
+            for patient_id, text in changes:
+                if text is None:
+                    self.texts.pop(patient_id, None)
+                else:
+                    self._add(patient_id, text)
+            self.version = version
+
+    def _verified(self, patient_id, query, query_trigrams, phone):
+        text = self.texts.get(patient_id)
+        if text is None or (phone and query not in text):
+            return 0
+        return len(query_trigrams & trigrams(text))
+
+    def search(self, query, phone=False, limit=20, session=None):
+        """id пацієнтів від найсхожіших (частка триграм запиту в записі), при рівності - за id.
+        Нижчі за threshold рівні, до fallback_threshold, переглядаються, лише поки не набрано limit.
+        session - синхронна сесія для (пере)побудови індексу, за замовчуванням db.session"""
+        if phone:
+            # Підрядок: потрібні всі його внутрішні триграми
+            required = inner_trigrams(query)
+            needed = len(required)
+        else:
+            required = trigrams(query)
+            needed = ceil(min(self.threshold, self.fallback_threshold) * len(required))
+        self._fresh(session if session is not None else db.session)
+        with self._lock:
+            # Лічильник збігів кожного id - двійкове число, розрядами якого є бітові карти planes
+            planes = []
+            for trigram in required:
+                carry = self._bitmap(trigram)
+                for position, plane in enumerate(planes):
+                    if not carry:
+                        break
+                    planes[position], carry = plane ^ carry, plane & carry
+                if carry:
+                    planes.append(carry)
+            mask = (1 << (self.max_id + 1)) - 1
+
+            # Рівні від найбільшої кількості збігів; зазвичай limit набирається вже на першому.
+            # Застарілі id завищують лічильник: перевірений рахунок може опустити id на нижчий рівень
+            result, demoted = [], {}
+            above = 0
+            for count in range(len(required), needed - 1, -1):
+                current = at_least_bits(planes, count, mask)
+                level, above = current & ~above, current
+                for patient_id in merge(set_bits(level), sorted(demoted.pop(count, ()))):
+                    score = self._verified(patient_id, query, required, phone)
+                    if score == count:
+                        result.append(patient_id)
+                        if len(result) >= limit:
+                            return result
+                    elif score >= needed:
+                        demoted.setdefault(score, []).append(patient_id)
+            return result
+
+def at_least_bits(planes, count, mask):
+    """Біти id, чий лічильник (розряди planes, молодший перший) не менший за count"""
+    if count >> len(planes):
+        return 0
+    greater, equal = 0, mask
+    for position in range(len(planes) - 1, -1, -1):
+        plane = planes[position]
+        if count >> position & 1:
+            equal &= plane
+        else:
+            greater |= equal & plane
+            equal &= mask ^ plane
+    return greater | equal
+
+def set_bits(bits):
+    """Номери одиничних бітів за зростанням"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+index = PatientSearchIndex()
+
+@event.listens_for(Session, 'after_flush')
+def _collect_patient_changes(session, flush_context):
+    pending = session.info.setdefault('search_changes', [])
+    for obj in chain(session.new, session.dirty):
+        if isinstance(obj, Patient):
+            pending.append((obj.id, search_text(obj.first_name, obj.last_name, obj.email, obj.phone_number)))
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            pending.append((obj.id, None))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _detect_bulk_changes(orm_execute_state):
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if getattr(table, 'name', None) != Patient.__tablename__:
+        return
+    # insert() додає рядки з новими id - їх можна дочитати; update()/delete() - лише перебудова
+    if orm_execute_state.is_insert:
+        orm_execute_state.session.info['search_inserted'] = True
+    elif orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['search_stale'] = True
+
+@event.listens_for(Session, 'after_commit')
+def _apply_patient_changes(session):
+    pending = session.info.pop('search_changes', None)
+    inserted = session.info.pop('search_inserted', False)
+    if session.info.pop('search_stale', False):
+        index.invalidate()
+    elif pending or inserted:
+        index.apply(pending or [], inserted)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_patient_changes(session):
+    session.info.pop('search_changes', None)
+    session.info.pop('search_inserted', None)
+    session.info.pop('search_stale', None)
@@ -0,0 +1,274 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+from models.hospital import Department, Doctor, Patient, Appointment, Prescription
+from config import config_dict, check_config
+import versions
+
+# Версія генератора входить у ключ знімка: зміна формату не підхопить старі файли
+GENERATOR_VERSION = 1
+CHUNK_ROWS = 100000
+TABLES = ('departments', 'doctors', 'patients', 'appointments', 'prescriptions')
+COLUMNS = {
+    model.__tablename__: [column.name for column in model.__table__.columns]
+    for model in (Department, Doctor, Patient, Appointment, Prescription)
+}
+
+# Співвідношення для розміру size (кількість пацієнтів)
+PATIENTS_PER_DEPARTMENT = 10000
+PATIENTS_PER_DOCTOR = 200
+APPOINTMENTS_PER_PATIENT = 3
+PRESCRIPTION_SHARE = 0.5  # частка прийомів, після яких виписано рецепт
+
+FIRST_NAMES = [
+    'Олександр', 'Андрій', 'Іван', 'Дмитро', 'Максим', 'Сергій', 'Микола', 'Олег', 'Тарас', 'Богдан',
+    'Марія', 'Олена', 'Анна', 'Наталія', 'Ірина', 'Юлія', 'Тетяна', 'Оксана', 'Софія', 'Катерина',
+]
+LAST_NAMES = [
+    'Шевченко', 'Коваленко', 'Бондаренко', 'Ткаченко', 'Кравченко', 'Олійник', 'Шевчук', 'Поліщук',
+    'Бойко', 'Мельник', 'Петренко', 'Лисенко', 'Марченко', 'Савченко', 'Руденко', 'Мороз',
+]
+STREETS = ['вул. Шевченка', 'вул. Франка', 'просп. Перемоги', 'вул. Лесі Українки', 'вул. Хрещатик']
+CITIES = ['Київ', 'Львів', 'Харків', 'Одеса', 'Дніпро']
+DEPARTMENT_NAMES = [
+    'Cardiology', 'Neurology', 'Pediatrics', 'Surgery',
+    'Orthopedics', 'Oncology', 'Emergency', 'Psychiatry'
+]
+SPECIALTIES = [
+    'Cardiologist', 'Neurologist', 'Pediatrician', 'Surgeon',
+    'Orthopedist', 'Oncologist', 'Emergency Physician', 'Psychiatrist'
+]
+REASONS = ['Регулярний огляд', 'Консультація', 'Повторний прийом', 'Скарги на біль', 'Аналізи']
+MEDICATIONS = [
+    ('Аспірин', '100мг', '1 раз на день'),
+    ('Парацетамол', '500мг', '3 рази на день'),
+    ('Ібупрофен', '200мг', '2 рази на день'),
+    ('Амоксицилін', '250мг', '2 рази на день'),
+    ('Омепразол', '20мг', '1 раз на день'),
+    ('Лоратадин', '10мг', '1 раз на день')
+]
+GENDERS = ['MALE', 'FEMALE', 'OTHER']
+GENDER_WEIGHTS = [48, 50, 2]
+# Прийоми по 30 хвилин з 08:00 до 17:30
+SLOTS = [timedelta(hours=8, minutes=30 * i) for i in range(20)]
+
+def counts_for(size):
+    appointments = size * APPOINTMENTS_PER_PATIENT
+    return {
+        'departments': max(len(DEPARTMENT_NAMES), size // PATIENTS_PER_DEPARTMENT),
+        'doctors': max(10, size // PATIENTS_PER_DOCTOR),
+        'patients': size,
+        'appointments': appointments,
+    }
+
+def chunks(total):
+    for start in range(0, total, CHUNK_ROWS):
+        yield start, min(CHUNK_ROWS, total - start)
+
+def phones(rng, n):
+    return [f'+38099{number:07d}' for number in rng.choices(range(10 ** 7), k=n)]
+
+# Кожна колонка будується одним викликом choices на весь шматок, без Faker на кожен рядок
+def departments(rng, count):
+    names = rng.choices(DEPARTMENT_NAMES, k=count)
+    floors = rng.choices(range(1, 6), k=count)
+    yield list(zip(range(1, count + 1), (f'Department of {name}' for name in names), floors))
+
+def doctors(rng, count, department_count):
+    ids = range(1, count + 1)
+    yield list(zip(
+        ids,
+        rng.choices(FIRST_NAMES, k=count),
+        rng.choices(LAST_NAMES, k=count),
+        rng.choices(SPECIALTIES, k=count),
+        phones(rng, count),
+        (f'doctor{i}@hospital.com' for i in ids),
+        rng.choices(range(1, department_count + 1), k=count),
+    ))
+
+def patients(rng, count):
+    first_birthday = date(1935, 1, 1).toordinal()
+    last_birthday = date(2020, 12, 31).toordinal()
+    for start, n in chunks(count):
+        ids = range(start + 1, start + n + 1)
+        yield list(zip(
+            ids,
+            rng.choices(FIRST_NAMES, k=n),
+            rng.choices(LAST_NAMES, k=n),
+            map(date.isoformat, map(date.fromordinal, rng.choices(range(first_birthday, last_birthday), k=n))),
+            rng.choices(GENDERS, GENDER_WEIGHTS, k=n),
+            phones(rng, n),
+            (f'{street}, {number}, {city}' for street, number, city in zip(
+                rng.choices(STREETS, k=n), rng.choices(range(1, 200), k=n), rng.choices(CITIES, k=n)
+            )),
+            (f'patient{i}@example.com' for i in ids),
+        ))
+
+def appointments_and_prescriptions(rng, count, patient_count, doctor_count):
+    """Прийоми за останні два роки; рецепти - для частини прийомів, з тими ж пацієнтом і лікарем"""
+    first_day = (date.today() - timedelta(days=730)).toordinal()
+    last_day = (date.today() + timedelta(days=90)).toordinal()
+    prescription_id = 0
+    for start, n in chunks(count):
+        patient_ids = rng.choices(range(1, patient_count + 1), k=n)
+        doctor_ids = rng.choices(range(1, doctor_count + 1), k=n)
+        days = rng.choices(range(first_day, last_day), k=n)
+        moments = [
+            datetime.fromordinal(day) + slot for day, slot in zip(days, rng.choices(SLOTS, k=n))
+        ]
+        appointment_rows = list(zip(
+            range(start + 1, start + n + 1),
+            patient_ids,
+            doctor_ids,
+            (moment.isoformat(sep=' ') for moment in moments),
+            rng.choices(REASONS, k=n),
+        ))
+        rolls = rng.choices((True, False), (PRESCRIPTION_SHARE, 1 - PRESCRIPTION_SHARE), k=n)
+        selected = [index for index, roll in enumerate(rolls) if roll]
+        medications = rng.choices(MEDICATIONS, k=len(selected))
+        durations = rng.choices((7, 14, 30, 90), k=len(selected))
+        prescription_rows = []
+        for index, (name, dosage, frequency), duration in zip(selected, medications, durations):
+            prescription_id += 1
+            started = date.fromordinal(days[index])
+            prescription_rows.append((
+                prescription_id, patient_ids[index], doctor_ids[index], name, dosage, frequency,
+                started.isoformat(), (started + timedelta(days=duration)).isoformat()
+            ))
+        yield appointment_rows, prescription_rows
+
+def snapshot_dir(size, random_seed, cache_dir):
+    return os.path.join(cache_dir, f'{size}-s{random_seed}-v{GENERATOR_VERSION}')
+
+def generate(size, random_seed=42, cache_dir=None):
+    """Генерує CSV-знімок усіх таблиць або повертає вже згенерований з кешу"""
+    directory = snapshot_dir(size, random_seed, cache_dir or default_cache_dir())
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            print(f"Using cached snapshot {directory}", file=sys.stderr)
+            return directory, json.load(f)
+
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    rng = random.Random(random_seed)
+    counts = counts_for(size)
+    files = {table: open(os.path.join(directory, f'{table}.csv'), 'w', newline='', encoding='utf-8')
+             for table in TABLES}
+    try:
+        writers = {table: csv.writer(f, lineterminator='\n') for table, f in files.items()}
+        for table, f in files.items():
+            writers[table].writerow(COLUMNS[table])
+        for rows in departments(rng, counts['departments']):
+            writers['departments'].writerows(rows)
+        for rows in doctors(rng, counts['doctors'], counts['departments']):
+            writers['doctors'].writerows(rows)
+        for rows in patients(rng, counts['patients']):
+            writers['patients'].writerows(rows)
+        prescriptions = 0
+        for appointment_rows, prescription_rows in appointments_and_prescriptions(
+            rng, counts['appointments'], counts['patients'], counts['doctors']
+        ):
+            writers['appointments'].writerows(appointment_rows)
+            writers['prescriptions'].writerows(prescription_rows)
+            prescriptions += len(prescription_rows)
+        counts['prescriptions'] = prescriptions
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = {'size': size, 'seed': random_seed, 'version': GENERATOR_VERSION, 'counts': counts}
+    # Маніфест пишеться останнім: його наявність означає завершений знімок
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Generated snapshot {directory} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return directory, manifest
+
+def default_cache_dir():
+    return os.getenv('SEED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'hospital_seed'))
+
+def load_postgres(directory, database_url):
+    # psycopg2 потрібен лише для PostgreSQL
+    import psycopg2
+    import loader
+
+    conn = psycopg2.connect(loader.dsn_from_config(database_url))
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+    finally:
+        conn.close()
+    for table in TABLES:
+        print(f"Loading {table}...", file=sys.stderr)
+        loader.load(table, os.path.join(directory, f'{table}.csv'), 'csv', rebuild_indexes=True,
+                    database_url=database_url)
+
+def load_sqlite(directory, database_url):
+    """Запасний шлях для локальної SQLite без COPY: executemany шматками"""
+    engine = create_engine(database_url)
+    try:
+        with engine.begin() as conn:
+            for table in reversed(TABLES):
+                conn.exec_driver_sql(f"DELETE FROM {table}")
+            for table in TABLES:
+                columns = COLUMNS[table]
+                statement = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                             f"VALUES ({', '.join('?' for _ in columns)})")
+                with open(os.path.join(directory, f'{table}.csv'), newline='', encoding='utf-8') as f:
+                    reader = csv.reader(f)
+                    next(reader)
+                    batch = []
+                    for row in reader:
+                        batch.append(tuple(row))
+                        if len(batch) >= CHUNK_ROWS:
+                            conn.exec_driver_sql(statement, batch)
+                            batch = []
+                    if batch:
+                        conn.exec_driver_sql(statement, batch)
+    finally:
+        engine.dispose()
+    versions.configure(config_dict()['TABLE_VERSIONS_PATH']).bump(TABLES)
+
+def seed(size, random_seed=42, cache_dir=None, database_url=None):
+    """Заповнює БД (за замовчуванням із DATABASE_URL) знімком потрібного розміру"""
+    if database_url is None:
+        config = config_dict()
+        check_config(config)
+        database_url = config['SQLALCHEMY_DATABASE_URI']
+    directory, manifest = generate(size, random_seed, cache_dir)
+    started = time.perf_counter()
+    if make_url(database_url).get_backend_name() == 'postgresql':
+        load_postgres(directory, database_url)
+    else:
+        load_sqlite(directory, database_url)
+    total = sum(manifest['counts'].values())
+    print(f"Seeded {total} rows {manifest['counts']} in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+    return manifest
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed all tables with a generated dataset of the given size")
+    parser.add_argument('size', type=int, help="number of patients; other tables follow fixed ratios")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (part of the snapshot key)")
+    parser.add_argument('--cache-dir', default=None, help="default: $SEED_CACHE_DIR or <tmp>/hospital_seed")
+    parser.add_argument('--generate-only', action='store_true', help="build the CSV snapshot without loading it")
+    args = parser.parse_args(argv)
+
+    if args.generate_only:
+        directory, manifest = generate(args.size, args.seed, args.cache_dir)
+        print(directory)
+    else:
+        seed(args.size, args.seed, args.cache_dir)
+
+if __name__ == '__main__':
+    main()
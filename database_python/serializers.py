@@ -0,0 +1,109 @@
+import json
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from operator import attrgetter
+
+from sqlalchemy import Date, DateTime, Enum as SAEnum
+
+from models.hospital import Department, Doctor, Patient, Appointment, Prescription
+
+try:
+    import orjson
+except ImportError:  # без orjson - стандартний json з тими ж перетвореннями
+    orjson = None
+
+def parse_fields(model, raw):
+    """Розбирає ?fields=a,b,c; None - усі поля моделі"""
+    if raw is None:
+        return None
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    if not fields:
+        return None
+    unknown = [name for name in fields if name not in model.__table__.columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+if orjson is not None:
+    def dumps(value):
+        return orjson.dumps(value)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=encode_value)
+
+    def dumps(value):
+        return _encoder.encode(value).encode()
+
+def _column_expression(column, index):
+    """Вираз для одного поля кортежу; orjson сам серіалізує дати та Enum"""
+    value = f"row[{index}]"
+    if orjson is not None:
+        return value
+    if isinstance(column.type, SAEnum):
+        return f"(None if {value} is None else {value}.value)"
+    if isinstance(column.type, (Date, DateTime)):
+        return f"(None if {value} is None else {value}.isoformat())"
+    return value
+
+class ModelEncoder:
+    """Скомпільований під модель і набір полів енкодер кортежів рядків у JSON bytes.
+
+    Функція row -> dict генерується один раз через exec, тому на кожен рядок
+    немає ні to_dict(), ні перевірок типів колонок.
+    """
+
+    def __init__(self, model, fields=None):
+        columns = model.__table__.columns
+        self.model = model
+        self.fields = tuple(fields) if fields else tuple(column.key for column in columns)
+        items = ",\n".join(
+            f"        {name!r}: {_column_expression(columns[name], index)}"
+            for index, name in enumerate(self.fields)
+        )
+        source = f"def encode(row):\n    return {{\n{items}\n    }}\n"
+        namespace = {}
+        exec(compile(source, f"<encoder {model.__name__}>", 'exec'), namespace)
+        self.encode = namespace['encode']
+        getter = attrgetter(*self.fields)
+        self.to_row = getter if len(self.fields) > 1 else (lambda obj: (getter(obj),))
+
+    def dumps_rows(self, rows):
+        """Рядки Core-запиту: перші len(fields) колонок - саме ці поля"""
+        encode = self.encode
+        return dumps([encode(row) for row in rows])
+
+    def dumps_objects(self, objects):
+        encode, to_row = self.encode, self.to_row
+        return dumps([encode(to_row(obj)) for obj in objects])
+
+    def dumps_row(self, row):
+        return dumps(self.encode(row))
+
+    def dumps_object(self, obj):
+        return dumps(self.encode(self.to_row(obj)))
+
+    def ndjson_rows(self, rows):
+        encode = self.encode
+        return b''.join(dumps(encode(row)) + b'\n' for row in rows)
+
+# Повні енкодери будуються один раз під час імпорту
+ENCODERS = {
+    model: ModelEncoder(model)
+    for model in (Department, Doctor, Patient, Appointment, Prescription)
+}
+
+@lru_cache(maxsize=256)
+def _projection_encoder(model, fields):
+    return ModelEncoder(model, fields)
+
+def encoder_for(model, fields=None):
+    if not fields:
+        return ENCODERS[model]
+    return _projection_encoder(model, tuple(fields))
@@ -0,0 +1,98 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from models.hospital import db, Appointment
+from crud import AppointmentCRUD
+from booking import AppointmentConflict, APPOINTMENT
+
+THREADS = 8
+DOCTORS = 4
+# Кандидати кожні 15 хвилин: сусідні 30-хвилинні прийоми перетинаються
+CANDIDATES_PER_DOCTOR = 40
+
+def book(app, patient_id, candidates, results, lock):
+    booked, conflicts = 0, 0
+    with app.app_context():
+        for doctor_id, start in candidates:
+            try:
+                AppointmentCRUD.create(
+                    patient_id=patient_id,
+                    doctor_id=doctor_id,
+                    appointment_datetime=start,
+                    reason_for_visit='Регулярний огляд'
+                )
+                booked += 1
+            except AppointmentConflict:
+                conflicts += 1
+        db.session.remove()
+    with lock:
+        results['booked'] += booked
+        results['conflicts'] += conflicts
+
+def test_overlapping_booking_is_rejected(app, clinic):
+    patient_id, doctor_ids = clinic(DOCTORS)
+    start = datetime(2030, 1, 1, 9)
+    first = AppointmentCRUD.create(patient_id, doctor_ids[0], start, 'Огляд')
+    try:
+        AppointmentCRUD.create(patient_id, doctor_ids[0], start + APPOINTMENT / 2, 'Огляд')
+        assert False, "overlapping appointment was booked"
+    except AppointmentConflict as e:
+        assert e.appointment_id == first.id
+    # Впритул після прийому та в іншого лікаря - можна
+    AppointmentCRUD.create(patient_id, doctor_ids[0], start + APPOINTMENT, 'Огляд')
+    AppointmentCRUD.create(patient_id, doctor_ids[1], start, 'Огляд')
+    # Перенесення прийому сам на себе не є конфліктом
+    AppointmentCRUD.update(first.id, appointment_datetime=start - APPOINTMENT / 2)
+
+    result = AppointmentCRUD.create_many([
+        {'patient_id': patient_id, 'doctor_id': doctor_ids[2],
+         'appointment_datetime': (start + APPOINTMENT * i / 2).isoformat(), 'reason_for_visit': 'Огляд'}
+        for i in range(4)
+    ])
+    assert [row['index'] for row in result['created']] == [0, 2]
+    assert [row['index'] for row in result['errors']] == [1, 3]
+
+def test_concurrent_bookings_never_overlap(make_app, clinic):
+    # Потоки бачать одні й ті самі дані файлової БД через окремі з'єднання
+    app = make_app()
+    with app.app_context():
+        patient_id, doctor_ids = clinic(DOCTORS)
+        db.session.remove()
+
+    day = datetime(2030, 1, 1, 8)
+    candidates = [
+        (doctor_id, day + timedelta(minutes=15 * i))
+        for doctor_id in doctor_ids
+        for i in range(CANDIDATES_PER_DOCTOR)
+    ]
+    results, lock = {'booked': 0, 'conflicts': 0}, threading.Lock()
+    threads = []
+    for seed_value in range(THREADS):
+        shuffled = candidates[:]
+        random.Random(seed_value).shuffle(shuffled)
+        threads.append(threading.Thread(target=book, args=(app, patient_id, shuffled, results, lock)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    attempts = THREADS * len(candidates)
+    print(f"{attempts} booking attempts from {THREADS} threads in {elapsed:.2f}s "
+          f"({attempts / elapsed:.0f} attempts/s): {results['booked']} booked, {results['conflicts']} conflicts")
+    assert results['booked'] + results['conflicts'] == attempts
+
+    with app.app_context():
+        appointments = Appointment.query.order_by(Appointment.doctor_id, Appointment.appointment_datetime).all()
+        assert len(appointments) == results['booked']
+        for previous, current in zip(appointments, appointments[1:]):
+            if previous.doctor_id == current.doctor_id:
+                assert current.appointment_datetime - previous.appointment_datetime >= APPOINTMENT
+        db.session.remove()
+
+if __name__ == '__main__':
+    pytest.main([__file__])
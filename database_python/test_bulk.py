@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import event
+from models.hospital import db, Patient
+from crud import PatientCRUD
+
+def patient(email, **overrides):
+    row = {
+        'first_name': 'Марія', 'last_name': 'Коваленко', 'date_of_birth': '1990-05-15', 'gender': 'Female',
+        'phone_number': '+380997654321', 'address': 'вул. Шевченка, 1, Київ', 'email': email
+    }
+    row.update(overrides)
+    return row
+
+def test_database_errors_are_reported_per_row(app):
+    PatientCRUD.create_many([patient('taken@example.com')])
+
+    # Дублікат email відхиляє БД, а не parse: решта пакета все одно вставляється
+    result = PatientCRUD.create_many([
+        patient('first@example.com'),
+        patient('taken@example.com'),
+        patient('second@example.com'),
+        patient('second@example.com'),
+        {'first_name': 'Без email'},
+    ])
+    assert [row['index'] for row in result['created']] == [0, 2]
+    assert [row['index'] for row in result['errors']] == [1, 3, 4]
+    assert 'email' in result['errors'][0]['error']
+    emails = {email for email, in db.session.query(Patient.email)}
+    assert emails == {'taken@example.com', 'first@example.com', 'second@example.com'}
+    ids = {row['id'] for row in result['created']}
+    assert {p.email for p in Patient.query.filter(Patient.id.in_(ids))} == {'first@example.com', 'second@example.com'}
+
+    # Пакет без помилок - один багаторядковий INSERT, id відповідають позиціям рядків
+    inserts = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        inserts.append(statement.startswith('INSERT'))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        result = PatientCRUD.create_many([patient(f'batch{i}@example.com') for i in range(50)])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    assert sum(inserts) == 1
+    assert len(result['created']) == 50 and not result['errors']
+    emails = dict(db.session.query(Patient.id, Patient.email))
+    assert all(emails[row['id']] == f"batch{row['index']}@example.com" for row in result['created'])
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import insert
+from models.hospital import db, Doctor
+from crud import DepartmentCRUD, DoctorCRUD
+import cache
+import versions
+
+def test_cached_rows_follow_commits(app):
+    department = DepartmentCRUD.create(name='Кардіологія', floor_number=2)
+    doctor = DoctorCRUD.create('Іван', 'Петренко', 'Cardiologist', '+380991234567',
+                               'petrenko@hospital.com', department.id)
+    fields = ('id', 'department_id')
+    assert DoctorCRUD.get_rows(fields) == [(doctor.id, department.id)]
+    hits = cache.doctors.hits
+    assert DoctorCRUD.get_rows(fields) == [(doctor.id, department.id)]
+    assert DoctorCRUD.get_row(doctor.id, fields) == (doctor.id, department.id)
+    assert DoctorCRUD.get_row(doctor.id, fields) == (doctor.id, department.id)
+    assert cache.doctors.hits == hits + 2
+    # Іменовані рядки Core: поля доступні за назвою, а не лише за позицією
+    assert DoctorCRUD.get_row(doctor.id, fields).department_id == department.id
+    assert [row.email for row in DoctorCRUD.get_by_department(department.id)] == ['petrenko@hospital.com']
+
+    DoctorCRUD.update(doctor.id, specialty='Therapist')
+    assert DoctorCRUD.get_rows(('id',), specialty='Cardiologist') == []
+    # Видалення відділення обнуляє department_id лікарів - кеш лікарів теж застарів
+    department_id, doctor = department.id, doctor.id
+    db.session.remove()
+    DepartmentCRUD.delete(department_id)
+    assert DoctorCRUD.get_rows(fields) == [(doctor, None)]
+    assert DoctorCRUD.get_row(doctor, fields) == (doctor, None)
+    assert DepartmentCRUD.get_rows(('id',)) == []
+
+def test_cached_rows_follow_other_processes(app, clinic):
+    _, (doctor_id,) = clinic(1)
+    fields = ('id',)
+    assert DoctorCRUD.get_rows(fields) == [(doctor_id,)]
+
+    # Рядок від іншого воркера чи loader.py: сесія цього процесу про нього не знає
+    db.session.connection().execute(insert(Doctor), {
+        'first_name': 'Олег', 'last_name': 'Сидоренко', 'specialty': 'Кардіолог',
+        'phone_number': '+380991112233', 'email': 'sydorenko@hospital.com'
+    })
+    db.session.commit()
+    assert DoctorCRUD.get_rows(fields) == [(doctor_id,)]
+    # ...але його commit збільшив версію таблиці у спільному файлі
+    versions.get_versions().bump(['doctors'])
+    assert DoctorCRUD.get_rows(fields) == [(doctor_id,), (doctor_id + 1,)]
+    hits = cache.doctors.hits
+    assert DoctorCRUD.get_rows(fields) == [(doctor_id,), (doctor_id + 1,)]
+    assert cache.doctors.hits == hits + 1
+    # Лікарі залежать і від версії відділень
+    versions.get_versions().bump(['departments'])
+    DoctorCRUD.get_rows(fields)
+    assert cache.doctors.hits == hits + 1
+
+def test_etag_never_labels_a_stale_cached_body(make_app, clinic):
+    """ETag рахується зі спільних версій, тіло - з кешу процесу: вони мають змінюватися разом"""
+    app = make_app(routes=True)
+    client = app.test_client()
+    with app.app_context():
+        _, (doctor_id,) = clinic(1)
+        first = client.get('/doctors?fields=id')
+        assert first.get_json() == [{'id': doctor_id}]
+        assert client.get(f'/doctors/{doctor_id}?fields=id').status_code == 200
+
+        db.session.connection().execute(insert(Doctor), {
+            'first_name': 'Олег', 'last_name': 'Сидоренко', 'specialty': 'Кардіолог',
+            'phone_number': '+380991112233', 'email': 'sydorenko@hospital.com'
+        })
+        db.session.commit()
+        versions.get_versions().bump(['doctors'])
+        db.session.remove()
+
+        second = client.get('/doctors?fields=id', headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 200 and second.headers['ETag'] != first.headers['ETag']
+        assert second.get_json() == [{'id': doctor_id}, {'id': doctor_id + 1}]
+        assert client.get(f'/doctors/{doctor_id + 1}?fields=id').get_json() == {'id': doctor_id + 1}
+        revalidated = client.get('/doctors?fields=id', headers={'If-None-Match': second.headers['ETag']})
+        assert revalidated.status_code == 304
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,71 @@
+from datetime import datetime, date, timedelta
+
+import pytest
+from sqlalchemy import event
+from models.hospital import db, Appointment, Prescription
+from crud import PatientCRUD, DoctorCRUD
+
+def seed(clinic, doctors_count, visits_per_doctor):
+    """Кожен лікар клініки має visits_per_doctor прийомів і стільки ж призначень пацієнтки"""
+    patient_id, doctor_ids = clinic(doctors_count)
+    for i, doctor_id in enumerate(doctor_ids):
+        for j in range(visits_per_doctor):
+            db.session.add(Appointment(
+                patient_id=patient_id,
+                doctor_id=doctor_id,
+                appointment_datetime=datetime(2024, 1, 1) + timedelta(days=i, hours=j),
+                reason_for_visit='Регулярний огляд'
+            ))
+            db.session.add(Prescription(
+                patient_id=patient_id,
+                doctor_id=doctor_id,
+                medication_name='Аспірин',
+                dosage='100мг',
+                frequency='1 раз на день',
+                start_date=date(2024, 1, 1),
+                end_date=date(2024, 1, 31)
+            ))
+    db.session.commit()
+    return patient_id, doctor_ids[-1]
+
+def count_queries(func):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        result = func()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return result, len(statements)
+
+def test_chart_query_count_is_constant(app, clinic):
+    counts = []
+    for doctors_count in (1, 5, 20):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        patient_id, doctor_id = seed(clinic, doctors_count, visits_per_doctor=3)
+        db.session.expunge_all()
+
+        chart, queries = count_queries(lambda: PatientCRUD.get_chart(patient_id).to_chart_dict())
+        assert len(chart['appointments']) == doctors_count * 3
+        assert len(chart['prescriptions']) == doctors_count * 3
+        assert all(apt['doctor']['id'] for apt in chart['appointments'])
+        counts.append(queries)
+        db.session.expunge_all()
+
+        workload, workload_queries = count_queries(
+            lambda: DoctorCRUD.get_workload(doctor_id).to_workload_dict()
+        )
+        assert len(workload['appointments']) == 3
+        assert workload['department']['name'] == 'Кардіологія'
+        assert workload_queries == 3
+        print(f"✅ Лікарів: {doctors_count}, запитів на карту: {queries}, на навантаження: {workload_queries}")
+
+    assert counts == [3, 3, 3], counts
+
+if __name__ == '__main__':
+    pytest.main([__file__])
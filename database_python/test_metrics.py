@@ -0,0 +1,72 @@
+import json
+import os
+import tempfile
+import time
+
+import metrics
+
+# pid більший за будь-який pid_max - процесу точно немає
+DEAD_PID = 2 ** 31 - 1
+
+def write_snapshot(directory, pid, requests, in_flight=0, age=0):
+    snapshot = dict(metrics.local.snapshot(), pid=pid, in_flight=in_flight,
+                    requests=[['/probe', 'GET', '200', requests]])
+    snapshot['pool'] = dict(snapshot['pool'], checkouts=requests, checked_out=in_flight)
+    path = os.path.join(directory, f'metrics-{pid}.json')
+    with open(path, 'w') as f:
+        json.dump(snapshot, f)
+    if age:
+        os.utime(path, (time.time() - age, time.time() - age))
+    return path
+
+def sample(snapshots, name):
+    """Значення рядка name у виводі /metrics"""
+    for line in metrics.render(snapshots).splitlines():
+        if line.rsplit(' ', 1)[0] == name:
+            return float(line.rsplit(' ', 1)[1])
+
+REQUESTS = 'hospital_http_requests_total{route="/probe",method="GET",status="200"}'
+IN_FLIGHT = 'hospital_http_requests_in_flight'
+CHECKED_OUT = 'hospital_db_pool_connections{state="checked_out"}'
+
+def test_collect_keeps_counters_of_dead_and_idle_workers():
+    with tempfile.TemporaryDirectory() as directory:
+        metrics.configure(directory, flush_interval=1.0)
+        try:
+            # Батьківський процес живий: простоює довше за STALE_FLUSH_INTERVALS
+            idle = write_snapshot(directory, os.getppid(), 1000, in_flight=2, age=metrics.STALE_FLUSH_INTERVALS + 5)
+            dead = write_snapshot(directory, DEAD_PID, 500, in_flight=3)
+            snapshots = metrics.collect()
+            assert sample(snapshots, REQUESTS) == 1500
+            assert sample(snapshots, 'hospital_db_pool_checkouts_total') >= 1500
+            # Миттєві значення - лише живих і свіжих знімків
+            assert sample(snapshots, IN_FLIGHT) == 0 and sample(snapshots, CHECKED_OUT) == 0
+            assert os.path.exists(idle) and not os.path.exists(dead)
+            assert os.path.exists(os.path.join(directory, metrics.ACCUMULATED_FILE))
+
+            # Лічильники не зменшуються між зборами, наступний завершений воркер додається
+            assert sample(metrics.collect(), REQUESTS) == 1500
+            write_snapshot(directory, DEAD_PID, 7)
+            assert sample(metrics.collect(), REQUESTS) == 1507
+            write_snapshot(directory, os.getppid(), 1000, in_flight=2)
+            assert sample(metrics.collect(), IN_FLIGHT) == 2
+        finally:
+            metrics.configure(None)
+
+def test_snapshot_is_taken_after_the_request():
+    with tempfile.TemporaryDirectory() as directory:
+        metrics.configure(directory, flush_interval=0)
+        try:
+            metrics.local.start()
+            metrics.local.observe('/probe', 'GET', 200, 0.01)
+            metrics.local.finish()
+            with open(os.path.join(directory, f'metrics-{os.getpid()}.json')) as f:
+                snapshot = json.load(f)
+            assert snapshot['in_flight'] == 0
+            assert ['/probe', 'GET', '200'] in [row[:3] for row in snapshot['requests']]
+        finally:
+            metrics.configure(None)
+
+if __name__ == '__main__':
+    test_collect_keeps_counters_of_dead_and_idle_workers()
+    test_snapshot_is_taken_after_the_request()
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from models.hospital import db, Appointment
+from crud import AppointmentCRUD
+
+def seed(clinic):
+    """Два лікарі; прийоми 1 березня 2030: у першого о 9, 10, 11, у другого о 10"""
+    patient_id, doctor_ids = clinic(2)
+    for doctor_id, hour in [(doctor_ids[0], 9), (doctor_ids[0], 10), (doctor_ids[1], 10), (doctor_ids[0], 11)]:
+        db.session.add(Appointment(patient_id=patient_id, doctor_id=doctor_id,
+                                   appointment_datetime=datetime(2030, 3, 1, hour), reason_for_visit='Огляд'))
+    db.session.commit()
+    return doctor_ids
+
+def test_schedule_range_and_query_params(make_app, clinic):
+    app = make_app(routes=True)
+    with app.app_context():
+        first, second = seed(clinic)
+
+        # Напіввідкритий інтервал: 9:00 входить, 11:00 - ні
+        rows = AppointmentCRUD.get_range(None, datetime(2030, 3, 1, 9), datetime(2030, 3, 1, 11),
+                                         ['doctor_id', 'appointment_datetime'])
+        assert [(row.doctor_id, row.appointment_datetime.hour) for row in rows] == [
+            (first, 9), (first, 10), (second, 10)
+        ]
+        rows = AppointmentCRUD.get_range(first, datetime(2030, 3, 1, 10), datetime(2030, 3, 2))
+        assert [row.appointment_datetime.hour for row in rows] == [10, 11]
+        assert all(isinstance(row, Appointment) for row in rows)
+        # Читання списків - рядки Core з усіма колонками за назвою, без ORM-об'єктів
+        rows = AppointmentCRUD.get_by_doctor(second)
+        assert [(row.doctor_id, row.appointment_datetime.hour, row.reason_for_visit) for row in rows] == [
+            (second, 10, 'Огляд')
+        ]
+        assert not isinstance(rows[0], Appointment)
+
+        client = app.test_client()
+        response = client.get(f'/appointments?doctor_id={first}&from=2030-03-01T09:00&to=2030-03-01T11:00'
+                              '&fields=appointment_datetime')
+        assert response.status_code == 200
+        assert response.get_json() == [
+            {'appointment_datetime': '2030-03-01T09:00:00'}, {'appointment_datetime': '2030-03-01T10:00:00'}
+        ]
+        assert len(client.get('/appointments?from=2030-03-01T00:00&to=2030-03-02T00:00').get_json()) == 4
+
+        for query in ('doctor_id=1', 'from=2030-03-01T00:00', 'from=tomorrow&to=2030-03-02',
+                      'from=2030-03-02&to=2030-03-01', 'doctor_id=x&from=2030-03-01&to=2030-03-02',
+                      'from=2030-03-01&to=2030-03-02&fields=unknown',
+                      'from=2030-03-01T00:00&to=2030-03-02T00:00%2B02:00'):
+            response = client.get(f'/appointments?{query}')
+            assert response.status_code == 400, query
+            assert 'error' in response.get_json()
+        db.session.remove()
+
+if __name__ == '__main__':
+    pytest.main([__file__])
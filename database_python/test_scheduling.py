@@ -0,0 +1,182 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import delete, insert
+from models.hospital import db, Appointment
+from crud import AppointmentCRUD
+from scheduling import DoctorSchedule, ScheduleIndex
+import scheduling
+import versions
+
+STEP = timedelta(minutes=30)
+OPEN_HOUR, CLOSE_HOUR = 8, 18
+
+@pytest.fixture
+def app(make_app):
+    """Сітка й робочі години, з яких виходить brute_force"""
+    app = make_app(APPOINTMENT_MINUTES=30, CLINIC_OPEN_HOUR=OPEN_HOUR, CLINIC_CLOSE_HOUR=CLOSE_HOUR)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+def brute_force(appointments, doctor_ids, start, end, duration, limit):
+    """Перебір слотів сітки по хвилинах, без індексу: прийом займає [початок, початок + STEP)"""
+    span = -(-duration // STEP) * STEP
+    start = max(start, datetime.now())
+    found = []
+    for doctor_id in doctor_ids:
+        busy = [(moment, moment + STEP) for owner, moment in appointments if owner == doctor_id]
+        day = datetime.combine(start.date(), time())
+        hit = None
+        while hit is None and day < end:
+            t, close = day + timedelta(hours=OPEN_HOUR), day + timedelta(hours=CLOSE_HOUR)
+            while t + span <= min(close, end):
+                if t >= start and not any(a < t + span and t < b for a, b in busy):
+                    hit = t
+                    break
+                t += STEP
+            day += timedelta(days=1)
+        if hit is not None:
+            found.append((hit, doctor_id))
+    found.sort()
+    return [(doctor_id, moment, moment + duration) for moment, doctor_id in found[:limit]]
+
+def random_schedule(rng, doctor_ids, first_day, days, count):
+    """Прийоми і по сітці, і зі зсувом, зокрема до відкриття та після закриття"""
+    return [
+        (rng.choice(doctor_ids),
+         datetime.combine(first_day + timedelta(days=rng.randrange(days)), time(7))
+         + timedelta(minutes=rng.choice([rng.randrange(0, 12 * 60, 30), rng.randrange(0, 12 * 60)])))
+        for _ in range(count)
+    ]
+
+def test_doctor_schedule_merge_and_first_free():
+    schedule = DoctorSchedule()
+    schedule.add([5, 2, 1, 3, 2])
+    assert (schedule.starts, schedule.ends) == ([1, 5], [4, 6])
+    # Накладені прийоми: слот звільняється лише після видалення обох
+    schedule.remove([2])
+    assert (schedule.starts, schedule.ends) == ([1, 5], [4, 6])
+    schedule.remove([2])
+    assert (schedule.starts, schedule.ends) == ([1, 3, 5], [2, 4, 6])
+
+    assert schedule.first_free(0, 20, 1, 10) == 0
+    assert schedule.first_free(1, 20, 1, 10) == 2
+    assert schedule.first_free(0, 20, 2, 10) == 6
+    # Відрізок не переходить через кінець доби (10 слотів) і не виходить за end
+    assert schedule.first_free(8, 20, 3, 10) == 10
+    assert schedule.first_free(8, 12, 3, 10) is None
+    assert DoctorSchedule().first_free(3, 4, 1, 10) == 3
+
+def test_slot_numbering():
+    index = ScheduleIndex(30, OPEN_HOUR, CLOSE_HOUR, 14)
+    origin = datetime(2030, 1, 1)
+    day = index.day_slots
+    assert day == 20
+    assert index.occupied(origin, datetime(2030, 1, 1, 8)) == (0,)
+    assert index.occupied(origin, datetime(2030, 1, 1, 8, 10)) == (0, 1)
+    assert index.occupied(origin, datetime(2030, 1, 1, 7, 40)) == (0,)
+    assert index.occupied(origin, datetime(2030, 1, 1, 7)) == ()
+    assert index.occupied(origin, datetime(2030, 1, 1, 17, 50)) == (day - 1,)
+    assert index.occupied(origin, datetime(2030, 1, 1, 18)) == ()
+    assert index.occupied(origin, datetime(2030, 1, 2, 9)) == (day + 2,)
+
+    assert index.slot_at_or_after(origin, datetime(2030, 1, 1, 8, 10)) == 1
+    assert index.slot_at_or_after(origin, datetime(2030, 1, 1, 6)) == 0
+    assert index.slot_at_or_after(origin, datetime(2030, 1, 1, 18, 30)) == day
+    assert index.slot_at_or_before(origin, datetime(2030, 1, 1, 8, 10)) == 0
+    assert index.slot_at_or_before(origin, datetime(2030, 1, 1, 19)) == day
+    assert index.moment(origin, day + 1) == datetime(2030, 1, 2, 8, 30)
+
+def test_slot_query_params():
+    specialty, start, end, duration, limit = scheduling.parse_slot_query(
+        {'specialty': 'Кардіолог', 'from': '2030-01-01T09:00', 'duration': '45'}, 30
+    )
+    assert (specialty, start, end, duration, limit) == (
+        'Кардіолог', datetime(2030, 1, 1, 9), datetime(2030, 1, 8, 9), timedelta(minutes=45), 10
+    )
+    for params in ({}, {'specialty': 'Кардіолог', 'from': '2030-01-01T09:00+02:00'},
+                   {'specialty': 'Кардіолог', 'duration': '0'}, {'specialty': 'Кардіолог', 'duration': 'x'},
+                   {'specialty': 'Кардіолог', 'from': '2030-01-01', 'to': '2030-03-01'}):
+        try:
+            scheduling.parse_slot_query(params, 30)
+            assert False, f"{params} was accepted"
+        except ValueError:
+            pass
+
+def test_free_slots_match_brute_force(app, clinic):
+    rng = random.Random(7)
+    patient_id, doctor_ids = clinic(4)
+    tomorrow = date.today() + timedelta(days=1)
+    for _ in range(15):
+        # У вікні індексу (від завтра) і за його межами (через 20 днів)
+        first_day = tomorrow + timedelta(days=rng.choice([0, 0, 20]))
+        appointments = random_schedule(rng, doctor_ids, first_day, 3, rng.randrange(10, 80))
+        db.session.execute(delete(Appointment))
+        db.session.execute(insert(Appointment), [
+            {'patient_id': patient_id, 'doctor_id': doctor_id,
+             'appointment_datetime': moment, 'reason_for_visit': 'Огляд'}
+            for doctor_id, moment in appointments
+        ])
+        db.session.commit()
+        for _ in range(10):
+            start = datetime.combine(first_day, time(6)) + timedelta(minutes=rng.randrange(0, 3 * 24 * 60))
+            end = start + timedelta(minutes=rng.randrange(30, 3 * 24 * 60))
+            duration = timedelta(minutes=rng.choice([30, 45, 60, 90]))
+            doctors = rng.sample(doctor_ids, rng.randint(1, len(doctor_ids)))
+            limit = rng.randint(1, 5)
+            expected = brute_force(appointments, doctors, start, end, duration, limit)
+            assert scheduling.index.free_slots(doctors, start, end, duration, limit) == expected, (
+                start, end, duration, doctors
+            )
+
+def test_index_follows_commits(app, clinic):
+    patient_id, (doctor_id, *_) = clinic(1)
+    index = scheduling.index
+    nine = datetime.combine(date.today() + timedelta(days=1), time(9))
+    window = (nine, nine + timedelta(hours=2))
+
+    def first_slot():
+        slots = index.free_slots([doctor_id], *window)
+        return slots[0][1] if slots else None
+
+    assert first_slot() == nine
+    version = index.version
+
+    # Зміни через ORM у цьому процесі застосовуються без перебудови
+    appointment = AppointmentCRUD.create(patient_id, doctor_id, nine, 'Огляд')
+    assert index.version == version + 1 and appointment.id in index.rows
+    assert first_slot() == nine + STEP
+    AppointmentCRUD.update(appointment.id, appointment_datetime=nine + STEP)
+    assert index.rows[appointment.id][1] == index.occupied(index.origin, nine + STEP)
+    assert first_slot() == nine
+    AppointmentCRUD.update(appointment.id, appointment_datetime=nine)
+    AppointmentCRUD.delete(appointment.id)
+    assert appointment.id not in index.rows
+    assert first_slot() == nine
+
+    # Минулий час не пропонується, навіть якщо 'from' раніше
+    now = datetime.now()
+    slots = index.free_slots([doctor_id], now - timedelta(days=1), now + timedelta(days=2))
+    assert slots and slots[0][1] >= now
+
+    # Рядок, доданий в обхід unit of work, і commit іншого процесу у файлі версій. Наступний
+    # власний commit бачить, що версія зросла не на 1, і індекс перебудовується з БД
+    db.session.connection().execute(insert(Appointment), {
+        'patient_id': patient_id, 'doctor_id': doctor_id,
+        'appointment_datetime': nine, 'reason_for_visit': 'Огляд'
+    })
+    db.session.commit()
+    assert first_slot() == nine
+    versions.get_versions().bump(['appointments'])
+    AppointmentCRUD.create(patient_id, doctor_id, nine + 2 * STEP, 'Огляд')
+    assert first_slot() == nine + STEP
+    assert index.version == versions.get_versions().get('appointments')
+    # Без власного commit перебудову спричиняє сама зміна версії
+    db.session.execute(delete(Appointment).where(Appointment.appointment_datetime == nine))
+    db.session.commit()
+    assert first_slot() == nine
+
+if __name__ == '__main__':
+    pytest.main([__file__])
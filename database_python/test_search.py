@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.dialects.postgresql import asyncpg, psycopg2
+from sqlalchemy.schema import CreateIndex
+from models.hospital import Patient, Gender, PATIENT_SEARCH_TEXT
+from crud import PatientCRUD
+
+PATIENTS = [
+    ('Марія', 'Коваленко', '+380997654321', 'kovalenko@gmail.com'),
+    ('Іван', 'Коваль', '+380501112233', 'ivan.koval@ukr.net'),
+    ('Олена', 'Бондаренко', '+380671234567', 'bondarenko@gmail.com'),
+    ('Андрій', 'Ковальчук', '+380991234500', 'andrii@example.com'),
+]
+
+def names(rows):
+    return [row.last_name for row in rows]
+
+def test_fuzzy_search_ranks_and_follows_changes(app):
+    ids = [
+        PatientCRUD.create(first_name, last_name, date(1990, 5, 15), Gender.FEMALE,
+                           phone_number, 'вул. Шевченка, 1, Київ', email).id
+        for first_name, last_name, phone_number, email in PATIENTS
+    ]
+    # Точний збіг вище за схожі прізвища, одруківка не заважає
+    assert names(PatientCRUD.search('Коваленко'))[0] == 'Коваленко'
+    assert names(PatientCRUD.search('коваленка'))[0] == 'Коваленко'
+    assert set(names(PatientCRUD.search('Ковал'))) == {'Коваленко', 'Коваль', 'Ковальчук'}
+    # Телефон - підрядок цифр у будь-якому форматі; email - за частиною адреси
+    assert names(PatientCRUD.search('(067) 123')) == ['Бондаренко']
+    assert names(PatientCRUD.search('1234', fields=['last_name'])) == ['Бондаренко', 'Ковальчук']
+    assert names(PatientCRUD.search('bondarenko@gmail'))[0] == 'Бондаренко'
+    assert PatientCRUD.search('Шевчук') == []
+    # Переставлені сусідні літери: 3 з 7 триграм, нижче за SIMILARITY_THRESHOLD
+    assert 'Коваль' in names(PatientCRUD.search('Коавль'))
+
+    # Індекс у пам'яті оновлюється після commit
+    PatientCRUD.update(ids[2], last_name='Шевчук')
+    assert names(PatientCRUD.search('Шевчук')) == ['Шевчук']
+    assert 'Бондаренко' not in names(PatientCRUD.search('Бондаренко'))
+    PatientCRUD.delete(ids[2])
+    assert PatientCRUD.search('Шевчук') == []
+    PatientCRUD.create_many([{
+        'first_name': 'Софія', 'last_name': 'Шевчук', 'date_of_birth': '2000-01-01', 'gender': 'Female',
+        'phone_number': '+380631112233', 'address': 'вул. Франка, 2, Львів', 'email': 'sofia@example.com'
+    }])
+    assert names(PatientCRUD.search('Шевчук')) == ['Шевчук']
+
+    for query in ('к', '12'):
+        try:
+            PatientCRUD.search(query)
+            assert False, f"{query!r} was accepted"
+        except ValueError:
+            pass
+
+def test_postgresql_search_uses_trigram_index():
+    """Без PostgreSQL: запит і індекс компілюються для його діалекту над тим самим виразом,
+    інакше планувальник не застосує ix_patients_search_trgm"""
+    index, = [index for index in Patient.__table__.indexes if index.name == 'ix_patients_search_trgm']
+    # Драйвери з requirements.txt (Flask) і requirements-async.txt (ASGI)
+    for dialect in (psycopg2.dialect(), asyncpg.dialect()):
+        expression = str(PATIENT_SEARCH_TEXT.compile(dialect=dialect))
+        ddl = str(CreateIndex(index).compile(dialect=dialect))
+        assert 'USING gist' in ddl and f'({expression} gist_trgm_ops)' in ddl
+
+        # '%' у pyformat екранується як '%%'
+        sql = str(PatientCRUD.search_statement('коваленко', False, ['last_name']).compile(dialect=dialect))
+        sql = sql.replace('%%', '%')
+        assert f'WHERE {expression} %> ' in sql and f'ORDER BY {expression} <->> ' in sql, sql
+        sql = str(PatientCRUD.search_statement('1234', True).compile(dialect=dialect))
+        assert f'WHERE {expression} LIKE ' in sql and f'ORDER BY {expression} <->> ' in sql, sql
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import timing
+
+def test_failed_statements_do_not_leak_start_times():
+    timing.install()
+    engine = create_engine('sqlite://')
+    with engine.connect() as conn:
+        for _ in range(3):
+            try:
+                conn.execute(text('SELECT * FROM missing_table'))
+                assert False, "the statement did not fail"
+            except OperationalError:
+                pass
+        assert conn.execute(text('SELECT 1')).scalar() == 1
+        assert conn.info['query_started'] == []
+
+if __name__ == '__main__':
+    test_failed_statements_do_not_leak_start_times()
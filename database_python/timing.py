@@ -0,0 +1,86 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Dialect, Engine
+
+slow_query_log = logging.getLogger('hospital.slow_queries')
+
+_slow_query_seconds = None
+
+def params_shape(parameters):
+    """Лише структура параметрів (ключі та типи), без значень - у лог не потрапляють персональні дані"""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {'rows': len(parameters), 'row': params_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append((context, time.perf_counter()))
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()[1]
+    in_request = has_request_context()
+    if in_request and 'db_seconds' in g:
+        g.db_seconds += elapsed
+        g.db_statements += 1
+    if _slow_query_seconds is not None and elapsed >= _slow_query_seconds:
+        slow_query_log.warning(json.dumps({
+            'route': request.url_rule.rule if in_request and request.url_rule else None,
+            'method': request.method if in_request else None,
+            'duration_ms': round(elapsed * 1000, 3),
+            'statement': statement,
+            'params': params_shape(parameters),
+            'executemany': executemany,
+        }, ensure_ascii=False))
+
+def _handle_error(exception_context):
+    # Для запиту, що впав, after_cursor_execute не викликається: прибираємо його час старту,
+    # інакше він лишиться в conn.info назавжди
+    connection = exception_context.connection
+    started = connection.info.get('query_started') if connection is not None else None
+    if started and started[-1][0] is exception_context.execution_context:
+        started.pop()
+
+def install(slow_query_ms=None):
+    """Підключає лічильники до всіх рушіїв процесу; повторний виклик лише змінює поріг"""
+    global _slow_query_seconds
+    _slow_query_seconds = slow_query_ms / 1000 if slow_query_ms else None
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        # handle_error - подія діалекту, а не Engine
+        event.listen(Dialect, 'handle_error', _handle_error)
+
+def start_request():
+    g.request_started = time.perf_counter()
+    g.db_seconds = 0.0
+    g.db_statements = 0
+    g.serialize_seconds = 0.0
+
+@contextmanager
+def serializing():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and 'serialize_seconds' in g:
+            g.serialize_seconds += time.perf_counter() - started
+
+def elapsed():
+    return time.perf_counter() - g.request_started
+
+def server_timing():
+    """Значення заголовка Server-Timing: db, serialize, total у мілісекундах"""
+    total = elapsed()
+    return (
+        f'db;dur={g.db_seconds * 1000:.2f};desc="{g.db_statements} queries", '
+        f'serialize;dur={g.serialize_seconds * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
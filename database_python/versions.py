@@ -0,0 +1,99 @@
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: лише в межах одного процесу
+    fcntl = None
+
+import changes
+
+_SLOT = struct.Struct('<Q')
+
+# Порядок визначає розміщення слотів у файлі: нові таблиці додавати лише в кінець
+TABLES = ('departments', 'doctors', 'patients', 'appointments', 'prescriptions')
+
+class TableVersions:
+    """Лічильники версій таблиць у спільному mmap-файлі.
+
+    Файл читають усі воркери на хості, тож версія, збільшена після commit
+    в одному процесі, одразу видна іншим без звернення до БД.
+    Слот 0 - випадковий nonce файлу, щоб ETag не повторювались після його перестворення.
+    """
+
+    def __init__(self, path, tables):
+        self.path = path
+        self.slots = {table: index + 1 for index, table in enumerate(tables)}
+        self._size = _SLOT.size * (len(self.slots) + 1)
+        self._mm = None
+        self._fd = None
+        self._lock = threading.RLock()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(fd):
+            if os.fstat(fd).st_size < self._size:
+                os.ftruncate(fd, self._size)
+            mm = mmap.mmap(fd, self._size)
+            if _SLOT.unpack_from(mm, 0)[0] == 0:
+                _SLOT.pack_into(mm, 0, int.from_bytes(os.urandom(8), 'little') or 1)
+        self._fd, self._mm = fd, mm
+
+    @contextmanager
+    def _locked(self, fd):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+
+    @property
+    def mm(self):
+        if self._mm is None:
+            with self._lock:
+                if self._mm is None:
+                    self._open()
+        return self._mm
+
+    def get(self, table):
+        return _SLOT.unpack_from(self.mm, _SLOT.size * self.slots[table])[0]
+
+    def bump(self, tables):
+        slots = [self.slots[table] for table in tables if table in self.slots]
+        if not slots:
+            return
+        mm = self.mm
+        with self._locked(self._fd):
+            for slot in slots:
+                offset = _SLOT.size * slot
+                _SLOT.pack_into(mm, offset, _SLOT.unpack_from(mm, offset)[0] + 1)
+
+    def etag(self, tables, *parts):
+        """Сильний ETag із nonce, версій потрібних таблиць та ключа представлення"""
+        mm = self.mm
+        key = [str(_SLOT.unpack_from(mm, 0)[0])]
+        key += [f"{table}={self.get(table)}" for table in tables]
+        key += [str(part) for part in parts]
+        return hashlib.blake2b('|'.join(key).encode(), digest_size=16).hexdigest()
+
+_versions = None
+
+def configure(path, tables=TABLES):
+    global _versions
+    _versions = TableVersions(path, tables)
+    return _versions
+
+def get_versions():
+    return _versions
+
+@changes.on_commit
+def _bump_versions(tables):
+    if _versions is not None:
+        _versions.bump(tables)